@@ -7,9 +7,107 @@ class LLMSettings(BaseSettings):
     MODEL_NAME: str = "gpt-4o-mini-2024-07-18"
     API_KEY: str = ""
     BASE_URL: Optional[str] = None
+    # Shared async connection pool used by every LLM instance
+    MAX_CONNECTIONS: int = 100
+    MAX_KEEPALIVE_CONNECTIONS: int = 20
+    KEEPALIVE_EXPIRY: float = 30.0
+    # Token budget for the prompt (system prompt + context + message), 0 disables windowing
+    CONTEXT_TOKEN_BUDGET: int = 8000
+    # Tokens used to summarize turns that were dropped from the context, 0 just drops them
+    CONTEXT_SUMMARY_TOKENS: int = 300
+    # Request JSON-schema structured outputs from the provider for LLMs with a response schema
+    STRUCTURED_OUTPUTS: bool = True
+    # Share one upstream completion between identical concurrent requests, and with identical
+    # requests arriving up to SINGLE_FLIGHT_WINDOW_SECONDS after it completed
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_WINDOW_SECONDS: float = 1.0
+
+class ResilienceSettings(BaseSettings):
+    # Deadline for each attempt of an upstream call
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    SPEECH_TIMEOUT_SECONDS: float = 30.0
+    # Retries of rate-limited (429), 5xx, timed out and connection-failed calls, with exponential backoff and jitter
+    MAX_RETRIES: int = 2
+    BACKOFF_BASE_SECONDS: float = 0.5
+    BACKOFF_MAX_SECONDS: float = 8.0
+    # A provider's circuit breaker opens after this many consecutive failures, and lets a trial call through after BREAKER_RESET_SECONDS
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_SECONDS: float = 30.0
 
 class SpeechSettings(BaseSettings):
     ELEVENLABS_KEY: Optional[str] = None
+    # Uploads larger than this are rejected (Whisper accepts up to 25 MB)
+    MAX_UPLOAD_BYTES: int = 25 * 1024 * 1024
+    # Uploads are buffered in memory up to this size, then spill to an anonymous temp file
+    SPOOL_MAX_MEMORY_BYTES: int = 5 * 1024 * 1024
+    # Cache of synthesized speech on disk, keyed by (text, voice, model, language); empty disables it
+    TTS_CACHE_DIR: Optional[str] = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "tts")
+    TTS_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
+    # Pre-synthesize the fixed chatbot phrases at startup
+    TTS_PREWARM_ON_STARTUP: bool = True
+
+class ConversationSettings(BaseSettings):
+    # "single_pass" extracts all symptom fields in one LLM call,
+    # "three_stage" keeps the separate summarizer and extractor calls
+    EXTRACTION_MODE: str = "single_pass"
+    # Generate the follow-up question concurrently with extraction, from the previous
+    # turn's symptoms, and regenerate it only if the missing fields changed
+    OPTIMISTIC_RESPONSE: bool = False
+    # Send only the messages since the last extraction plus the previous symptoms
+    INCREMENTAL_EXTRACTION: bool = False
+    # Skip the LLM extraction when the local lexicon extractor understood the whole new message
+    LOCAL_EXTRACTION: bool = True
+    # Conversation store backend: "memory" (single process) or "sqlite" (shared by all workers)
+    STORE_BACKEND: str = "memory"
+    STORE_SQLITE_PATH: str = "conversations.db"
+    # Conversation store limits: LRU eviction beyond these, eviction after TTL of inactivity
+    STORE_MAX_ENTRIES: int = 10000
+    STORE_MAX_BYTES: int = 256 * 1024 * 1024
+    STORE_TTL_SECONDS: int = 2 * 60 * 60
+    STORE_SWEEP_INTERVAL_SECONDS: int = 60
+
+class SymptomCacheSettings(BaseSettings):
+    # Cache of /symptoms/analyze and /symptoms/diagnosis responses, keyed on the canonical symptoms
+    ENABLED: bool = True
+    MAX_ENTRIES: int = 1000
+    TTL_SECONDS: int = 60 * 60
+    # Reuse the response of a payload whose symptom terms are at least this similar (0-1), 0 disables
+    NEAR_DUPLICATE_THRESHOLD: float = 0.0
+
+class SimulationSettings(BaseSettings):
+    # Maximum number of steps generated at the same time for one request
+    MAX_CONCURRENCY: int = 5
+    # Steps taking longer than this get the fallback content
+    STEP_TIMEOUT_SECONDS: float = 30.0
+    # Cache of generated step content, in memory and (if CACHE_DIR is set) on disk
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 2000
+    CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    CACHE_DIR: Optional[str] = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "simulation")
+    CACHE_MAX_BYTES: int = 100 * 1024 * 1024
+    # Pre-generate content for every step and the common symptom profiles at startup
+    PREWARM_ON_STARTUP: bool = False
+    PREWARM_LANGUAGES: list = ["en", "es", "zh"]
+    PREWARM_CONCURRENCY: int = 4
+
+class JobSettings(BaseSettings):
+    # Number of jobs run at the same time
+    WORKERS: int = 4
+    # Finished jobs (and their results) are kept this long for polling
+    RESULT_TTL_SECONDS: int = 60 * 60
+    MAX_QUEUED: int = 1000
+    # Job table backend: "memory" (single process) or "sqlite" (polls work on any worker).
+    # Empty uses the conversation store's backend and database.
+    STORE_BACKEND: str = ""
+    STORE_SQLITE_PATH: str = ""
+    # Unfinished jobs whose worker hasn't sent a heartbeat for STALE_SECONDS are marked failed
+    HEARTBEAT_SECONDS: int = 10
+    STALE_SECONDS: int = 60
+
+class ReportSettings(BaseSettings):
+    # PDF rendering runs in a "process" or "thread" pool so it doesn't block the event loop
+    PDF_EXECUTOR: str = "process"
+    PDF_MAX_WORKERS: int = 2
 
 class Settings(BaseSettings):
     APP_NAME: str = "Women's Health Symptom Navigator"
@@ -24,6 +122,24 @@ class Settings(BaseSettings):
     # Speech Settings
     SPEECH: SpeechSettings = SpeechSettings()
     
+    # Timeouts, retries and circuit breakers for the LLM and speech providers
+    RESILIENCE: ResilienceSettings = ResilienceSettings()
+    
+    # Symptom conversation settings
+    CONVERSATION: ConversationSettings = ConversationSettings()
+    
+    # Symptom analysis and diagnosis response cache settings
+    SYMPTOM_CACHE: SymptomCacheSettings = SymptomCacheSettings()
+    
+    # Hospital visit simulation settings
+    SIMULATION: SimulationSettings = SimulationSettings()
+    
+    # PDF report settings
+    REPORTS: ReportSettings = ReportSettings()
+    
+    # Background job queue settings
+    JOBS: JobSettings = JobSettings()
+    
     # CORS settings
     CORS_ORIGINS: list = ["http://localhost:3000"]
     
@@ -50,6 +166,10 @@ class Settings(BaseSettings):
         if yaml_config.get("base_url"):
             self.LLM.BASE_URL = yaml_config["base_url"]
             
+        # Update conversation settings
+        if yaml_config.get("extraction_mode"):
+            self.CONVERSATION.EXTRACTION_MODE = yaml_config["extraction_mode"]
+            
         # Update Speech settings
         if yaml_config.get("elevenlabs_key"):
             self.SPEECH.ELEVENLABS_KEY = yaml_config["elevenlabs_key"]
@@ -3,7 +3,15 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import logging
 
-from app.routers import symptoms, speech, reports, resources, simulation
+from app.routers import symptoms, speech, reports, resources, simulation, metrics, jobs
+from app.services.llm import close_async_client
+from app.services.conversation_service import start_conversation_sweeper, stop_conversation_sweeper
+from app.services.simulation_prewarm import start_simulation_prewarm, stop_simulation_prewarm
+from app.services.tts_cache import start_tts_prewarm, stop_tts_prewarm
+from app.services.pdf_generator import shutdown_pdf_executor
+from app.services.job_queue import start_job_workers, stop_job_workers
+from app.services.symptom_cache import CACHE_STATUS_HEADER
+from app.config import settings
 
 app = FastAPI(
     title="Women's Health Symptom Navigator API",
@@ -25,6 +33,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read the symptom response cache status
+    expose_headers=[CACHE_STATUS_HEADER],
 )
 
 # Include routers with the /api prefix
@@ -33,13 +43,38 @@ app.include_router(speech.router, prefix="/api")
 app.include_router(reports.router, prefix="/api")
 app.include_router(resources.router, prefix="/api")
 app.include_router(simulation.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("uvicorn")
 
 # After registering all routers:
 for route in app.routes:
-    logger.info(f"Route: {route.path}, methods: {route.methods}")
+    logger.info(f"Route: {route.path}, methods: {getattr(route, 'methods', None)}")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Evict idle conversations in the background
+    start_conversation_sweeper()
+    # Run background report and simulation jobs
+    start_job_workers()
+    # Fill the simulation content cache so the first visitors get instant responses
+    if settings.SIMULATION.PREWARM_ON_STARTUP:
+        start_simulation_prewarm()
+    # Synthesize the greeting and fallback replies so they never wait on the TTS provider
+    if settings.SPEECH.TTS_PREWARM_ON_STARTUP:
+        start_tts_prewarm()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await stop_conversation_sweeper()
+    await stop_job_workers()
+    await stop_simulation_prewarm()
+    await stop_tts_prewarm()
+    shutdown_pdf_executor()
+    # Release the pooled LLM connections
+    await close_async_client()
 
 @app.get("/", tags=["health"])
 async def health_check():
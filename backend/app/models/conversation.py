@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import List, Optional, Union
+
+class PainAreaDetail(BaseModel):
+    """Pain area extracted from a symptom conversation"""
+    area: str
+    intensity: Optional[Union[int, float]] = None  # 1-10 scale
+    frequency: Optional[str] = None  # "very often", "often", "sometimes" or "rarely"
+    description: Optional[str] = None
+    
+class SymptomSummaryOutput(BaseModel):
+    """Output of the symptom summarizer"""
+    main_symptoms: List[str] = []
+    other_symptoms: List[str] = []
+    
+class SymptomExtractionOutput(BaseModel):
+    """Output of the detailed symptom extractor"""
+    pain_areas: List[PainAreaDetail] = []
+    main_symptoms: List[str] = []
+    additional_symptoms: List[str] = []
+    emotional_state: Optional[str] = None
+    emotional_scale: Optional[Union[int, float]] = None
+    completeness_score: Union[int, float] = 0
+    
+class SinglePassExtractionOutput(BaseModel):
+    """Output of the single-pass symptom extractor"""
+    pain_areas: List[PainAreaDetail] = []
+    main_symptoms: List[str] = []
+    other_symptoms: List[str] = []
+    emotional_state: Optional[str] = None
+    emotional_scale: Optional[Union[int, float]] = None
+    completeness_score: Union[int, float] = 0
+    
+class FollowUpOutput(BaseModel):
+    """Output of the response generator"""
+    missing_information: List[str] = []
+    is_complete: bool = False
+    follow_up_question: str
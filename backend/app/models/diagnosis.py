@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class PotentialCondition(BaseModel):
+    """Condition that may match the reported symptoms"""
+    name: str
+    confidence: str  # "low", "moderate" or "high"
+    description: Optional[str] = None
+    symptom_match: Optional[str] = None
+    
+class DiagnosisRecommendation(BaseModel):
+    """Preliminary assessment of the reported symptoms"""
+    recommendation_level: str  # "yellow", "orange" or "red"
+    recommendation_text: str
+    potential_conditions: List[PotentialCondition] = []
+    specialty: Optional[str] = None
+    urgent: bool = False
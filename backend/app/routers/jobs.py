@@ -0,0 +1,58 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from typing import Any, Dict
+
+from app.services.job_queue import job_queue, JobQueueFullError, SUCCEEDED, FAILED
+
+router = APIRouter()
+
+class JobRequest(BaseModel):
+    kind: str  # "report" or "personalized_simulation"
+    payload: Dict[str, Any] = {}
+
+async def accepted_job_response(kind: str, payload: Dict[str, Any]) -> JSONResponse:
+    """Submit a job and return its status with 202 Accepted"""
+    try:
+        job = await job_queue.submit(kind, payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+@router.post("/jobs", status_code=202)
+async def submit_job(job_request: JobRequest):
+    """
+    Submit a job to run in the background.
+    
+    Submitting the same kind and payload as a pending or finished job returns that job.
+    """
+    return await accepted_job_response(job_request.kind, job_request.payload)
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get the status of a job"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Get the result of a finished job.
+    
+    Returns 202 with the job status while it is still queued or running.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=f"Job failed: {job.error}")
+    if job.status != SUCCEEDED:
+        return JSONResponse(status_code=202, content=job.to_dict())
+    
+    if job.media_type == "application/json":
+        return JSONResponse(content=job.result)
+    return Response(content=job.result, media_type=job.media_type)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from typing import Any, Dict
+import asyncio
+
+from app.utils.metrics import get_all_stats
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics() -> Dict[str, Any]:
+    """
+    Get runtime counters of the backend services (stores, caches, providers)
+    
+    Collected in a worker thread, since the SQLite stores query their tables for their stats.
+    """
+    return await asyncio.to_thread(get_all_stats)
\ No newline at end of file
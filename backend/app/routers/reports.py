@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
 from app.services.pdf_generator import generate_pdf_report
+from app.services.job_queue import job_queue
+from app.routers.jobs import accepted_job_response
 
 router = APIRouter()
 
@@ -19,11 +21,27 @@ class ReportRequest(BaseModel):
     notes: Optional[str] = None
     language: str = "en"
     
+async def run_report_job(payload: dict) -> bytes:
+    report_request = ReportRequest(**payload)
+    return await generate_pdf_report(
+        report_request.symptom_summary,
+        report_request.user_name,
+        report_request.notes,
+        report_request.language
+    )
+
+job_queue.register("report", run_report_job, media_type="application/pdf")
+
 @router.post("/reports/generate")
-async def create_report(report_request: ReportRequest):
+async def create_report(report_request: ReportRequest, background: bool = False):
     """
-    Generate a PDF report from the user's symptom data
+    Generate a PDF report from the user's symptom data, returned as application/pdf
+    
+    With background=true the report is generated as a job instead, see /jobs.
     """
+    if background:
+        return await accepted_job_response("report", report_request.model_dump())
+    
     try:
         report_data = await generate_pdf_report(
             report_request.symptom_summary,
@@ -31,6 +49,15 @@ async def create_report(report_request: ReportRequest):
             report_request.notes,
             report_request.language
         )
-        return {"report_data": report_data, "timestamp": datetime.now().isoformat()}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
+    
+    timestamp = datetime.now()
+    return Response(
+        content=report_data,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="symptom-report-{timestamp.strftime("%Y%m%d-%H%M%S")}.pdf"',
+            "X-Report-Timestamp": timestamp.isoformat()
+        }
+    ) 
\ No newline at end of file
@@ -1,8 +1,15 @@
 from fastapi import APIRouter, HTTPException, Body
-from typing import List, Optional, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Dict, Any
 from pydantic import BaseModel
+import asyncio
 import json
+from app.config import settings
 from app.services.llm import LLM  # Import the LLM service
+from app.utils.structured_output import StructuredOutputError
+from app.services.simulation_cache import make_dialog_cache_key, get_cached_dialog, set_cached_dialog
+from app.services.job_queue import job_queue
+from app.routers.jobs import accepted_job_response
 import os
 from dotenv import load_dotenv
 
@@ -19,6 +26,7 @@ BASE_SIMULATION_STEPS = [
         "description": "What to expect when you arrive at the gynecological clinic",
         "image_url": "/images/1_Hospital-Check-in.png",
         "illustration": "arrival.svg",
+        "symptom_independent": True,
     },
     {
         "id": "check-in",
@@ -26,6 +34,7 @@ BASE_SIMULATION_STEPS = [
         "description": "How to complete the check-in process at the front desk",
         "image_url": "/images/1_Hospital-Check-in.png",
         "illustration": "checkin.svg",
+        "symptom_independent": True,
     },
     {
         "id": "nurse-intake",
@@ -40,6 +49,7 @@ BASE_SIMULATION_STEPS = [
         "description": "What to expect when changing into a hospital gown for examination",
         "image_url": "/images/3_Diverse-Women-Portrait.png",
         "illustration": "changing.svg",
+        "symptom_independent": True,
     },
     {
         "id": "waiting-room",
@@ -47,6 +57,7 @@ BASE_SIMULATION_STEPS = [
         "description": "What to do while waiting for your appointment",
         "image_url": "/images/3_Diverse-Women-Portrait.png",
         "illustration": "waiting.svg",
+        "symptom_independent": True,
     },
     {
         "id": "doctor-enters",
@@ -96,6 +107,7 @@ BASE_SIMULATION_STEPS = [
         "description": "Items to bring for future appointments",
         "image_url": "/images/3_Diverse-Women-Portrait.png",
         "illustration": "what_to_bring.svg",
+        "symptom_independent": True,
     },
     {
         "id": "closing",
@@ -103,13 +115,24 @@ BASE_SIMULATION_STEPS = [
         "description": "Final tips and encouragement for your healthcare journey",
         "image_url": "/images/3_Diverse-Women-Portrait.png",
         "illustration": "closing.svg",
+        "symptom_independent": True,
     },
 ]
 
+# Steps whose content doesn't depend on the patient's symptoms, cached for everyone
+SYMPTOM_INDEPENDENT_STEP_IDS = {step["id"] for step in BASE_SIMULATION_STEPS if step.get("symptom_independent")}
+
+LANGUAGE_NAMES = {"en": "English", "es": "Spanish", "zh": "Chinese"}
+
 class DialogPair(BaseModel):
     doctor_dialog: str
     user_guidance: str
 
+class StepDialogContent(BaseModel):
+    """Content generated by simulation_llm for one step"""
+    dialog_pairs: List[DialogPair] = []
+    tips: List[str] = []
+
 class SimulationStep(BaseModel):
     id: str
     title: str
@@ -131,16 +154,26 @@ class SymptomData(BaseModel):
 # Initialize the LLM service with a medical-focused system prompt
 simulation_llm = LLM(
     name="simulation_dialog_generator",
-    system_prompt="You are a helpful assistant that generates realistic and compassionate medical dialog and tips for patients visiting a gynecological clinic."
+    system_prompt="You are a helpful assistant that generates realistic and compassionate medical dialog and tips for patients visiting a gynecological clinic.",
+    response_schema=StepDialogContent
 )
 
-async def generate_dialog_with_llm(step_id: str, step_title: str, step_description: str, symptom_data: Optional[SymptomData] = None) -> Dict:
+async def generate_dialog_with_llm(step_id: str, step_title: str, step_description: str, symptom_data: Optional[SymptomData] = None,
+                                   language: str = "en") -> Dict:
     """
     Use LLM to generate doctor dialog, user guidance, and tips based on the current step and symptom data
+    
+    Results are cached per step, language and symptom profile (see simulation_cache).
     """
+    symptom_independent = step_id in SYMPTOM_INDEPENDENT_STEP_IDS
+    cache_key = make_dialog_cache_key(step_id, language, symptom_data, symptom_independent)
+    cached_content = await get_cached_dialog(cache_key)
+    if cached_content is not None:
+        return cached_content
+    
     # Format symptom information for the prompt
     symptom_context = ""
-    if symptom_data and symptom_data.symptoms:
+    if symptom_data and symptom_data.symptoms and not symptom_independent:
         main_symptoms = ", ".join([s.get("name", "unknown symptom") for s in symptom_data.symptoms[:3]])
         pain_desc = f" with pain level {symptom_data.pain_level}/10" if symptom_data.pain_level else ""
         location = f" in the {symptom_data.pain_location}" if symptom_data.pain_location else ""
@@ -254,34 +287,21 @@ Tips can include reminder to set follow-up and self-care suggestions.
         }}
 
         Keep the dialog realistic, compassionate, and informative. Depending on the step, adjust the number of dialog pairs (0–5) and tips (1–3).
+        Write the dialog and tips in {LANGUAGE_NAMES.get(language, "English")}.
         IMPORTANT: Return ONLY the JSON object without any markdown formatting (no ```json or ``` markers).
         """
     
     try:
         # Use the LLM service instead of direct OpenAI calls
-        response_content = simulation_llm.chat(prompt)
-        
-        # Parse and return the response
         try:
-            # First try direct JSON parsing
-            return json.loads(response_content)
-        except json.JSONDecodeError:
-            # If direct parsing fails, try to extract JSON from markdown code blocks
-            print(f"Error parsing direct JSON. Response starts with: {response_content[:200]}...")
-            
-            # Extract JSON from markdown code blocks if present
-            import re
-            json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response_content)
-            
-            if json_match:
-                json_content = json_match.group(1).strip()
-                try:
-                    return json.loads(json_content)
-                except json.JSONDecodeError:
-                    print(f"Failed to parse extracted JSON: {json_content[:200]}...")
-            
-            # If we still can't extract valid JSON, return fallback
+            content = await simulation_llm.achat_json(prompt)
+        except StructuredOutputError as e:
+            # If we can't extract valid JSON, return fallback
+            print(f"Failed to parse JSON. Response starts with: {e.doc[:200]}...")
             return create_fallback_response(step_title)
+        
+        await set_cached_dialog(cache_key, content)
+        return content
             
     except Exception as e:
         # Fallback content in case of error
@@ -304,6 +324,79 @@ def create_fallback_response(step_title: str) -> Dict:
     }
 
 
+def apply_step_content(step: SimulationStep, llm_response: Dict) -> SimulationStep:
+    """Update a step with LLM-generated dialog pairs and tips, using the fallback if they're malformed"""
+    try:
+        if "dialog_pairs" in llm_response:
+            step.dialog_pairs = [DialogPair(**pair) for pair in llm_response["dialog_pairs"]]
+        
+        if "tips" in llm_response:
+            step.tips = [str(tip) for tip in llm_response["tips"]]
+    except Exception as e:
+        print(f"Invalid content generated for step {step.id}: {str(e)}")
+        fallback = create_fallback_response(step.title)
+        step.dialog_pairs = [DialogPair(**pair) for pair in fallback["dialog_pairs"]]
+        step.tips = fallback["tips"]
+    
+    return step
+
+async def generate_step_with_fallback(step: SimulationStep, symptom_data: Optional[SymptomData],
+                                      semaphore: asyncio.Semaphore, language: str = "en") -> SimulationStep:
+    """Generate content for one step within the concurrency limit and per-step timeout"""
+    async with semaphore:
+        try:
+            llm_response = await asyncio.wait_for(
+                generate_dialog_with_llm(
+                    step_id=step.id,
+                    step_title=step.title,
+                    step_description=step.description,
+                    symptom_data=symptom_data,
+                    language=language
+                ),
+                timeout=settings.SIMULATION.STEP_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            print(f"Timed out generating content for step {step.id}, using fallback")
+            llm_response = create_fallback_response(step.title)
+    
+    return apply_step_content(step, llm_response)
+
+async def generate_steps_content(steps: List[SimulationStep], symptom_data: Optional[SymptomData] = None,
+                                 language: str = "en") -> List[SimulationStep]:
+    """
+    Generate content for several steps concurrently, at most SIMULATION__MAX_CONCURRENCY at a time.
+    
+    Steps that fail or time out get the fallback content, so the result always has every step.
+    """
+    semaphore = asyncio.Semaphore(settings.SIMULATION.MAX_CONCURRENCY)
+    return await asyncio.gather(*[
+        generate_step_with_fallback(step, symptom_data, semaphore, language) for step in steps
+    ])
+
+async def iter_steps_content(steps: List[SimulationStep], symptom_data: Optional[SymptomData] = None,
+                             order: str = "step", language: str = "en") -> AsyncIterator[SimulationStep]:
+    """
+    Generate content for several steps concurrently and yield each step as soon as it's ready.
+    
+    order="step" yields the steps in their original order, order="completion" in the order
+    they finish. Pending generations are cancelled if the consumer stops early.
+    """
+    semaphore = asyncio.Semaphore(settings.SIMULATION.MAX_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(generate_step_with_fallback(step, symptom_data, semaphore, language))
+        for step in steps
+    ]
+    try:
+        if order == "completion":
+            for next_step in asyncio.as_completed(tasks):
+                yield await next_step
+        else:
+            for task in tasks:
+                yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
 
 @router.get("/simulation/steps", response_model=List[SimulationStep])
 async def get_simulation_steps(language: str = "en"):
@@ -356,7 +449,8 @@ async def generate_step_content(step_id: str, symptom_data: Optional[SymptomData
             step_id=step.id,
             step_title=step.title,
             step_description=step.description,
-            symptom_data=symptom_data
+            symptom_data=symptom_data,
+            language=language
         )
         print("simulated response: ", llm_response)
         
@@ -373,36 +467,34 @@ async def generate_step_content(step_id: str, symptom_data: Optional[SymptomData
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to generate step content: {str(e)}")
 
+async def run_personalized_simulation_job(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    language = payload.get("language", "en")
+    steps = await get_simulation_steps(language)
+    steps = await generate_steps_content(steps, SymptomData(**payload["symptom_data"]), language)
+    return [step.model_dump() for step in steps]
+
+job_queue.register("personalized_simulation", run_personalized_simulation_job)
+
 @router.post("/simulation/personalized-steps", response_model=List[SimulationStep])
-async def get_personalized_simulation_steps(symptom_data: SymptomData = Body(...), language: str = "en"):
+async def get_personalized_simulation_steps(symptom_data: SymptomData = Body(...), language: str = "en",
+                                            background: bool = False):
     """
     Get personalized hospital visit simulation steps based on the user's symptoms
+    
+    With background=true the steps are generated as a job instead, see /jobs.
     """
+    if background:
+        return await accepted_job_response("personalized_simulation", {
+            "symptom_data": symptom_data.model_dump(),
+            "language": language
+        })
+    
     try:
         # Get the base steps
         steps = await get_simulation_steps(language)
         
-        # Generate personalized content for each step
-        personalized_steps = []
-        for step in steps:
-            # Generate content for this step
-            llm_response = await generate_dialog_with_llm(
-                step_id=step.id,
-                step_title=step.title,
-                step_description=step.description,
-                symptom_data=symptom_data
-            )
-            
-            # Update the step with LLM-generated content
-            if "dialog_pairs" in llm_response:
-                step.dialog_pairs = [DialogPair(**pair) for pair in llm_response["dialog_pairs"]]
-            
-            if "tips" in llm_response:
-                step.tips = llm_response["tips"]
-            
-            personalized_steps.append(step)
-        
-        return personalized_steps
+        # Generate personalized content for all steps concurrently
+        return await generate_steps_content(steps, symptom_data, language)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate personalized simulation: {str(e)}")
 
@@ -421,29 +513,39 @@ async def generate_batch_content(step_ids: List[str] = Body(...), symptom_data:
         if not steps_to_generate:
             raise HTTPException(status_code=404, detail="No valid steps found for the provided IDs")
         
-        # Generate content for each requested step
-        result_steps = []
-        for step in steps_to_generate:
-            print("generate step information for step ", step)
-            # Generate dialog and tips with LLM
-            llm_response = await generate_dialog_with_llm(
-                step_id=step.id,
-                step_title=step.title,
-                step_description=step.description,
-                symptom_data=symptom_data
-            )
-            
-            # Update the step with LLM-generated content
-            if "dialog_pairs" in llm_response:
-                step.dialog_pairs = [DialogPair(**pair) for pair in llm_response["dialog_pairs"]]
-            
-            if "tips" in llm_response:
-                step.tips = llm_response["tips"]
-            
-            result_steps.append(step)
-        
-        return result_steps
+        # Generate content for the requested steps concurrently
+        return await generate_steps_content(steps_to_generate, symptom_data, language)
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
-        raise HTTPException(status_code=500, detail=f"Failed to generate batch content: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to generate batch content: {str(e)}") 
+
+@router.post("/simulation/personalized-steps/stream")
+async def stream_personalized_simulation_steps(symptom_data: SymptomData = Body(...), language: str = "en",
+                                               order: str = "step"):
+    """
+    Stream personalized simulation steps as Server-Sent Events, one "step" event per step
+    as soon as its content is generated, followed by a "done" event.
+    
+    order is "step" (original step order) or "completion" (as soon as each step finishes).
+    """
+    if order not in ("step", "completion"):
+        raise HTTPException(status_code=400, detail="order must be 'step' or 'completion'")
+    
+    steps = await get_simulation_steps(language)
+    step_indexes = {step.id: index for index, step in enumerate(steps)}
+    
+    async def event_stream():
+        try:
+            async for step in iter_steps_content(steps, symptom_data, order, language):
+                yield f"event: step\nid: {step_indexes[step.id]}\ndata: {step.model_dump_json()}\n\n"
+            yield f"event: done\ndata: {json.dumps({'total': len(steps)})}\n\n"
+        except Exception as e:
+            print(f"Error streaming simulation steps: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,8 +1,20 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
+import json
 
-from app.services.speech_services import transcribe_audio, generate_speech
+from app.services.speech_services import (
+    transcribe_audio,
+    transcribe_buffer,
+    generate_speech,
+    synthesize_speech,
+    stream_speech,
+    AudioChunkBuffer,
+    AudioTooLargeError
+)
+from app.services.conversation_service import get_conversation
+from app.services.symptom_chat_processing import reply_to_message
 
 router = APIRouter()
 
@@ -26,6 +38,41 @@ async def convert_text_to_speech(request: TextToSpeechRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Text-to-speech conversion failed: {str(e)}")
 
+async def stream_speech_response(text: str, language: str, voice_type: Optional[str]) -> StreamingResponse:
+    """
+    Start streaming speech and return it as a chunked audio/mpeg response.
+    
+    The first chunk is fetched before responding so provider errors still produce a 500.
+    """
+    audio_stream = stream_speech(text, language, voice_type)
+    try:
+        first_chunk = await audio_stream.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Text-to-speech conversion failed: {str(e)}")
+    
+    async def audio_chunks():
+        yield first_chunk
+        async for chunk in audio_stream:
+            yield chunk
+    
+    return StreamingResponse(audio_chunks(), media_type="audio/mpeg", headers={"Cache-Control": "no-cache"})
+
+@router.post("/speech/text-to-speech/stream")
+async def stream_text_to_speech(request: TextToSpeechRequest):
+    """
+    Convert text to speech, streaming the MP3 audio as it is generated
+    """
+    return await stream_speech_response(request.text, request.language, request.voice_type)
+
+@router.get("/speech/text-to-speech/stream")
+async def stream_text_to_speech_get(text: str, language: str = "en", voice_type: Optional[str] = "female"):
+    """
+    Same as the POST endpoint, usable directly as the src of an audio element
+    """
+    return await stream_speech_response(text, language, voice_type)
+
 @router.post("/speech/speech-to-text", response_model=SpeechToTextResponse)
 async def convert_speech_to_text(audio_file: UploadFile = File(...), language: str = "en"):
     """
@@ -35,5 +82,109 @@ async def convert_speech_to_text(audio_file: UploadFile = File(...), language: s
         transcript = await transcribe_audio(audio_file, language)
         print("Transcript: ", transcript)
         return transcript
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Speech-to-text conversion failed: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Speech-to-text conversion failed: {str(e)}") 
+
+@router.websocket("/speech/voice/{conversation_id}")
+async def voice_session(websocket: WebSocket, conversation_id: str, language: str = "en",
+                        voice_type: Optional[str] = "female"):
+    """
+    Voice conversation over a single WebSocket, replacing the speech-to-text,
+    message and text-to-speech round-trips of each turn.
+    
+    The client sends the audio of an utterance as binary messages while it is being
+    recorded, then {"type": "end"} (optionally with "filename" and "content_type").
+    {"type": "text", "content": ...} sends a typed message instead, and {"type": "cancel"}
+    discards the audio received so far.
+    
+    For each turn the server sends:
+    - {"type": "transcript", "text": ...} (for audio turns)
+    - {"type": "reply", "response": ..., "symptoms": ...}
+    - the MP3 audio of the reply as a binary message
+    - {"type": "done"}
+    Errors are sent as {"type": "error", "detail": ...} without closing the socket.
+    """
+    await websocket.accept()
+    if not await get_conversation(conversation_id):
+        await websocket.send_json({"type": "error", "detail": "Conversation not found"})
+        await websocket.close(code=4404)
+        return
+    
+    async def reply(content: str):
+        result = await reply_to_message(conversation_id, content)
+        if result is None:
+            await websocket.send_json({"type": "error", "detail": "Conversation not found"})
+            return
+        await websocket.send_json({
+            "type": "reply",
+            "response": result["response"],
+            "symptoms": result["updated_symptoms"]
+        })
+        try:
+            await websocket.send_bytes(await synthesize_speech(result["response"], language, voice_type))
+        except WebSocketDisconnect:
+            raise
+        except Exception as e:
+            await websocket.send_json({"type": "error", "detail": f"Text-to-speech conversion failed: {str(e)}"})
+        await websocket.send_json({"type": "done"})
+    
+    audio = AudioChunkBuffer()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            
+            # Buffer audio chunks as they arrive
+            if message.get("bytes") is not None:
+                try:
+                    audio.write(message["bytes"])
+                except AudioTooLargeError as e:
+                    audio.close()
+                    audio = AudioChunkBuffer()
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            
+            try:
+                command = json.loads(message.get("text") or "")
+            except json.JSONDecodeError:
+                command = None
+            if not isinstance(command, dict):
+                await websocket.send_json({"type": "error", "detail": "Expected audio or a JSON command"})
+                continue
+            
+            command_type = command.get("type")
+            if command_type == "cancel":
+                audio.close()
+                audio = AudioChunkBuffer()
+            elif command_type == "text":
+                await reply(command.get("content", ""))
+            elif command_type == "end":
+                utterance, audio = audio, AudioChunkBuffer()
+                try:
+                    text = await transcribe_buffer(
+                        utterance.rewind(),
+                        filename=command.get("filename", "audio.wav"),
+                        language=language,
+                        content_type=command.get("content_type")
+                    )
+                except Exception as e:
+                    await websocket.send_json({"type": "error", "detail": f"Speech-to-text conversion failed: {str(e)}"})
+                    continue
+                finally:
+                    utterance.close()
+                
+                print("Transcript: ", text)
+                await websocket.send_json({"type": "transcript", "text": text})
+                if text.strip():
+                    await reply(text)
+                else:
+                    await websocket.send_json({"type": "done"})
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown command: {command_type}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        audio.close()
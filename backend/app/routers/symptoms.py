@@ -1,23 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
+import asyncio
+import base64
+import json
 import traceback
 import logging
 
-from app.services.symptom_analysis import analyze_symptoms
-from app.services.symptom_chat_processing import process_conversation
+from app.services.symptom_analysis import analyze_symptoms_with_llm, FALLBACK_TRIAGE_RESULT
+from app.services.triage_rules import fast_path_triage
+from app.services.symptom_chat_processing import process_conversation, reply_to_message, stream_conversation
+from app.services.speech_services import synthesize_speech
 from app.services.conversation_service import (
     create_conversation, 
     get_conversation,
     add_message,
-    update_symptoms,
-    get_messages,
-    get_symptoms
+    save_reply,
+    get_new_messages
 )
-from app.services.diagnosis_recommendation import generate_diagnosis_recommendation
+from app.services.diagnosis_recommendation import generate_diagnosis_recommendation, FALLBACK_RECOMMENDATION
+from app.services.symptom_cache import cached_symptom_response, CACHE_STATUS_HEADER, CACHE_BYPASS
+from app.utils.helpers import split_complete_sentences
 
 router = APIRouter()
 
+# Replies still being generated for streamed messages, referenced so they finish after a disconnect
+_reply_tasks = set()
+
 class PainArea(BaseModel):
     area: str
     intensity: int
@@ -49,16 +59,35 @@ class MessageRequest(BaseModel):
     conversation_id: str
     content: str
 
+class StreamMessageRequest(MessageRequest):
+    language: str = "en"
+    voice_type: str = "female"
+
 class ConversationRequest(BaseModel):
     conversation_id: Optional[str] = None
 
 @router.post("/symptoms/analyze", response_model=TriageResult)
-async def analyze_user_symptoms(symptom_data: SymptomInput):
+async def analyze_user_symptoms(symptom_data: SymptomInput, response: Response):
     """
     Analyze the user's symptoms and provide a triage result
+    
+    Clear-cut cases are decided by the triage rules before the cache is consulted, since
+    the cache buckets intensities more coarsely than the rules. LLM results are cached per
+    canonical symptom payload, see the X-Cache-Status header.
     """
     try:
-        result = analyze_symptoms(symptom_data)
+        result = fast_path_triage(symptom_data)
+        if result is not None:
+            response.headers[CACHE_STATUS_HEADER] = CACHE_BYPASS
+            return result
+        
+        result, cache_status = await cached_symptom_response(
+            "analyze",
+            symptom_data.model_dump(),
+            lambda: analyze_symptoms_with_llm(symptom_data),
+            cacheable=lambda result: result != FALLBACK_TRIAGE_RESULT
+        )
+        response.headers[CACHE_STATUS_HEADER] = cache_status
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to analyze symptoms: {str(e)}")
@@ -71,7 +100,7 @@ async def process_symptom_conversation(conversation_data: ConversationInput):
     """
     try:
         print("Received conversation data:", conversation_data)
-        result = process_conversation(conversation_data.conversation, conversation_data.current_symptoms)
+        result = await process_conversation(conversation_data.conversation, conversation_data.current_symptoms)
         return result
     except Exception as e:
         error_traceback = traceback.format_exc()
@@ -82,12 +111,13 @@ async def process_symptom_conversation(conversation_data: ConversationInput):
 @router.post("/symptoms/conversation/start")
 async def start_conversation():
     """Start a new conversation and return the conversation ID"""
-    conversation_id = create_conversation()
+    conversation_id = await create_conversation()
+    conversation = await get_conversation(conversation_id)
     
     return {
         "conversation_id": conversation_id,
-        "messages": get_messages(conversation_id),
-        "symptoms": get_symptoms(conversation_id)
+        "messages": conversation["messages"],
+        "symptoms": conversation["symptoms"]
     }
 
 @router.post("/symptoms/message")
@@ -101,39 +131,139 @@ async def add_conversation_message(message_data: MessageRequest):
     """
     conversation_id = message_data.conversation_id
     
-    # Get current conversation data
-    conversation = get_conversation(conversation_id)
-    if not conversation:
+    # Add user message, process the conversation and store the reply
+    result = await reply_to_message(conversation_id, message_data.content)
+    if result is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Add user message
-    add_message(conversation_id, "user", message_data.content)
-    
-    # Process conversation
-    conversation_data = get_conversation(conversation_id)
-    result = process_conversation(
-        conversation=conversation_data["messages"],
-        current_symptoms=conversation_data["symptoms"]
-    )
-    
-    # Add system response
-    add_message(conversation_id, "system", result["response"])
-    
-    # Update symptoms
-    if "updated_symptoms" in result:
-        update_symptoms(conversation_id, result["updated_symptoms"])
-    
     # Return updated conversation
     return {
         "conversation_id": conversation_id,
-        "messages": get_messages(conversation_id),
-        "symptoms": get_symptoms(conversation_id)
+        "messages": result["messages"],
+        "symptoms": result["updated_symptoms"]
     }
 
+@router.post("/symptoms/message/stream")
+async def stream_conversation_message(message_data: StreamMessageRequest):
+    """
+    Add a user message to a conversation and stream the reply with speech
+    
+    The reply is streamed as server-sent events:
+    - delta: a piece of the reply text as it is generated
+    - sentence: a complete sentence of the reply, with its index
+    - audio: base64 MP3 audio for the sentence with the same index (or an error)
+    - done: the updated conversation, once the reply and all audio have been sent
+    
+    Speech for each sentence is synthesized while the following sentences are still being generated.
+    """
+    conversation_id = message_data.conversation_id
+    
+    conversation_data = await add_message(conversation_id, "user", message_data.content)
+    if conversation_data is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    messages = list(conversation_data["messages"])
+    new_messages = get_new_messages(conversation_data)
+    
+    async def speak(index: int, sentence: str) -> Dict[str, Any]:
+        try:
+            audio_data = await synthesize_speech(sentence, message_data.language, message_data.voice_type)
+            return {"index": index, "audio_data": base64.b64encode(audio_data).decode("utf-8")}
+        except Exception as e:
+            print(f"Error synthesizing sentence {index}: {str(e)}")
+            return {"index": index, "error": str(e)}
+    
+    async def generate_reply(events: asyncio.Queue):
+        """Generate the reply and store it, even if the client disconnects midway"""
+        try:
+            async for event in stream_conversation(
+                conversation=messages,
+                current_symptoms=conversation_data["symptoms"],
+                new_messages=new_messages
+            ):
+                if event["type"] == "done":
+                    await save_reply(
+                        conversation_id,
+                        event["response"],
+                        event["updated_symptoms"],
+                        extracted_message_count=len(messages) if event["symptoms_extracted"] else None
+                    )
+                events.put_nowait(event)
+        except Exception as e:
+            print(f"Error streaming conversation message: {str(e)}")
+            events.put_nowait({"type": "error", "detail": str(e)})
+    
+    async def event_stream():
+        events: asyncio.Queue = asyncio.Queue()
+        audio_queue: asyncio.Queue = asyncio.Queue()
+        speech_tasks = []
+        audio_sent = 0
+        
+        # The reply is generated in its own task, so a disconnect doesn't leave the user turn unanswered
+        reply_task = asyncio.create_task(generate_reply(events))
+        _reply_tasks.add(reply_task)
+        reply_task.add_done_callback(_reply_tasks.discard)
+        
+        def start_sentence(sentence: str) -> str:
+            index = len(speech_tasks)
+            task = asyncio.create_task(speak(index, sentence))
+            task.add_done_callback(lambda t: t.cancelled() or audio_queue.put_nowait(t.result()))
+            speech_tasks.append(task)
+            return f"event: sentence\ndata: {json.dumps({'index': index, 'text': sentence})}\n\n"
+        
+        def audio_frame(audio: Dict[str, Any]) -> str:
+            nonlocal audio_sent
+            audio_sent += 1
+            return f"event: audio\ndata: {json.dumps(audio)}\n\n"
+        
+        try:
+            pending_text = ""
+            while True:
+                event = await events.get()
+                if event["type"] == "error":
+                    yield f"event: error\ndata: {json.dumps({'detail': event['detail']})}\n\n"
+                    return
+                if event["type"] == "delta":
+                    yield f"event: delta\ndata: {json.dumps({'text': event['text']})}\n\n"
+                    sentences, pending_text = split_complete_sentences(pending_text + event["text"])
+                    for sentence in sentences:
+                        yield start_sentence(sentence)
+                    # Interleave the audio that is ready with the text
+                    while not audio_queue.empty():
+                        yield audio_frame(audio_queue.get_nowait())
+                    continue
+                
+                if pending_text.strip():
+                    yield start_sentence(pending_text.strip())
+                done = {
+                    "conversation_id": conversation_id,
+                    "messages": messages + [{"role": "system", "content": event["response"]}],
+                    "symptoms": event["updated_symptoms"]
+                }
+                break
+            
+            # Send the audio of the remaining sentences as it completes
+            while audio_sent < len(speech_tasks):
+                yield audio_frame(await audio_queue.get())
+            
+            yield f"event: done\ndata: {json.dumps(done)}\n\n"
+        except Exception as e:
+            print(f"Error streaming conversation message: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            for task in speech_tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 @router.get("/symptoms/conversation")
 async def get_conversation_data(conversation_id: str):
     """Get conversation data using a query parameter"""
-    conversation = get_conversation(conversation_id)
+    conversation = await get_conversation(conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
@@ -144,12 +274,20 @@ async def get_conversation_data(conversation_id: str):
     }
 
 @router.post("/symptoms/diagnosis")
-async def get_diagnosis_recommendation(symptoms: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+async def get_diagnosis_recommendation(response: Response, symptoms: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
     """
     Generate a diagnosis recommendation based on provided symptoms
+    
+    Recommendations are cached per canonical symptom payload, see the X-Cache-Status header.
     """
     try:
-        recommendation = generate_diagnosis_recommendation(symptoms)
+        recommendation, cache_status = await cached_symptom_response(
+            "diagnosis",
+            symptoms,
+            lambda: generate_diagnosis_recommendation(symptoms),
+            cacheable=lambda recommendation: recommendation != FALLBACK_RECOMMENDATION
+        )
+        response.headers[CACHE_STATUS_HEADER] = cache_status
         return recommendation
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,108 @@
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# tiktoken is optional; without it token counts are estimated from the text length
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Approximate number of characters per token when tiktoken isn't available
+CHARS_PER_TOKEN = 4
+# Tokens added by the chat format for every message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=16)
+def _get_encoding(model_name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    """Count the tokens in a piece of text for the given model"""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text))
+
+
+@lru_cache(maxsize=4096)
+def count_message_tokens(role: str, content: str, model_name: str) -> int:
+    """Count the tokens of a chat message, cached so each message is only encoded once"""
+    return count_tokens(content or "", model_name) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str) -> str:
+    """Keep the end of the text so that it fits in max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return text[-max_tokens * CHARS_PER_TOKEN:]
+    tokens = encoding.encode(text)
+    return encoding.decode(tokens[-max_tokens:])
+
+
+def summarize_dropped_turns(dropped: List[Dict[str, str]], max_tokens: int, model_name: str) -> Optional[Dict[str, str]]:
+    """
+    Condense turns that no longer fit into a single system message.
+    
+    Only the user's own statements are kept (most recent last), trimmed to max_tokens.
+    """
+    statements = [m["content"] for m in dropped if m.get("role") == "user" and m.get("content")]
+    if not statements:
+        return None
+    
+    prefix = "Summary of earlier messages from the user (older turns omitted): "
+    budget = max_tokens - count_message_tokens("system", prefix, model_name)
+    text = truncate_to_tokens(" | ".join(statements), budget, model_name)
+    if not text:
+        return None
+    return {"role": "system", "content": prefix + text}
+
+
+def fit_context(context: List[Dict[str, str]], budget: int, reserved_tokens: int,
+                model_name: str, summary_tokens: int = 0) -> List[Dict[str, str]]:
+    """
+    Keep the most recent turns of context that fit in the token budget.
+    
+    reserved_tokens covers the system prompt and the new message, which are always sent.
+    Older turns that don't fit are dropped, and summarized into up to summary_tokens
+    tokens if summary_tokens is set.
+    """
+    available = budget - reserved_tokens
+    if available <= 0:
+        return []
+    
+    token_counts = [
+        count_message_tokens(message.get("role", ""), message.get("content") or "", model_name)
+        for message in context
+    ]
+    if sum(token_counts) <= available:
+        return context
+    
+    # Leave room for the summary of the turns that get dropped
+    summary_tokens = min(summary_tokens, available // 2)
+    available -= summary_tokens
+    
+    kept = []
+    used = 0
+    for message, tokens in zip(reversed(context), reversed(token_counts)):
+        if used + tokens > available:
+            break
+        kept.append(message)
+        used += tokens
+    kept.reverse()
+    
+    dropped = context[:len(context) - len(kept)]
+    if summary_tokens:
+        summary = summarize_dropped_turns(dropped, summary_tokens, model_name)
+        if summary:
+            kept.insert(0, summary)
+    
+    return kept
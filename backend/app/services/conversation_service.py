@@ -1,17 +1,66 @@
 from typing import Dict, List, Any, Optional
+import asyncio
 import uuid
 
-# In-memory storage for conversations (in production, use a database)
-conversation_store = {}
+from app.config import settings
+from app.services.conversation_store import ConversationStore, MemoryConversationStore, SQLiteConversationStore
+from app.utils.metrics import register_stats
 
-def create_conversation() -> str:
+def create_conversation_store() -> ConversationStore:
+    """Create the conversation store for the configured backend ("memory" or "sqlite")"""
+    if settings.CONVERSATION.STORE_BACKEND == "sqlite":
+        return SQLiteConversationStore(
+            path=settings.CONVERSATION.STORE_SQLITE_PATH,
+            ttl_seconds=settings.CONVERSATION.STORE_TTL_SECONDS
+        )
+    return MemoryConversationStore(
+        max_entries=settings.CONVERSATION.STORE_MAX_ENTRIES,
+        ttl_seconds=settings.CONVERSATION.STORE_TTL_SECONDS,
+        max_bytes=settings.CONVERSATION.STORE_MAX_BYTES
+    )
+
+# Storage for conversations, in memory or shared across workers in SQLite
+conversation_store: ConversationStore = create_conversation_store()
+register_stats("conversation_store", lambda: conversation_store.stats())
+
+# First message of every conversation
+GREETING_MESSAGE = "Hello! Please describe your symptoms. Where are you experiencing pain or discomfort?"
+
+_sweeper_task: Optional[asyncio.Task] = None
+
+def start_conversation_sweeper():
+    """Start the background task that evicts idle conversations"""
+    global _sweeper_task
+    if _sweeper_task is None:
+        _sweeper_task = asyncio.create_task(
+            conversation_store.run_sweeper(settings.CONVERSATION.STORE_SWEEP_INTERVAL_SECONDS)
+        )
+
+async def stop_conversation_sweeper():
+    """Stop the background sweeper task"""
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
+
+async def _run_store(function, *args, **kwargs):
+    """Run a store operation, in a worker thread if the backend blocks on I/O"""
+    if conversation_store.blocking:
+        return await asyncio.to_thread(function, *args, **kwargs)
+    return function(*args, **kwargs)
+
+async def create_conversation() -> str:
     """Create a new conversation and return its ID"""
     conversation_id = str(uuid.uuid4())
-    conversation_store[conversation_id] = {
+    await _run_store(conversation_store.create, conversation_id, {
         "messages": [
             {
                 "role": "system", 
-                "content": "Hello! Please describe your symptoms. Where are you experiencing pain or discomfort?"
+                "content": GREETING_MESSAGE
             }
         ],
         "symptoms": {
@@ -19,47 +68,109 @@ def create_conversation() -> str:
             "main_symptoms": [],
             "emotional_state": None,
             "emotional_scale": None
-        }
-    }
+        },
+        # Number of messages already covered by the stored symptoms
+        "extracted_message_count": 0
+    })
     return conversation_id
 
-def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
+async def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
     """Get a conversation by ID"""
+    return await _run_store(conversation_store.get, conversation_id)
+
+def _append_and_get(conversation_id: str, message: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    if not conversation_store.append_message(conversation_id, message):
+        return None
     return conversation_store.get(conversation_id)
 
-def add_message(conversation_id: str, role: str, content: str) -> bool:
-    """Add a message to an existing conversation"""
-    conversation = get_conversation(conversation_id)
-    if not conversation:
-        return False
+async def add_message(conversation_id: str, role: str, content: str) -> Optional[Dict[str, Any]]:
+    """
+    Add a message to an existing conversation
     
-    conversation["messages"].append({
+    Returns the updated conversation, or None if the conversation doesn't exist.
+    """
+    return await _run_store(_append_and_get, conversation_id, {
         "role": role,
         "content": content
     })
-    return True
 
-def update_symptoms(conversation_id: str, symptoms: Dict[str, Any]) -> bool:
-    """Update symptoms for a conversation"""
-    conversation = get_conversation(conversation_id)
-    if not conversation:
-        return False
+def _update_symptoms(conversation_id: str, symptoms: Dict[str, Any], merge: bool,
+                     extracted_message_count: Optional[int]) -> bool:
+    if merge:
+        conversation = conversation_store.get(conversation_id)
+        if not conversation:
+            return False
+        symptoms = merge_symptoms(conversation["symptoms"], symptoms)
     
-    conversation["symptoms"] = symptoms
-    return True
+    fields = {"symptoms": symptoms}
+    if extracted_message_count is not None:
+        fields["extracted_message_count"] = extracted_message_count
+    return conversation_store.update(conversation_id, **fields)
 
-def get_messages(conversation_id: str) -> Optional[List[Dict[str, str]]]:
-    """Get all messages for a conversation"""
-    conversation = get_conversation(conversation_id)
-    if not conversation:
-        return None
+async def update_symptoms(conversation_id: str, symptoms: Dict[str, Any], merge: bool = False,
+                          extracted_message_count: Optional[int] = None) -> bool:
+    """
+    Update symptoms for a conversation
     
-    return conversation["messages"]
+    With merge=True the symptoms are merged into the stored ones (see merge_symptoms)
+    instead of replacing them. extracted_message_count records how many messages
+    the symptoms were extracted from, for incremental extraction.
+    """
+    return await _run_store(_update_symptoms, conversation_id, symptoms, merge, extracted_message_count)
 
-def get_symptoms(conversation_id: str) -> Optional[Dict[str, Any]]:
-    """Get symptoms for a conversation"""
-    conversation = get_conversation(conversation_id)
-    if not conversation:
-        return None
+def _save_reply(conversation_id: str, response: str, symptoms: Optional[Dict[str, Any]],
+                extracted_message_count: Optional[int]):
+    with conversation_store.batch():
+        conversation_store.append_message(conversation_id, {"role": "system", "content": response})
+        if symptoms is not None:
+            _update_symptoms(conversation_id, symptoms, False, extracted_message_count)
+
+async def save_reply(conversation_id: str, response: str, symptoms: Optional[Dict[str, Any]] = None,
+                     extracted_message_count: Optional[int] = None):
+    """Store the system reply and the updated symptoms of a turn in one transaction"""
+    await _run_store(_save_reply, conversation_id, response, symptoms, extracted_message_count)
+
+def merge_symptoms(previous: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge newly extracted symptoms into previously extracted ones.
     
-    return conversation["symptoms"] 
\ No newline at end of file
+    Pain areas are matched by area name, symptom lists are combined, and other
+    fields are only overwritten by values that aren't None.
+    """
+    merged = dict(previous)
+    for key, value in update.items():
+        if key == "pain_areas":
+            merged[key] = _merge_pain_areas(previous.get(key) or [], value or [])
+        elif key in ("main_symptoms", "additional_symptoms"):
+            merged[key] = _merge_symptom_lists(previous.get(key) or [], value or [])
+        elif value is not None:
+            merged[key] = value
+    return merged
+
+def _merge_pain_areas(previous: List[Dict[str, Any]], update: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    merged = [dict(area) for area in previous]
+    by_area = {str(area.get("area", "")).lower(): area for area in merged}
+    for area in update:
+        existing = by_area.get(str(area.get("area", "")).lower())
+        if existing is None:
+            merged.append(dict(area))
+            by_area[str(area.get("area", "")).lower()] = merged[-1]
+        else:
+            existing.update({k: v for k, v in area.items() if v is not None})
+    return merged
+
+def _merge_symptom_lists(previous: List[str], update: List[str]) -> List[str]:
+    merged = list(previous)
+    seen = {str(symptom).lower() for symptom in merged}
+    for symptom in update:
+        if str(symptom).lower() not in seen:
+            merged.append(symptom)
+            seen.add(str(symptom).lower())
+    # "no other symptoms" no longer applies once real symptoms are reported
+    if len(merged) > 1:
+        merged = [s for s in merged if str(s).lower() != "no other symptoms"]
+    return merged
+
+def get_new_messages(conversation: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Get the messages of a loaded conversation added since the symptoms were last extracted"""
+    return conversation["messages"][conversation.get("extracted_message_count", 0):]
@@ -0,0 +1,387 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory footprint of a JSON-like value in bytes"""
+    return len(json.dumps(value, default=str, ensure_ascii=False).encode("utf-8"))
+
+
+class ConversationStore(ABC):
+    """
+    Interface for conversation storage backends.
+    
+    A conversation is a dict with "messages", "symptoms" and any extra fields
+    (e.g. "extracted_message_count"). Messages are only ever appended.
+    
+    Backends whose operations block on I/O set blocking, so callers run them off the event loop.
+    """
+    
+    blocking = False
+    
+    @abstractmethod
+    def create(self, conversation_id: str, conversation: Dict[str, Any]):
+        ...
+    
+    @abstractmethod
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        ...
+    
+    @abstractmethod
+    def append_message(self, conversation_id: str, message: Dict[str, str]) -> bool:
+        ...
+    
+    @abstractmethod
+    def update(self, conversation_id: str, **fields) -> bool:
+        """Replace top-level fields other than "messages" (e.g. symptoms)"""
+    
+    @abstractmethod
+    def delete(self, conversation_id: str) -> bool:
+        ...
+    
+    def batch(self):
+        """Context manager grouping the writes made inside it, where the backend supports it"""
+        return nullcontext()
+    
+    def sweep(self) -> int:
+        """Remove expired conversations and return how many were removed"""
+        return 0
+    
+    def stats(self) -> Dict[str, Any]:
+        return {}
+    
+    async def run_sweeper(self, interval_seconds: float):
+        """Periodically sweep expired conversations until cancelled"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                removed = await asyncio.to_thread(self.sweep) if self.blocking else self.sweep()
+                if removed:
+                    print(f"Conversation store sweeper removed {removed} conversations")
+            except Exception as e:
+                print(f"Error sweeping conversation store: {str(e)}")
+
+
+class MemoryConversationStore(ConversationStore):
+    """
+    In-process conversation store with LRU and idle-TTL eviction.
+    
+    The store holds at most max_entries conversations and max_bytes of estimated
+    conversation data; the least recently used conversations are evicted first.
+    Conversations idle for longer than ttl_seconds are treated as gone.
+    """
+    
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600, max_bytes: int = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        
+        # conversation_id -> {"conversation", "size", "last_access"}, least recently used first
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return bool(self.ttl_seconds) and now - entry["last_access"] > self.ttl_seconds
+    
+    def _remove(self, conversation_id: str):
+        entry = self._entries.pop(conversation_id)
+        self._total_bytes -= entry["size"]
+    
+    def _touch(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Get a live entry and mark it as most recently used, counting hits and misses"""
+        entry = self._entries.get(conversation_id)
+        now = time.monotonic()
+        if entry is not None and self._is_expired(entry, now):
+            self._remove(conversation_id)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        entry["last_access"] = now
+        self._entries.move_to_end(conversation_id)
+        return entry
+    
+    def _resize(self, entry: Dict[str, Any], size: int):
+        self._total_bytes += size - entry["size"]
+        entry["size"] = size
+    
+    def _enforce_limits(self):
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self._total_bytes > self.max_bytes and len(self._entries) > 1)
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+    
+    def create(self, conversation_id: str, conversation: Dict[str, Any]):
+        with self._lock:
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+            self._entries[conversation_id] = {
+                "conversation": conversation,
+                "size": 0,
+                "last_access": time.monotonic()
+            }
+            self._resize(self._entries[conversation_id], estimate_size(conversation))
+            self._enforce_limits()
+    
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._touch(conversation_id)
+            return entry["conversation"] if entry else None
+    
+    def append_message(self, conversation_id: str, message: Dict[str, str]) -> bool:
+        with self._lock:
+            entry = self._touch(conversation_id)
+            if not entry:
+                return False
+            entry["conversation"]["messages"].append(message)
+            self._resize(entry, entry["size"] + estimate_size(message))
+            self._enforce_limits()
+            return True
+    
+    def update(self, conversation_id: str, **fields) -> bool:
+        with self._lock:
+            entry = self._touch(conversation_id)
+            if not entry:
+                return False
+            conversation = entry["conversation"]
+            size = entry["size"]
+            for key, value in fields.items():
+                if key in conversation:
+                    size -= estimate_size(conversation[key])
+                conversation[key] = value
+                size += estimate_size(value)
+            self._resize(entry, size)
+            self._enforce_limits()
+            return True
+    
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            if conversation_id not in self._entries:
+                return False
+            self._remove(conversation_id)
+            return True
+    
+    def sweep(self) -> int:
+        with self._lock:
+            now = time.monotonic()
+            expired = [cid for cid, entry in self._entries.items() if self._is_expired(entry, now)]
+            for conversation_id in expired:
+                self._remove(conversation_id)
+            self.expirations += len(expired)
+            return len(expired)
+    
+    def get_size(self, conversation_id: str) -> Optional[int]:
+        """Get the estimated size of a conversation in bytes"""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            return entry["size"] if entry else None
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Conversation store backed by a SQLite database, shared by every worker process.
+    
+    The database runs in WAL mode so readers don't block the writer. Messages are
+    append-only rows and symptoms are stored as a JSON column. Writes made inside
+    batch() are committed in a single transaction.
+    """
+    
+    blocking = True
+    
+    def __init__(self, path: str, ttl_seconds: float = 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    symptoms TEXT NOT NULL,
+                    extra TEXT NOT NULL DEFAULT '{}',
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    conversation_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (conversation_id, seq)
+                );
+                CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at);
+            """)
+            self._conn.commit()
+    
+    def _commit(self):
+        if not self._batch_depth:
+            self._conn.commit()
+    
+    @contextmanager
+    def batch(self):
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield
+            except Exception:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._conn.rollback()
+                raise
+            self._batch_depth -= 1
+            self._commit()
+    
+    def _insert_messages(self, conversation_id: str, messages: List[Dict[str, str]], now: float):
+        self._conn.executemany(
+            "INSERT INTO messages (conversation_id, seq, role, content, created_at) "
+            "SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ?, ? FROM messages WHERE conversation_id = ?",
+            [(conversation_id, m["role"], m["content"], now, conversation_id) for m in messages]
+        )
+    
+    def _delete(self, conversation_ids: List[str]):
+        self._conn.executemany("DELETE FROM messages WHERE conversation_id = ?", [(cid,) for cid in conversation_ids])
+        self._conn.executemany("DELETE FROM conversations WHERE id = ?", [(cid,) for cid in conversation_ids])
+    
+    def create(self, conversation_id: str, conversation: Dict[str, Any]):
+        now = time.time()
+        extra = {k: v for k, v in conversation.items() if k not in ("messages", "symptoms")}
+        with self.batch():
+            self._delete([conversation_id])
+            self._conn.execute(
+                "INSERT INTO conversations (id, symptoms, extra, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (conversation_id, json.dumps(conversation.get("symptoms")), json.dumps(extra), now, now)
+            )
+            self._insert_messages(conversation_id, conversation.get("messages", []), now)
+    
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT symptoms, extra, updated_at FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and time.time() - row[2] > self.ttl_seconds:
+                self._delete([conversation_id])
+                self._commit()
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            messages = self._conn.execute(
+                "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY seq", (conversation_id,)
+            ).fetchall()
+        
+        conversation = json.loads(row[1])
+        conversation["messages"] = [{"role": role, "content": content} for role, content in messages]
+        conversation["symptoms"] = json.loads(row[0])
+        return conversation
+    
+    def append_message(self, conversation_id: str, message: Dict[str, str]) -> bool:
+        now = time.time()
+        with self.batch():
+            cursor = self._conn.execute(
+                "UPDATE conversations SET updated_at = ? WHERE id = ?", (now, conversation_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._insert_messages(conversation_id, [message], now)
+            return True
+    
+    def update(self, conversation_id: str, **fields) -> bool:
+        now = time.time()
+        with self.batch():
+            row = self._conn.execute("SELECT extra FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+            if row is None:
+                return False
+            extra = json.loads(row[0])
+            extra.update({k: v for k, v in fields.items() if k not in ("messages", "symptoms")})
+            if "symptoms" in fields:
+                self._conn.execute(
+                    "UPDATE conversations SET symptoms = ?, extra = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(fields["symptoms"]), json.dumps(extra), now, conversation_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE conversations SET extra = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(extra), now, conversation_id)
+                )
+            return True
+    
+    def delete(self, conversation_id: str) -> bool:
+        with self.batch():
+            exists = self._conn.execute("SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+            self._delete([conversation_id])
+            return exists is not None
+    
+    def sweep(self) -> int:
+        if not self.ttl_seconds:
+            return 0
+        with self.batch():
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT id FROM conversations WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            ).fetchall()]
+            self._delete(expired)
+        self.expirations += len(expired)
+        return len(expired)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(symptoms) + LENGTH(extra)), 0) FROM conversations").fetchone()
+            message_bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(content)), 0) FROM messages").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries[0],
+            "total_bytes": entries[1] + message_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expirations": self.expirations
+        }
@@ -2,6 +2,16 @@ from typing import Dict, List, Any, Optional
 import json
 from json.decoder import JSONDecodeError
 from app.services.llm import LLM
+from app.models.diagnosis import DiagnosisRecommendation
+
+# Returned when the LLM fails or its response can't be parsed
+FALLBACK_RECOMMENDATION = {
+    "recommendation_level": "yellow",
+    "recommendation_text": "Monitor your symptoms for 24-48 hours. If they worsen, consult a healthcare provider.",
+    "potential_conditions": [],
+    "specialty": "General practice",
+    "urgent": False
+}
 
 # Create an LLM instance for generating diagnosis recommendations
 diagnosis_llm = LLM(
@@ -44,29 +54,11 @@ diagnosis_llm = LLM(
     ```
     
     Use "urgent": true only when symptoms indicate a potentially serious condition requiring prompt attention.
-    """
+    """,
+    response_schema=DiagnosisRecommendation
 )
 
-def extract_json_from_markdown(text: str) -> str:
-    """Extract JSON from markdown code blocks"""
-    # Look for JSON in code blocks
-    if "```json" in text:
-        start = text.find("```json")
-        end = text.find("```", start + 6)
-        if end != -1:
-            return text[start + 7:end].strip()
-    
-    # Look for any code blocks
-    if "```" in text:
-        start = text.find("```")
-        end = text.find("```", start + 3)
-        if end != -1:
-            return text[start + 3:end].strip()
-    
-    # If no code blocks, return the text as is (hoping it's valid JSON)
-    return text.strip()
-
-def generate_diagnosis_recommendation(symptoms: Dict[str, Any]) -> Dict[str, Any]:
+async def generate_diagnosis_recommendation(symptoms: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate a diagnosis recommendation based on the reported symptoms.
     
@@ -90,13 +82,7 @@ def generate_diagnosis_recommendation(symptoms: Dict[str, Any]) -> Dict[str, Any
         """
         
         # Get the diagnosis recommendation from the LLM
-        response_raw = diagnosis_llm.chat(message=prompt, context=None)
-        
-        # Clean the response to extract the actual JSON
-        response_json = extract_json_from_markdown(response_raw)
-        
-        # Parse the diagnosis recommendation
-        recommendation = json.loads(response_json)
+        recommendation = await diagnosis_llm.achat_json(message=prompt, context=None)
         
         print(f"Recommendation: {recommendation}")
         
@@ -104,23 +90,11 @@ def generate_diagnosis_recommendation(symptoms: Dict[str, Any]) -> Dict[str, Any
         
     except JSONDecodeError as e:
         print(f"Failed to parse JSON: {str(e)}")
-        print(f"Raw content: {response_raw}")
+        print(f"Raw content: {e.doc}")
         # Fall back to a generic recommendation if JSON parsing fails
-        return {
-            "recommendation_level": "yellow",
-            "recommendation_text": "Monitor your symptoms for 24-48 hours. If they worsen, consult a healthcare provider.",
-            "potential_conditions": [],
-            "specialty": "General practice",
-            "urgent": False
-        }
+        return dict(FALLBACK_RECOMMENDATION)
         
     except Exception as e:
         print(f"Error generating diagnosis recommendation: {str(e)}")
         # Fall back to a generic recommendation if LLM fails
-        return {
-            "recommendation_level": "yellow",
-            "recommendation_text": "Monitor your symptoms for 24-48 hours. If they worsen, consult a healthcare provider.",
-            "potential_conditions": [],
-            "specialty": "General practice",
-            "urgent": False
-        }
+        return dict(FALLBACK_RECOMMENDATION)
@@ -0,0 +1,218 @@
+"""
+Job queue for slow tasks (PDF reports, personalized simulations).
+
+Handlers are registered per job kind and run by a pool of worker tasks in the process
+that queued the job. The job table (status and results) is kept in a JobStore: in memory,
+or in SQLite shared by every worker process so clients can poll any of them. Finished jobs
+are kept for JOBS__RESULT_TTL_SECONDS, and submitting the same kind and payload again
+returns the existing job instead of queueing a duplicate.
+
+Each process sends a heartbeat for its unfinished jobs every JOBS__HEARTBEAT_SECONDS. Jobs
+of a process that stopped (restart, crash) miss it for JOBS__STALE_SECONDS and are marked
+failed, so resubmitting them queues them again.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+
+from app.config import settings
+from app.services.job_store import (
+    Job, JobStore, MemoryJobStore, SQLiteJobStore, QUEUED, RUNNING, SUCCEEDED, FAILED
+)
+from app.utils.cache import hash_key
+from app.utils.metrics import register_stats
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class JobQueueFullError(RuntimeError):
+    """Raised when JOBS__MAX_QUEUED jobs are already waiting"""
+
+
+class JobQueue:
+    """Queue of jobs run by a pool of asyncio worker tasks, with the job table in a JobStore"""
+
+    def __init__(self, store: JobStore, workers: int = 4, max_queued: int = 1000, heartbeat_seconds: float = 10):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.heartbeat_seconds = heartbeat_seconds
+        # Unique per process start, so the jobs of a restarted worker aren't mistaken for live ones
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._media_types: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+        self.submitted = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.expired = 0
+
+    def register(self, kind: str, handler: JobHandler, media_type: str = "application/json"):
+        """
+        Register the coroutine function that runs jobs of a kind.
+        
+        Handlers of application/json jobs return JSON-serializable data, others return bytes.
+        """
+        self._handlers[kind] = handler
+        self._media_types[kind] = media_type
+
+    async def _run_store(self, function, *args):
+        if self.store.blocking:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> Job:
+        """
+        Queue a job, or return the live job already submitted with the same kind and payload.
+
+        The payload must be JSON-serializable. Failed jobs are not reused, so resubmitting retries them.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        await self.sweep()
+        dedup_key = hash_key(json.dumps([kind, payload], sort_keys=True, ensure_ascii=False))
+        existing = await self._run_store(self.store.find, dedup_key)
+        if existing is not None and existing.status != FAILED:
+            self.deduplicated += 1
+            return existing
+
+        queue = self._get_queue()
+        if self.max_queued and queue.qsize() >= self.max_queued:
+            raise JobQueueFullError(f"Too many queued jobs ({self.max_queued})")
+
+        job = Job(kind, payload, dedup_key, self._media_types[kind], owner=self.owner)
+        await self._run_store(self.store.add, job)
+        queue.put_nowait(job)
+        self.submitted += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Get a job submitted to any worker process sharing the store"""
+        return await self._run_store(self.store.get, job_id)
+
+    async def sweep(self) -> int:
+        """
+        Mark the jobs of stopped workers failed and remove finished jobs whose results
+        have outlived the TTL, returning how many were removed
+        """
+        expired = await self._run_store(self.store.sweep)
+        self.expired += expired
+        return expired
+
+    async def _run_job(self, job: Job):
+        job.status = RUNNING
+        job.started_at = time.time()
+        await self._run_store(self.store.save, job)
+        try:
+            job.result = await self._handlers[job.kind](job.payload)
+            job.status = SUCCEEDED
+            self.succeeded += 1
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+            job.error = str(e)
+            job.status = FAILED
+            self.failed += 1
+        finally:
+            job.finished_at = time.time()
+            await self._run_store(self.store.save, job)
+
+    async def _worker(self):
+        queue = self._get_queue()
+        while True:
+            job = await queue.get()
+            try:
+                if job.status == QUEUED:
+                    await self._run_job(job)
+            except Exception as e:
+                print(f"Error running job {job.id}: {str(e)}")
+            finally:
+                queue.task_done()
+
+    async def _heartbeat(self):
+        """Keep this process's jobs alive and recover the jobs of stopped workers"""
+        while True:
+            try:
+                await self._run_store(self.store.heartbeat, self.owner)
+                await self.sweep()
+            except Exception as e:
+                print(f"Error updating the job table: {str(e)}")
+            await asyncio.sleep(self.heartbeat_seconds)
+
+    def start(self):
+        """Start the worker and heartbeat tasks (must be called from the running event loop)"""
+        if not self._worker_tasks:
+            self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self._heartbeat_task is None:
+            # The first beat also sweeps the jobs orphaned by the previous run
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        """Cancel the worker tasks, jobs still running are abandoned"""
+        tasks = self._worker_tasks + ([self._heartbeat_task] if self._heartbeat_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._heartbeat_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        statuses = self.store.count_statuses()
+        return {
+            "store": type(self.store).__name__,
+            "workers": len(self._worker_tasks),
+            "queued": statuses.get(QUEUED, 0),
+            "running": statuses.get(RUNNING, 0),
+            "jobs": sum(statuses.values()),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "expired": self.expired
+        }
+
+
+def create_job_store() -> JobStore:
+    """
+    Create the job table for the configured backend.
+
+    JOBS__STORE_BACKEND defaults to the conversation store's backend, so a multi-worker
+    deployment using the shared SQLite database keeps its jobs there too.
+    """
+    backend = settings.JOBS.STORE_BACKEND or settings.CONVERSATION.STORE_BACKEND
+    if backend == "sqlite":
+        return SQLiteJobStore(
+            path=settings.JOBS.STORE_SQLITE_PATH or settings.CONVERSATION.STORE_SQLITE_PATH,
+            result_ttl_seconds=settings.JOBS.RESULT_TTL_SECONDS,
+            stale_seconds=settings.JOBS.STALE_SECONDS
+        )
+    return MemoryJobStore(result_ttl_seconds=settings.JOBS.RESULT_TTL_SECONDS)
+
+job_queue = JobQueue(
+    create_job_store(),
+    workers=settings.JOBS.WORKERS,
+    max_queued=settings.JOBS.MAX_QUEUED,
+    heartbeat_seconds=settings.JOBS.HEARTBEAT_SECONDS
+)
+register_stats("job_queue", job_queue.stats)
+
+def start_job_workers():
+    """Start the job queue workers"""
+    job_queue.start()
+
+async def stop_job_workers():
+    """Stop the job queue workers"""
+    await job_queue.stop()
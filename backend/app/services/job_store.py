@@ -0,0 +1,291 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Error of a job whose worker process stopped before finishing it
+ORPHANED_ERROR = "The worker running this job stopped before it finished"
+
+
+class Job:
+    """A submitted job and, once it has finished, its result or error"""
+
+    def __init__(self, kind: str, payload: Dict[str, Any], dedup_key: str, media_type: str,
+                 owner: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.media_type = media_type
+        self.payload = payload
+        self.dedup_key = dedup_key
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # The worker process that runs the job, and when it last reported it alive
+        self.owner = owner
+        self.heartbeat_at = self.created_at
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status of the job, without the payload or result"""
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "status_url": f"/api/jobs/{self.id}",
+            "result_url": f"/api/jobs/{self.id}/result"
+        }
+
+
+class JobStore(ABC):
+    """
+    Interface for job table backends.
+
+    Finished jobs are kept for result_ttl_seconds after they finish. Unfinished jobs whose
+    owner hasn't sent a heartbeat for stale_seconds are orphaned: they are never returned as
+    duplicates and sweep marks them failed. Backends whose operations block on I/O set
+    blocking, so callers run them off the event loop.
+    """
+
+    blocking = False
+
+    def __init__(self, result_ttl_seconds: float = 3600, stale_seconds: float = 60):
+        self.result_ttl_seconds = result_ttl_seconds
+        self.stale_seconds = stale_seconds
+
+    def _is_expired(self, job: Job, now: float) -> bool:
+        return job.finished and bool(self.result_ttl_seconds) and now - job.finished_at > self.result_ttl_seconds
+
+    def _is_orphaned(self, job: Job, now: float) -> bool:
+        return not job.finished and bool(self.stale_seconds) and now - job.heartbeat_at > self.stale_seconds
+
+    @abstractmethod
+    def add(self, job: Job):
+        ...
+
+    @abstractmethod
+    def save(self, job: Job):
+        """Store the status, result and timestamps of a job"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job, or None if it doesn't exist or has expired"""
+
+    @abstractmethod
+    def find(self, dedup_key: str) -> Optional[Job]:
+        """Get the latest job submitted with a dedup key that isn't expired or orphaned"""
+
+    @abstractmethod
+    def heartbeat(self, owner: str):
+        """Record that the owner's unfinished jobs are still queued or running"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Mark orphaned jobs failed, remove expired jobs and return how many were removed"""
+
+    @abstractmethod
+    def count_statuses(self) -> Dict[str, int]:
+        ...
+
+
+class MemoryJobStore(JobStore):
+    """
+    Job table in process memory, only visible to the process that submitted the jobs.
+
+    The jobs die with the process, so they are never orphaned.
+    """
+
+    def __init__(self, result_ttl_seconds: float = 3600):
+        super().__init__(result_ttl_seconds, stale_seconds=0)
+        self._jobs: Dict[str, Job] = {}
+        self._by_dedup_key: Dict[str, str] = {}
+
+    def _remove(self, job: Job):
+        self._jobs.pop(job.id, None)
+        if self._by_dedup_key.get(job.dedup_key) == job.id:
+            del self._by_dedup_key[job.dedup_key]
+
+    def add(self, job: Job):
+        self._jobs[job.id] = job
+        self._by_dedup_key[job.dedup_key] = job.id
+
+    def save(self, job: Job):
+        # Jobs are stored by reference
+        pass
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None and self._is_expired(job, time.time()):
+            self._remove(job)
+            return None
+        return job
+
+    def find(self, dedup_key: str) -> Optional[Job]:
+        return self.get(self._by_dedup_key.get(dedup_key, ""))
+
+    def heartbeat(self, owner: str):
+        pass
+
+    def sweep(self) -> int:
+        now = time.time()
+        expired = [job for job in self._jobs.values() if self._is_expired(job, now)]
+        for job in expired:
+            self._remove(job)
+        return len(expired)
+
+    def count_statuses(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Job table in a SQLite database shared by every worker process, so a job submitted to
+    one worker can be polled on any other. Jobs still run in the process that queued them,
+    which keeps their heartbeat fresh; the jobs of a worker that stopped become orphaned.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, result_ttl_seconds: float = 3600, stale_seconds: float = 60):
+        super().__init__(result_ttl_seconds, stale_seconds)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    media_type TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    dedup_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result BLOB,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    heartbeat_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_dedup_key ON jobs(dedup_key, created_at);
+                CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at);
+                CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs(owner, finished_at);
+            """)
+            self._conn.commit()
+
+    _COLUMNS = ("id, kind, media_type, payload, dedup_key, status, result, error, created_at, started_at, "
+                "finished_at, owner, heartbeat_at")
+
+    def _encode_result(self, job: Job) -> Optional[bytes]:
+        if job.result is None:
+            return None
+        if job.media_type == "application/json":
+            return json.dumps(job.result).encode("utf-8")
+        return bytes(job.result)
+
+    def _to_job(self, row) -> Job:
+        job = Job(row[1], json.loads(row[3]), row[4], row[2], owner=row[11])
+        job.id = row[0]
+        job.status = row[5]
+        if row[6] is not None:
+            job.result = json.loads(row[6]) if job.media_type == "application/json" else bytes(row[6])
+        job.error = row[7]
+        job.created_at, job.started_at, job.finished_at = row[8], row[9], row[10]
+        job.heartbeat_at = row[12]
+        return job
+
+    def add(self, job: Job):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, job.media_type, json.dumps(job.payload), job.dedup_key, job.status,
+                 self._encode_result(job), job.error, job.created_at, job.started_at, job.finished_at,
+                 job.owner, job.heartbeat_at)
+            )
+            self._conn.commit()
+
+    def save(self, job: Job):
+        job.heartbeat_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, started_at = ?, finished_at = ?, heartbeat_at = ? "
+                "WHERE id = ?",
+                (job.status, self._encode_result(job), job.error, job.started_at, job.finished_at,
+                 job.heartbeat_at, job.id)
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._to_job(row)
+        return None if self._is_expired(job, time.time()) else job
+
+    def find(self, dedup_key: str) -> Optional[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE dedup_key = ? ORDER BY created_at DESC", (dedup_key,)
+            ).fetchall()
+        now = time.time()
+        for row in rows:
+            job = self._to_job(row)
+            if not self._is_expired(job, now) and not self._is_orphaned(job, now):
+                return job
+        return None
+
+    def heartbeat(self, owner: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND finished_at IS NULL", (time.time(), owner)
+            )
+            self._conn.commit()
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            if self.stale_seconds:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE finished_at IS NULL AND heartbeat_at < ?",
+                    (FAILED, ORPHANED_ERROR, now, now - self.stale_seconds)
+                )
+                if cursor.rowcount:
+                    print(f"Marked {cursor.rowcount} orphaned jobs as failed")
+            removed = 0
+            if self.result_ttl_seconds:
+                removed = self._conn.execute(
+                    "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                    (now - self.result_ttl_seconds,)
+                ).rowcount
+            self._conn.commit()
+            return removed
+
+    def count_statuses(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
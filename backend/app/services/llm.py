@@ -1,50 +1,155 @@
-from openai import OpenAI
+from typing import Any, AsyncIterator, Optional, Type
+import json
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from pydantic import BaseModel
 from app.config import settings
+from app.services.context_window import count_message_tokens, fit_context
+from app.utils.cache import hash_key
+from app.utils.metrics import register_stats
+from app.utils.resilience import call_with_resilience, get_breaker
+from app.utils.single_flight import SingleFlight
+from app.utils.structured_output import build_response_format, parse_llm_json
+
+
+# Shared async client (and its httpx connection pool) for the whole process
+_async_client: Optional[AsyncOpenAI] = None
+
+# Identical concurrent completions share one upstream request
+_single_flight = SingleFlight(window_seconds=settings.LLM.SINGLE_FLIGHT_WINDOW_SECONDS)
+register_stats("llm_single_flight", _single_flight.stats)
+
+
+def _get_client_kwargs() -> dict:
+    """Build the OpenAI client arguments from the centralized config"""
+    client_kwargs = {"api_key": settings.LLM.API_KEY}
+    if settings.LLM.BASE_URL:
+        client_kwargs["base_url"] = settings.LLM.BASE_URL
+    return client_kwargs
+
+
+def get_async_client() -> AsyncOpenAI:
+    """
+    Get the process-wide AsyncOpenAI client, creating it on first use.
+    
+    All LLM instances and the speech service share one keep-alive connection pool,
+    so concurrent requests reuse connections instead of opening one per call.
+    """
+    global _async_client
+    if _async_client is None:
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM.MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM.MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM.KEEPALIVE_EXPIRY
+            )
+        )
+        # Retries are done by call_with_resilience, not by the SDK
+        _async_client = AsyncOpenAI(http_client=http_client, max_retries=0, **_get_client_kwargs())
+    return _async_client
+
+
+async def close_async_client():
+    """Close the shared async client and release its pooled connections"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def request_fingerprint(params: dict) -> str:
+    """Fingerprint of a completion request: model, system prompt, messages and parameters"""
+    return hash_key(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str))
 
 
 class LLM:
-    def __init__(self, name: str, system_prompt=None):
+    def __init__(self, name: str, system_prompt=None, response_schema: Optional[Type[BaseModel]] = None):
         # Use settings from centralized config
         self.model_name = settings.LLM.MODEL_NAME
-        api_key = settings.LLM.API_KEY
-        base_url = settings.LLM.BASE_URL
-        
-        # Initialize OpenAI client with appropriate settings
-        client_kwargs = {"api_key": api_key}
-        if base_url:
-            client_kwargs["base_url"] = base_url
-            
-        self.client = OpenAI(**client_kwargs)
         self.system_prompt = system_prompt
         self.name = name
         
+        # Pydantic model the responses must match, requested with the provider's JSON-schema mode
+        self.response_schema = response_schema
+        
         self.max_tokens = None
         self.temperature = None
         self.top_p = None
         self.frequency_penalty = None
         self.presence_penalty = None
+        
+        # Context windowing, see context_window.fit_context
+        self.context_token_budget = settings.LLM.CONTEXT_TOKEN_BUDGET
+        self.context_summary_tokens = settings.LLM.CONTEXT_SUMMARY_TOKENS
     
-    def chat(self, message, context: list[dict] = None):
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        return get_async_client()
+    
+    def _build_messages(self, message, context: list[dict] = None) -> list[dict]:
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if context and self.context_token_budget:
+            # Keep the system prompt and the message, and as many recent turns as fit
+            reserved_tokens = (count_message_tokens("system", self.system_prompt or "", self.model_name)
+                               + count_message_tokens("user", message, self.model_name))
+            context = fit_context(context, self.context_token_budget, reserved_tokens,
+                                  self.model_name, self.context_summary_tokens)
         if context:
-            messages = [{
-                "role": "system",
-                "content": self.system_prompt
-            }]
             messages.extend(context)
-            messages.append({"role": "user", "content": message})
-        else:
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": message}
-            ]
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=messages,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            top_p=self.top_p,
-            frequency_penalty=self.frequency_penalty,
-            presence_penalty=self.presence_penalty
+        messages.append({"role": "user", "content": message})
+        return messages
+    
+    def _completion_params(self, messages: list[dict]) -> dict:
+        params = {
+            "model": self.model_name,
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "frequency_penalty": self.frequency_penalty,
+            "presence_penalty": self.presence_penalty
+        }
+        if self.response_schema is not None and settings.LLM.STRUCTURED_OUTPUTS:
+            params["response_format"] = build_response_format(self.response_schema)
+        return params
+    
+    async def _acreate(self, params: dict) -> str:
+        response = await call_with_resilience(
+            get_breaker("llm"),
+            lambda: self.async_client.chat.completions.create(**params),
+            timeout=settings.RESILIENCE.LLM_TIMEOUT_SECONDS
+        )
+        return response.choices[0].message.content
+    
+    async def achat(self, message, context: list[dict] = None):
+        """
+        Get a completion for the message, with the context windowed to the token budget
+        
+        Concurrent identical requests (same fingerprint) share one upstream completion.
+        """
+        params = self._completion_params(self._build_messages(message, context))
+        if not settings.LLM.SINGLE_FLIGHT_ENABLED:
+            return await self._acreate(params)
+        return await _single_flight.run(request_fingerprint(params), lambda: self._acreate(params))
+    
+    async def achat_json(self, message, context: list[dict] = None) -> Any:
+        """
+        achat, parsed as JSON and validated against response_schema (if set).
+        
+        Raises StructuredOutputError if the response can't be parsed or doesn't match the schema.
+        """
+        response_content = await self.achat(message, context)
+        return parse_llm_json(response_content, self.name, self.response_schema)
+    
+    async def astream(self, message, context: list[dict] = None) -> AsyncIterator[str]:
+        """Stream the response, yielding text deltas as the model generates them"""
+        messages = self._build_messages(message, context)
+        # Only opening the stream is retried, a stream that fails midway can't be resumed
+        stream = await call_with_resilience(
+            get_breaker("llm"),
+            lambda: self.async_client.chat.completions.create(**self._completion_params(messages), stream=True),
+            timeout=settings.RESILIENCE.LLM_TIMEOUT_SECONDS
         )
-        response_content = response.choices[0].message.content
-        return response_content
\ No newline at end of file
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
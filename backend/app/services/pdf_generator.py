@@ -1,4 +1,212 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Optional, Any
+from xml.sax.saxutils import escape
+import asyncio
+import io
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from app.config import settings
+
+# Built-in CID font covering Chinese, so no font file has to be shipped
+CJK_FONT = "STSong-Light"
+
+REPORT_LABELS: Dict[str, Dict[str, str]] = {
+    "en": {
+        "title": "Symptom Report",
+        "patient": "Patient",
+        "date": "Date",
+        "pain_areas": "Pain Areas",
+        "area": "Area",
+        "intensity": "Intensity (0-10)",
+        "description": "Description",
+        "pain_descriptions": "Pain Descriptions",
+        "additional_symptoms": "Additional Symptoms",
+        "triage_result": "Triage Result",
+        "notes": "Notes",
+        "none": "None reported",
+        "disclaimer": "This report was generated from self-reported symptoms and is not a medical diagnosis.",
+    },
+    "es": {
+        "title": "Informe de Síntomas",
+        "patient": "Paciente",
+        "date": "Fecha",
+        "pain_areas": "Áreas de Dolor",
+        "area": "Área",
+        "intensity": "Intensidad (0-10)",
+        "description": "Descripción",
+        "pain_descriptions": "Descripciones del Dolor",
+        "additional_symptoms": "Síntomas Adicionales",
+        "triage_result": "Resultado del Triaje",
+        "notes": "Notas",
+        "none": "Ninguno reportado",
+        "disclaimer": "Este informe se generó a partir de síntomas autoinformados y no es un diagnóstico médico.",
+    },
+    "zh": {
+        "title": "症状报告",
+        "patient": "患者",
+        "date": "日期",
+        "pain_areas": "疼痛部位",
+        "area": "部位",
+        "intensity": "强度 (0-10)",
+        "description": "描述",
+        "pain_descriptions": "疼痛描述",
+        "additional_symptoms": "其他症状",
+        "triage_result": "分诊结果",
+        "notes": "备注",
+        "none": "未报告",
+        "disclaimer": "本报告根据自述症状生成，不构成医学诊断。",
+    },
+}
+
+TRIAGE_COLORS = {
+    "green": colors.HexColor("#2e7d32"),
+    "yellow": colors.HexColor("#f9a825"),
+    "red": colors.HexColor("#c62828"),
+}
+
+_executor: Optional[Executor] = None
+
+@lru_cache(maxsize=None)
+def get_report_font(language: str) -> str:
+    """Register (once per process) and return the font used for a report language"""
+    if language == "zh":
+        pdfmetrics.registerFont(UnicodeCIDFont(CJK_FONT))
+        return CJK_FONT
+    return "Helvetica"
+
+@lru_cache(maxsize=None)
+def get_report_styles(language: str) -> Dict[str, Any]:
+    """Paragraph and table styles for a report language, built once per process"""
+    font = get_report_font(language)
+    bold_font = "Helvetica-Bold" if font == "Helvetica" else font
+    # CJK text has no spaces to break lines on
+    word_wrap = "CJK" if language == "zh" else None
+
+    body = ParagraphStyle("body", fontName=font, fontSize=10, leading=14, wordWrap=word_wrap)
+    return {
+        "title": ParagraphStyle("title", parent=body, fontName=bold_font, fontSize=18, leading=22, spaceAfter=6 * mm),
+        "heading": ParagraphStyle("heading", parent=body, fontName=bold_font, fontSize=13, leading=16,
+                                  spaceBefore=5 * mm, spaceAfter=2 * mm),
+        "body": body,
+        "small": ParagraphStyle("small", parent=body, fontSize=8, leading=10, textColor=colors.grey),
+        "table": TableStyle([
+            ("FONTNAME", (0, 0), (-1, 0), bold_font),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f3e5f5")),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#bdbdbd")),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ]),
+    }
+
+def _text(value: Any) -> str:
+    # Missing values (e.g. a pain area without an intensity) are left blank
+    return "" if value is None else escape(str(value))
+
+def render_pdf_report(
+    symptom_summary: Dict[str, Any],
+    user_name: Optional[str] = None,
+    notes: Optional[str] = None,
+    language: str = "en"
+) -> bytes:
+    """
+    Render the symptom report as a PDF.
+
+    This is CPU-bound, use generate_pdf_report to run it in the PDF worker pool.
+    """
+    if language not in REPORT_LABELS:
+        language = "en"
+    labels = REPORT_LABELS[language]
+    styles = get_report_styles(language)
+
+    def paragraph(text: Any, style: str = "body") -> Paragraph:
+        return Paragraph(_text(text), styles[style])
+
+    def bullet_list(items) -> list:
+        if not items:
+            return [paragraph(labels["none"])]
+        return [paragraph(f"• {item}") for item in items]
+
+    story = [paragraph(labels["title"], "title")]
+    if user_name:
+        story.append(paragraph(f"{labels['patient']}: {user_name}"))
+    story.append(paragraph(f"{labels['date']}: {datetime.now().strftime('%Y-%m-%d %H:%M')}"))
+
+    # Pain areas
+    story.append(paragraph(labels["pain_areas"], "heading"))
+    pain_areas = symptom_summary.get("pain_areas") or []
+    if pain_areas:
+        rows = [[paragraph(labels["area"]), paragraph(labels["intensity"]), paragraph(labels["description"])]]
+        for pain_area in pain_areas:
+            rows.append([
+                paragraph(pain_area.get("area", "")),
+                paragraph(pain_area.get("intensity", "")),
+                paragraph(pain_area.get("description", "")),
+            ])
+        table = Table(rows, colWidths=[40 * mm, 30 * mm, 100 * mm], repeatRows=1)
+        table.setStyle(styles["table"])
+        story.append(table)
+    else:
+        story.append(paragraph(labels["none"]))
+
+    story.append(paragraph(labels["pain_descriptions"], "heading"))
+    story.extend(bullet_list(symptom_summary.get("pain_descriptions")))
+
+    story.append(paragraph(labels["additional_symptoms"], "heading"))
+    story.extend(bullet_list(symptom_summary.get("additional_symptoms")))
+
+    # Triage result, colored by severity if it is one
+    story.append(paragraph(labels["triage_result"], "heading"))
+    triage_result = symptom_summary.get("triage_result", "")
+    triage_color = TRIAGE_COLORS.get(str(triage_result).strip().lower())
+    if triage_color is not None:
+        story.append(Paragraph(_text(triage_result), ParagraphStyle("triage", parent=styles["body"], textColor=triage_color)))
+    else:
+        story.append(paragraph(triage_result))
+
+    if notes:
+        story.append(paragraph(labels["notes"], "heading"))
+        story.append(paragraph(notes))
+
+    story.append(Spacer(1, 10 * mm))
+    story.append(paragraph(labels["disclaimer"], "small"))
+
+    output = io.BytesIO()
+    document = SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        title=labels["title"],
+        leftMargin=20 * mm,
+        rightMargin=20 * mm,
+        topMargin=20 * mm,
+        bottomMargin=20 * mm
+    )
+    document.build(story)
+    return output.getvalue()
+
+def get_pdf_executor() -> Executor:
+    """Get the shared PDF worker pool, created on first use"""
+    global _executor
+    if _executor is None:
+        if settings.REPORTS.PDF_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=settings.REPORTS.PDF_MAX_WORKERS, thread_name_prefix="pdf")
+        else:
+            _executor = ProcessPoolExecutor(max_workers=settings.REPORTS.PDF_MAX_WORKERS)
+    return _executor
+
+def shutdown_pdf_executor():
+    """Shut down the PDF worker pool (on application shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
 
 async def generate_pdf_report(
     symptom_summary: Dict[str, Any],
@@ -8,15 +216,19 @@ async def generate_pdf_report(
 ) -> bytes:
     """
     Generate a PDF report from the user's symptom data
-    
-    In a real implementation, this would use a PDF generation library
-    such as ReportLab, WeasyPrint, or a similar tool.
+
+    The PDF is rendered in the PDF worker pool, so layout doesn't block the event loop.
     """
-    # Mock implementation
-    # In a real application, this would use a PDF library to create
-    # a properly formatted PDF with the symptom data
-    
-    # This is just a placeholder
-    mock_pdf_data = b"MOCK_PDF_DATA"
-    
-    return mock_pdf_data 
\ No newline at end of file
+    # Send plain data to the worker, pydantic models may not pickle across processes
+    if hasattr(symptom_summary, "model_dump"):
+        symptom_summary = symptom_summary.model_dump()
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_pdf_executor(),
+        render_pdf_report,
+        symptom_summary,
+        user_name,
+        notes,
+        language
+    )
@@ -0,0 +1,99 @@
+from typing import Any, Dict, Optional
+import asyncio
+import json
+import re
+
+from app.config import settings
+from app.utils.cache import DiskCache, LRUCache, TwoTierCache
+from app.utils.metrics import register_stats
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase and collapse whitespace so equivalent inputs share a cache entry"""
+    if not text:
+        return ""
+    return _WHITESPACE.sub(" ", str(text)).strip().lower()
+
+
+def bucket_pain_level(pain_level: Optional[int]) -> str:
+    """Group pain levels into the buckets used by the cache key"""
+    if not pain_level:
+        return "none"
+    if pain_level <= 3:
+        return "mild"
+    if pain_level <= 6:
+        return "moderate"
+    return "severe"
+
+
+def symptom_fingerprint(symptom_data: Any) -> str:
+    """
+    Canonical fingerprint of the symptom data that generate_dialog_with_llm uses.
+    
+    Symptom names are normalized and sorted, and the pain level is bucketed, so similar
+    symptom profiles share generated content.
+    """
+    if not symptom_data or not symptom_data.symptoms:
+        return "none"
+    
+    profile = {
+        "symptoms": sorted(normalize_text(s.get("name", "unknown symptom")) for s in symptom_data.symptoms[:3]),
+        "pain": bucket_pain_level(symptom_data.pain_level),
+        "location": normalize_text(symptom_data.pain_location),
+        "duration": normalize_text(symptom_data.duration),
+        "notes": normalize_text(symptom_data.additional_notes)
+    }
+    return json.dumps(profile, sort_keys=True, ensure_ascii=False)
+
+
+def make_dialog_cache_key(step_id: str, language: str, symptom_data: Any = None, symptom_independent: bool = False) -> str:
+    """Cache key for a step's generated dialog; symptom-independent steps are shared by everyone"""
+    fingerprint = "global" if symptom_independent else symptom_fingerprint(symptom_data)
+    return f"simulation:{step_id}:{language}:{fingerprint}"
+
+
+def _create_cache() -> TwoTierCache:
+    disk = None
+    if settings.SIMULATION.CACHE_DIR:
+        disk = DiskCache(
+            settings.SIMULATION.CACHE_DIR,
+            max_bytes=settings.SIMULATION.CACHE_MAX_BYTES,
+            ttl_seconds=settings.SIMULATION.CACHE_TTL_SECONDS,
+            suffix=".json"
+        )
+    return TwoTierCache(
+        LRUCache(max_entries=settings.SIMULATION.CACHE_MAX_ENTRIES, ttl_seconds=settings.SIMULATION.CACHE_TTL_SECONDS),
+        disk,
+        dumps=lambda value: json.dumps(value, ensure_ascii=False).encode("utf-8"),
+        loads=lambda data: json.loads(data.decode("utf-8"))
+    )
+
+
+# Generated dialog and tips per (step, language, symptom profile)
+dialog_cache = _create_cache()
+register_stats("simulation_dialog_cache", dialog_cache.stats)
+
+
+async def _run_cache(function, *args):
+    """Run a cache operation, in a worker thread when it may touch the disk tier"""
+    if dialog_cache.disk is not None:
+        return await asyncio.to_thread(function, *args)
+    return function(*args)
+
+
+async def get_cached_dialog(key: str) -> Optional[Dict]:
+    if not settings.SIMULATION.CACHE_ENABLED:
+        return None
+    return await _run_cache(dialog_cache.get, key)
+
+
+async def set_cached_dialog(key: str, content: Dict):
+    if settings.SIMULATION.CACHE_ENABLED:
+        await _run_cache(dialog_cache.set, key, content)
+
+
+async def is_dialog_cached(key: str) -> bool:
+    """Check for a cached dialog without counting a lookup"""
+    return await _run_cache(dialog_cache.contains, key)
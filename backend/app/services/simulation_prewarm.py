@@ -0,0 +1,113 @@
+"""
+Pre-generate hospital visit simulation content into the simulation cache.
+
+Runs in the background at startup when SIMULATION__PREWARM_ON_STARTUP is set, or from the
+command line after a deploy:
+
+    python -m app.services.simulation_prewarm --languages en es zh --concurrency 4
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+
+from app.config import settings
+from app.services.simulation_cache import is_dialog_cached, make_dialog_cache_key
+
+# Most common symptom profiles from the symptom checker, in SymptomData format
+COMMON_SYMPTOM_PROFILES: List[Dict[str, Any]] = [
+    {"symptoms": [{"name": "pelvic pain"}], "pain_level": 7, "pain_location": "pelvis"},
+    {"symptoms": [{"name": "pelvic pain"}], "pain_level": 4, "pain_location": "pelvis"},
+    {"symptoms": [{"name": "menstrual cramps"}], "pain_level": 5, "pain_location": "abdomen"},
+    {"symptoms": [{"name": "irregular periods"}]},
+    {"symptoms": [{"name": "bloating"}], "pain_level": 2, "pain_location": "abdomen"},
+    {"symptoms": [{"name": "lower back pain"}], "pain_level": 5, "pain_location": "back"},
+]
+
+_prewarm_task: Optional[asyncio.Task] = None
+
+
+async def prewarm_simulation_cache(languages: Optional[List[str]] = None,
+                                   profiles: Optional[List[Dict[str, Any]]] = None,
+                                   concurrency: Optional[int] = None) -> Dict[str, int]:
+    """
+    Generate content for every simulation step, language and common symptom profile
+    that isn't cached yet.
+    
+    Symptom-independent steps are generated once per language. Returns how many
+    entries were generated, already cached, or failed (and so weren't cached).
+    """
+    # Imported here since the simulation router imports the cache this module fills
+    from app.routers.simulation import (
+        BASE_SIMULATION_STEPS, SYMPTOM_INDEPENDENT_STEP_IDS, SymptomData, generate_dialog_with_llm
+    )
+    
+    languages = languages or settings.SIMULATION.PREWARM_LANGUAGES
+    profiles = COMMON_SYMPTOM_PROFILES if profiles is None else profiles
+    symptom_profiles = [None] + [SymptomData(**profile) for profile in profiles]
+    semaphore = asyncio.Semaphore(concurrency or settings.SIMULATION.PREWARM_CONCURRENCY)
+    counts = {"generated": 0, "cached": 0, "failed": 0}
+    
+    async def generate(step: Dict[str, Any], language: str, symptom_data, key: str):
+        async with semaphore:
+            await generate_dialog_with_llm(
+                step_id=step["id"],
+                step_title=step["title"],
+                step_description=step["description"],
+                symptom_data=symptom_data,
+                language=language
+            )
+        # Fallback content isn't cached, so a missing entry means generation failed
+        counts["generated" if await is_dialog_cached(key) else "failed"] += 1
+    
+    jobs = []
+    seen_keys = set()
+    for language in languages:
+        for step in BASE_SIMULATION_STEPS:
+            symptom_independent = step["id"] in SYMPTOM_INDEPENDENT_STEP_IDS
+            for symptom_data in ([None] if symptom_independent else symptom_profiles):
+                key = make_dialog_cache_key(step["id"], language, symptom_data, symptom_independent)
+                if key in seen_keys:
+                    continue
+                seen_keys.add(key)
+                if await is_dialog_cached(key):
+                    counts["cached"] += 1
+                    continue
+                jobs.append(generate(step, language, symptom_data, key))
+    
+    print(f"Pre-warming simulation cache: {len(jobs)} entries to generate, {counts['cached']} already cached")
+    await asyncio.gather(*jobs)
+    print(f"Simulation cache pre-warm finished: {counts}")
+    return counts
+
+
+def start_simulation_prewarm():
+    """Start pre-warming in the background so it doesn't delay startup"""
+    global _prewarm_task
+    if _prewarm_task is None:
+        _prewarm_task = asyncio.create_task(prewarm_simulation_cache())
+
+
+async def stop_simulation_prewarm():
+    """Cancel the background pre-warm if it is still running"""
+    global _prewarm_task
+    if _prewarm_task is not None:
+        _prewarm_task.cancel()
+        try:
+            await _prewarm_task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Simulation cache pre-warm failed: {str(e)}")
+        _prewarm_task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate hospital visit simulation content")
+    parser.add_argument("--languages", nargs="+", default=None, help="Language codes (default: SIMULATION__PREWARM_LANGUAGES)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Maximum concurrent LLM calls")
+    args = parser.parse_args()
+    asyncio.run(prewarm_simulation_cache(languages=args.languages, concurrency=args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,109 @@
-import io
+import asyncio
 import base64
+from tempfile import SpooledTemporaryFile
+from typing import IO, AsyncIterator, Optional, Tuple
 from fastapi import UploadFile
-from openai import OpenAI
-import yaml
-import os
 from app.config import settings
+from app.services.llm import get_async_client
+from app.services.tts_cache import make_tts_cache_key, get_cached_speech, set_cached_speech
+from app.utils.resilience import call_with_resilience, get_breaker, is_provider_failure
 
-# Initialize OpenAI client
-def get_openai_client():
-    """Get OpenAI client with API key from config"""
-    api_key = settings.LLM.API_KEY
-    base_url = settings.LLM.BASE_URL
-    
-    client_kwargs = {"api_key": api_key}
-    if base_url:
-        client_kwargs["base_url"] = base_url
-        
-    return OpenAI(**client_kwargs)
+# Size of the chunks read from an upload
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+class AudioTooLargeError(ValueError):
+    """Raised when an uploaded audio file exceeds SPEECH__MAX_UPLOAD_BYTES"""
+
+class AudioChunkBuffer:
+    """
+    Spooled buffer for audio received in chunks.
+    
+    The audio stays in memory up to SPEECH__SPOOL_MAX_MEMORY_BYTES and only then spills
+    to an anonymous temporary file.
+    """
+    
+    def __init__(self):
+        self.file = SpooledTemporaryFile(max_size=settings.SPEECH.SPOOL_MAX_MEMORY_BYTES)
+        self.size = 0
+    
+    def write(self, chunk: bytes):
+        """Append a chunk, raising AudioTooLargeError past SPEECH__MAX_UPLOAD_BYTES"""
+        if self.size + len(chunk) > settings.SPEECH.MAX_UPLOAD_BYTES:
+            raise AudioTooLargeError(f"Audio file exceeds the {settings.SPEECH.MAX_UPLOAD_BYTES} byte limit")
+        self.file.write(chunk)
+        self.size += len(chunk)
+    
+    def rewind(self) -> SpooledTemporaryFile:
+        self.file.seek(0)
+        return self.file
+    
+    def close(self):
+        self.file.close()
+
+async def read_audio_upload(audio_file: UploadFile) -> Tuple[SpooledTemporaryFile, int]:
+    """
+    Read an uploaded audio file in chunks into a spooled buffer.
+    
+    Returns the buffer (rewound) and its size.
+    """
+    audio = AudioChunkBuffer()
+    try:
+        while True:
+            chunk = await audio_file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            audio.write(chunk)
+    except AudioTooLargeError:
+        audio.close()
+        raise
+    return audio.rewind(), audio.size
+
+async def transcribe_buffer(audio: IO[bytes], filename: str = "audio.wav", language: str = "en",
+                            content_type: Optional[str] = None) -> str:
+    """Transcribe audio from a file-like object using OpenAI's Whisper API"""
+    client = get_async_client()
+    
+    def create_transcription():
+        # Every attempt sends the audio from the start
+        audio.seek(0)
+        return client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(filename, audio, content_type or "application/octet-stream"),
+            language=language
+        )
+    
+    transcript = await call_with_resilience(
+        get_breaker("transcription"),
+        create_transcription,
+        timeout=settings.RESILIENCE.SPEECH_TIMEOUT_SECONDS
+    )
+    return transcript.text
 
 async def transcribe_audio(audio_file: UploadFile, language: str = "en") -> dict:
     """
     Transcribe speech audio to text using OpenAI's Whisper API
+    
+    The upload is passed to the API from a spooled buffer, without a shared temporary path.
+    Raises AudioTooLargeError if the upload is too large.
     """
+    buffer, file_size = await read_audio_upload(audio_file)
     try:
-        client = get_openai_client()
-        
-        # Read the uploaded file
-        content = await audio_file.read()
-        
-        # Create a temporary file for OpenAI to read
-        temp_file_path = f"/tmp/symptom_audio.wav"
-        with open(temp_file_path, "wb") as f:
-            f.write(content)
-        
-        # Call OpenAI's Whisper API
-        with open(temp_file_path, "rb") as audio:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio,
-                language=language
-            )
-        
-        # Clean up the temporary file
-        os.remove(temp_file_path)
+        text = await transcribe_buffer(
+            buffer,
+            filename=audio_file.filename or "audio.wav",
+            language=language,
+            content_type=audio_file.content_type
+        )
         
         # Return the transcript with a confidence score
         # Note: Whisper doesn't provide confidence scores, so we use a default high value
         return {
-            "text": transcript.text,
+            "text": text,
             "confidence": 0.95
         }
     except Exception as e:
         print(f"Error in transcribe_audio: {str(e)}")
         # Fallback to mock responses for development/testing
-        file_size = len(content) if 'content' in locals() else 0
         
         # Simulate different responses for testing UI
         if file_size % 3 == 0:
@@ -71,6 +121,91 @@ async def transcribe_audio(audio_file: UploadFile, language: str = "en") -> dict
                 "text": "I'm experiencing lower back pain that radiates down my left leg, it's about a 7 out of 10",
                 "confidence": 0.88
             }
+    finally:
+        buffer.close()
+
+TTS_MODEL = "tts-1"  # or tts-1-hd for higher quality
+# Size of the audio chunks forwarded to the client when streaming speech
+TTS_CHUNK_SIZE = 4096
+
+def get_tts_voice(voice_type: Optional[str]) -> str:
+    """Map voice_type to an OpenAI voice, defaulting to 'nova'"""
+    voice_mapping = {
+        "female": "nova",  # A female voice
+        "male": "echo",    # A male voice
+        "neutral": "alloy" # A neutral voice
+    }
+    return voice_mapping.get((voice_type or "female").lower(), "nova")
+
+async def stream_speech(text: str, language: str = "en", voice_type: str = "female") -> AsyncIterator[bytes]:
+    """
+    Convert text to speech using OpenAI's TTS API, yielding MP3 chunks as the provider sends them
+    
+    Cached speech is served without calling the provider; streamed speech is cached once complete.
+    """
+    voice = get_tts_voice(voice_type)
+    cache_key = make_tts_cache_key(text, voice, TTS_MODEL, language)
+    cached_audio = await get_cached_speech(cache_key)
+    if cached_audio is not None:
+        for start in range(0, len(cached_audio), TTS_CHUNK_SIZE):
+            yield cached_audio[start:start + TTS_CHUNK_SIZE]
+        return
+    
+    client = get_async_client()
+    breaker = get_breaker("tts")
+    breaker.check()
+    chunks = []
+    try:
+        async with client.audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=voice,
+            input=text,
+            response_format="mp3",
+            timeout=settings.RESILIENCE.SPEECH_TIMEOUT_SECONDS
+        ) as response:
+            async for chunk in response.iter_bytes(TTS_CHUNK_SIZE):
+                chunks.append(chunk)
+                yield chunk
+    except Exception as e:
+        if is_provider_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_ignored()
+        raise
+    except BaseException:
+        # The consumer stopped early (GeneratorExit) or the request was cancelled
+        breaker.record_ignored()
+        raise
+    breaker.record_success()
+    await set_cached_speech(cache_key, b"".join(chunks))
+
+async def synthesize_speech(text: str, language: str = "en", voice_type: str = "female") -> bytes:
+    """
+    Convert text to MP3 audio using OpenAI's TTS API, using the TTS cache when possible
+    """
+    voice = get_tts_voice(voice_type)
+    cache_key = make_tts_cache_key(text, voice, TTS_MODEL, language)
+    cached_audio = await get_cached_speech(cache_key)
+    if cached_audio is not None:
+        return cached_audio
+    
+    client = get_async_client()
+    
+    # Call OpenAI's TTS API
+    response = await call_with_resilience(
+        get_breaker("tts"),
+        lambda: client.audio.speech.create(
+            model=TTS_MODEL,
+            voice=voice,
+            input=text
+        ),
+        timeout=settings.RESILIENCE.SPEECH_TIMEOUT_SECONDS
+    )
+    
+    # Get the audio content as bytes
+    audio_data = response.content
+    await set_cached_speech(cache_key, audio_data)
+    return audio_data
 
 async def generate_speech(text: str, language: str = "en", voice_type: str = "female") -> str:
     """
@@ -79,27 +214,7 @@ async def generate_speech(text: str, language: str = "en", voice_type: str = "fe
     Returns base64-encoded audio data that can be used directly in an audio element.
     """
     try:
-        client = get_openai_client()
-        
-        # Map voice_type to OpenAI voice options
-        voice_mapping = {
-            "female": "nova",  # A female voice
-            "male": "echo",    # A male voice
-            "neutral": "alloy" # A neutral voice
-        }
-        
-        # Select voice based on voice_type or default to 'alloy' if not found
-        voice = voice_mapping.get(voice_type.lower(), "nova")
-        
-        # Call OpenAI's TTS API
-        response = client.audio.speech.create(
-            model="tts-1",  # or tts-1-hd for higher quality
-            voice=voice,
-            input=text
-        )
-        
-        # Get the audio content as bytes
-        audio_data = response.content
+        audio_data = await synthesize_speech(text, language, voice_type)
         
         # Convert to base64 for frontend use
         base64_audio = base64.b64encode(audio_data).decode("utf-8")
@@ -156,7 +271,20 @@ async def generate_speech_elevenlabs(text: str, language: str = "en", voice_type
             }
         }
         
-        response = requests.post(url, json=data, headers=headers)
+        # Blocking request, run in a thread with a deadline and the provider's circuit breaker
+        breaker = get_breaker("elevenlabs")
+        breaker.check()
+        try:
+            response = await asyncio.to_thread(
+                requests.post, url, json=data, headers=headers, timeout=settings.RESILIENCE.SPEECH_TIMEOUT_SECONDS
+            )
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
         
         if response.status_code == 200:
             # Convert to base64 for frontend use
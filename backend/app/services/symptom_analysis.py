@@ -1,6 +1,14 @@
 from app.services.llm import LLM
+from app.models.symptom import TriageResult
 from typing import Dict, Any
 
+# Returned when the symptoms can't be analyzed
+FALLBACK_TRIAGE_RESULT = {
+    "severity": "yellow",
+    "recommendation": "We couldn't fully analyze your symptoms. Please consult with a healthcare provider to be safe.",
+    "summary": "Analysis error occurred. Your symptoms require professional evaluation."
+}
+
 # Initialize the analysis LLM
 analysis_llm = LLM(
     name="symptom_analyzer",
@@ -20,35 +28,31 @@ analysis_llm = LLM(
         "recommendation": "brief recommendation",
         "summary": "summary of analysis"
     }
-    """
+    """,
+    response_schema=TriageResult
 )
 
-def analyze_symptoms(symptom_data):
+async def analyze_symptoms_with_llm(symptom_data):
     """
-    Analyze symptoms and provide a triage result
+    Analyze symptoms with the LLM, returning FALLBACK_TRIAGE_RESULT if that fails
+    
+    Clear-cut cases are decided before this by the rule table in triage_rules
+    (see the /symptoms/analyze route), without calling the LLM.
     """
     try:
         # Format the symptom data for the LLM
         symptom_text = format_symptoms_for_llm(symptom_data)
         
         # Use LLM to analyze symptoms
-        result_json = analysis_llm.chat(
+        result = await analysis_llm.achat_json(
             message=f"Analyze these symptoms: {symptom_text}"
         )
         
-        # Parse the result
-        import json
-        result = json.loads(result_json)
-        
         return result
     except Exception as e:
         print(f"Error analyzing symptoms with LLM: {str(e)}")
         # Return a fallback result
-        return {
-            "severity": "yellow",
-            "recommendation": "We couldn't fully analyze your symptoms. Please consult with a healthcare provider to be safe.",
-            "summary": "Analysis error occurred. Your symptoms require professional evaluation."
-        }
+        return dict(FALLBACK_TRIAGE_RESULT)
 
 def format_symptoms_for_llm(symptom_data):
     """
@@ -0,0 +1,141 @@
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional, Tuple
+import json
+import re
+
+from app.config import settings
+from app.services.simulation_cache import normalize_text, bucket_pain_level
+from app.utils.cache import LRUCache, hash_key
+from app.utils.metrics import register_stats
+
+# Response header reporting whether a response came from the cache
+CACHE_STATUS_HEADER = "X-Cache-Status"
+CACHE_HIT = "HIT"
+CACHE_NEAR_HIT = "NEAR-HIT"
+CACHE_MISS = "MISS"
+CACHE_BYPASS = "BYPASS"
+
+# Numeric fields grouped into the pain level buckets
+BUCKETED_FIELDS = {"intensity", "pain_level", "emotional_scale"}
+# Fields that don't change the answer
+IGNORED_FIELDS = {"completeness_score"}
+
+_WORD = re.compile(r"\w+")
+
+
+def canonicalize_symptoms(value: Any, field: Optional[str] = None) -> Any:
+    """
+    Canonical form of a symptom payload: keys sorted, text normalized, lists of
+    symptoms made order-insensitive and intensities bucketed.
+    """
+    if isinstance(value, dict):
+        return {
+            key: canonicalize_symptoms(item, key)
+            for key, item in sorted(value.items())
+            if key not in IGNORED_FIELDS and item not in (None, "", [], {})
+        }
+    if isinstance(value, list):
+        items = [canonicalize_symptoms(item, field) for item in value]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True, ensure_ascii=False))
+    if isinstance(value, str):
+        return normalize_text(value)
+    if field in BUCKETED_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return bucket_pain_level(value)
+    return value
+
+
+def symptom_terms(value: Any, field: Optional[str] = None) -> FrozenSet[str]:
+    """Set of the words and field values in a canonical payload, for near-duplicate matching"""
+    terms = set()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            terms |= symptom_terms(item, key)
+    elif isinstance(value, list):
+        for item in value:
+            terms |= symptom_terms(item, field)
+    elif isinstance(value, str) and field not in BUCKETED_FIELDS:
+        terms.update(_WORD.findall(value))
+    else:
+        terms.add(f"{field}={value}")
+    return frozenset(terms)
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class SymptomResponseCache:
+    """
+    Cache of LLM responses keyed on the canonical symptom payload.
+
+    With a near-duplicate threshold above 0, a miss falls back to the cached response
+    whose term set is most similar (Jaccard similarity at least the threshold).
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600, near_duplicate_threshold: float = 0.0):
+        # key -> (kind, term set, response)
+        self.entries = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.near_hits = 0
+
+    def _key(self, kind: str, canonical: Any) -> str:
+        return f"{kind}:{hash_key(json.dumps(canonical, sort_keys=True, ensure_ascii=False))}"
+
+    def lookup(self, kind: str, payload: Dict[str, Any]) -> Tuple[Optional[Any], str]:
+        """Find a cached response, returning it (or None) with the cache status"""
+        canonical = canonicalize_symptoms(payload)
+        entry = self.entries.get(self._key(kind, canonical))
+        if entry is not None:
+            return entry[2], CACHE_HIT
+
+        if self.near_duplicate_threshold > 0:
+            terms = symptom_terms(canonical)
+            best_score, best_response = 0.0, None
+            for _, (entry_kind, entry_terms, response) in self.entries.items():
+                if entry_kind != kind:
+                    continue
+                score = _jaccard(terms, entry_terms)
+                if score >= self.near_duplicate_threshold and score > best_score:
+                    best_score, best_response = score, response
+            if best_response is not None:
+                self.near_hits += 1
+                return best_response, CACHE_NEAR_HIT
+        return None, CACHE_MISS
+
+    def store(self, kind: str, payload: Dict[str, Any], response: Any):
+        canonical = canonicalize_symptoms(payload)
+        self.entries.set(self._key(kind, canonical), (kind, symptom_terms(canonical), response))
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.entries.stats(), near_hits=self.near_hits,
+                    near_duplicate_threshold=self.near_duplicate_threshold)
+
+
+symptom_response_cache = SymptomResponseCache(
+    max_entries=settings.SYMPTOM_CACHE.MAX_ENTRIES,
+    ttl_seconds=settings.SYMPTOM_CACHE.TTL_SECONDS,
+    near_duplicate_threshold=settings.SYMPTOM_CACHE.NEAR_DUPLICATE_THRESHOLD
+)
+register_stats("symptom_response_cache", symptom_response_cache.stats)
+
+
+async def cached_symptom_response(kind: str, payload: Dict[str, Any], generate: Callable[[], Awaitable[Any]],
+                                  cacheable: Callable[[Any], bool] = lambda response: True) -> Tuple[Any, str]:
+    """
+    Get the response for a symptom payload from the cache, or generate and cache it.
+
+    Responses for which cacheable returns False (fallbacks) are not stored.
+    Returns the response and the cache status for the CACHE_STATUS_HEADER header.
+    """
+    if not settings.SYMPTOM_CACHE.ENABLED:
+        return await generate(), CACHE_BYPASS
+
+    response, status = symptom_response_cache.lookup(kind, payload)
+    if response is not None:
+        return response, status
+
+    response = await generate()
+    if cacheable(response):
+        symptom_response_cache.store(kind, payload, response)
+    return response, CACHE_MISS
@@ -1,8 +1,29 @@
-from typing import Dict, List, Any, Optional
-import re
+from typing import AsyncIterator, Dict, List, Any, Optional, Set, Tuple
+import asyncio
 import json
 from json.decoder import JSONDecodeError
+from app.config import settings
 from app.services.llm import LLM
+from app.models.conversation import (
+    SymptomSummaryOutput,
+    SymptomExtractionOutput,
+    SinglePassExtractionOutput,
+    FollowUpOutput
+)
+from app.services.conversation_service import (
+    merge_symptoms,
+    GREETING_MESSAGE,
+    add_message,
+    save_reply,
+    get_new_messages
+)
+from app.services.symptom_lexicon import extract_lexicon_symptoms, lexicon_stats
+
+# Fixed replies, also pre-synthesized into the TTS cache
+DEFAULT_FOLLOW_UP = "Could you tell me more about your symptoms?"
+PARSE_FAILURE_RESPONSE = "I understand you're not feeling well. Could you tell me more specifically about where you're experiencing discomfort?"
+LLM_FAILURE_RESPONSE = "I'm sorry, I couldn't process that. Could you describe your symptoms again, focusing on where you feel pain or discomfort?"
+CANNED_RESPONSES = [GREETING_MESSAGE, DEFAULT_FOLLOW_UP, PARSE_FAILURE_RESPONSE, LLM_FAILURE_RESPONSE]
 
 
 # First LLM for summarizing symptoms
@@ -39,7 +60,8 @@ symptom_summarizer_llm = LLM(
       "other_symptoms": ["fatigue", "headache"]
     }
     ```
-    """
+    """,
+    response_schema=SymptomSummaryOutput
 )
 
 # Modified LLM for detailed symptom extraction
@@ -80,13 +102,52 @@ symptom_extractor_llm = LLM(
     Note:   
     - If a field is mentioned but not specified (e.g., pain without intensity), use null for that value
     - If user mentions information that already exists in the JSON object, update the value with the new information
-    """
+    """,
+    response_schema=SymptomExtractionOutput
 )
 
-# LLM specifically for generating responses
-response_generator_llm = LLM(
-    name="response_generator",
+# Single-pass LLM that does the work of the summarizer and the extractor in one call
+symptom_single_pass_llm = LLM(
+    name="symptom_single_pass_extractor",
     system_prompt="""
+    You are a medical assistant specializing in identifying and extracting detailed symptom information from conversations.
+    
+    In a single step, identify the symptoms mentioned by the user and extract their details:
+    1. Main symptoms - primary health concerns (1-2 words each, standardized medical terminology)
+    2. Other symptoms - secondary or related symptoms (1-2 words each)
+    3. Pain areas (abdomen, head, back, chest, pelvis, leg, arm)
+    4. Pain descriptions (sharp, dull, throbbing, burning, cramping)
+    5. Pain intensity (on a scale of 1-10)
+    6. Pain frequency (very often, often, sometimes, rarely)
+    7. Emotional state (anxious, depressed, frustrated, normal)
+    8. Emotional scale if not normal (1-10)
+    
+    Guidelines:
+    - Extract only symptoms explicitly mentioned by the user
+    - For women's health specifically, look for symptoms like pelvic pain, bloating, irregular periods,
+      cramping, fatigue, nausea, headaches, back pain and mood changes
+    - If the user claims that she doesn't have other symptoms, set other_symptoms to ["no other symptoms"]
+    - If a field is mentioned but not specified (e.g., pain without intensity), use null for that value
+    
+    Format your response as a structured JSON object with a completeness score (0-100):
+    ```json
+    {
+      "pain_areas": [
+        {"area": "pelvis", "intensity": 7, "frequency": "often", "description": "sharp"}
+      ],
+      "main_symptoms": ["pelvic pain"],
+      "other_symptoms": ["bloating", "irregular periods"],
+      "emotional_state": "anxious",
+      "emotional_scale": 6,
+      "completeness_score": 70
+    }
+    ```
+    """,
+    response_schema=SinglePassExtractionOutput
+)
+
+# Guidance shared by the JSON and the streaming (plain text) response generators
+RESPONSE_GUIDELINES = """
     You are a compassionate medical assistant for a women's health application.
     
     Your task is to generate appropriate follow-up questions based on the symptom summary provided.
@@ -114,7 +175,12 @@ response_generator_llm = LLM(
     - Keep responses concise (2 sentences maximum)
     - If you have all information needed, summarize and ask if there's anything else
     - Once all fields are complete and the user has nothing else to add, prompt the user to summarize their symptoms
-    
+    """
+
+# LLM specifically for generating responses
+response_generator_llm = LLM(
+    name="response_generator",
+    system_prompt=RESPONSE_GUIDELINES + """
     Format your output as follows:
     ```json
     {
@@ -126,155 +192,347 @@ response_generator_llm = LLM(
     
     If the symptom summary has a completeness score of 80 or higher, you should set "is_complete" to true and ask the user to click the "Estimate Diagnosis" button.
     Don't ask user to summarize their symptoms again.
+    """,
+    response_schema=FollowUpOutput
+)
+
+# Same task as response_generator_llm, but replies in plain text so it can be streamed and spoken
+response_streamer_llm = LLM(
+    name="response_streamer",
+    system_prompt=RESPONSE_GUIDELINES + """
+    Reply with only the text of your response to the user, without JSON or markdown.
+    
+    If the symptom summary has a completeness score of 80 or higher, ask the user to click the "Estimate Diagnosis" button.
+    Don't ask user to summarize their symptoms again.
     """
 )
 
-# Add this helper function to extract JSON from a markdown-formatted string
-def extract_json_from_markdown(markdown_text):
+def format_previous_symptoms(previous_symptoms: Optional[Dict[str, Any]]) -> str:
+    """Describe the symptoms extracted from earlier messages for an incremental extraction prompt"""
+    if not previous_symptoms:
+        return ""
+    
+    return f"""
+    These symptoms were already extracted from earlier in the conversation:
+    {json.dumps(previous_symptoms, indent=2)}
+    
+    The conversation below only contains the messages since then. Include the symptoms above
+    in your answer and update any values the user has added or changed.
+    """
+
+async def extract_symptoms_three_stage(conversation: List[Dict], previous_symptoms: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Extract symptoms with the original pipeline: summarize the symptoms first,
+    then extract detailed information about them in a second LLM call.
+    
+    Returns the symptom summary and the detailed extraction.
+    """
+    previous_context = format_previous_symptoms(previous_symptoms)
+    
+    # STEP 1: First identify and summarize the symptoms
+    symptom_summary = await symptom_summarizer_llm.achat_json(
+        message=previous_context + "Extract and summarize the symptoms from this conversation.",
+        context=conversation
+    )
+    
+    print(f"Symptom Summary Result (cleaned): {json.dumps(symptom_summary)}")
+    
+    # STEP 2: Extract detailed information about these symptoms
+    detailed_prompt = previous_context + f"""
+    Based on the conversation and these previously identified symptoms:
+    {json.dumps(symptom_summary, indent=2)}
+    
+    Extract detailed information about these symptoms including pain areas, intensity, frequency, etc.
+    """
+    
+    extracted_symptoms = await symptom_extractor_llm.achat_json(
+        message=detailed_prompt,
+        context=conversation
+    )
+    
+    print(f"Detailed Symptom Extraction Result (cleaned): {json.dumps(extracted_symptoms)}")
+    
+    return symptom_summary, extracted_symptoms
+
+async def extract_symptoms_single_pass(conversation: List[Dict], previous_symptoms: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Extract the symptom summary and the detailed information in one LLM call.
+    
+    Returns the same (symptom summary, detailed extraction) pair as the three-stage pipeline.
+    """
+    extracted_symptoms = await symptom_single_pass_llm.achat_json(
+        message=format_previous_symptoms(previous_symptoms) + "Extract the symptoms and their details from this conversation.",
+        context=conversation
+    )
+    
+    print(f"Single-pass Symptom Extraction Result (cleaned): {json.dumps(extracted_symptoms)}")
+    symptom_summary = {
+        "main_symptoms": extracted_symptoms.get("main_symptoms", []),
+        "other_symptoms": extracted_symptoms.get("other_symptoms", [])
+    }
+    
+    return symptom_summary, extracted_symptoms
+
+async def extract_symptoms(conversation: List[Dict], previous_symptoms: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     """
-    Extract JSON content from markdown-formatted text that might contain code blocks
+    Extract symptoms using the configured extraction mode.
+    
+    If previous_symptoms is given, conversation only holds the messages since the last
+    extraction and the result is merged into previous_symptoms.
+    The single-pass mode falls back to the three-stage pipeline if its response can't be used.
     """
-    import re
-    # Look for content between JSON code blocks
-    json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', markdown_text)
+    symptom_summary = extracted_symptoms = None
+    if settings.CONVERSATION.EXTRACTION_MODE == "single_pass":
+        try:
+            symptom_summary, extracted_symptoms = await extract_symptoms_single_pass(conversation, previous_symptoms)
+        except JSONDecodeError as e:
+            # Only unusable output falls back: provider failures (timeouts, 5xx, open breaker)
+            # would fail the three extra calls too
+            print(f"Single-pass extraction failed, falling back to three-stage pipeline: {str(e)}")
+    
+    if extracted_symptoms is None:
+        symptom_summary, extracted_symptoms = await extract_symptoms_three_stage(conversation, previous_symptoms)
     
-    if json_match:
-        # Return the content inside the code block
-        return json_match.group(1).strip()
+    if previous_symptoms:
+        merge_symptom_summary(symptom_summary, extracted_symptoms)
+        extracted_symptoms = merge_symptoms(previous_symptoms, extracted_symptoms)
     
-    # If no code blocks found, return the original text (it might be raw JSON)
-    return markdown_text.strip()
+    return symptom_summary, extracted_symptoms
+
+def merge_symptom_summary(symptom_summary: Dict[str, Any], extracted_symptoms: Dict[str, Any]):
+    """Merge the symptom summary lists into the detailed extraction (in place)"""
+    # Important: preserve the symptom lists from the first step
+    if "symptoms" in extracted_symptoms and "main_symptoms" not in extracted_symptoms:
+        extracted_symptoms["main_symptoms"] = symptom_summary.get("main_symptoms", [])
+    
+    if "other_symptoms" in symptom_summary and "additional_symptoms" not in extracted_symptoms:
+        extracted_symptoms["additional_symptoms"] = symptom_summary.get("other_symptoms", [])
+    extracted_symptoms.pop("other_symptoms", None)
+
+# Fields reported by get_missing_fields
+SYMPTOM_FIELDS = ("main symptoms", "pain area", "pain intensity", "pain description", "pain frequency",
+                  "other symptoms", "emotional state", "emotional scale")
 
-def process_conversation(conversation: List[Dict], current_symptoms: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+# Words by which the response generator's missing_information refers to each field
+MISSING_FIELD_KEYWORDS = {
+    "main symptoms": ["main symptom", "primary symptom"],
+    "pain area": ["area", "location", "where"],
+    "pain intensity": ["intensity", "severity", "scale"],
+    "pain description": ["description", "describe", "type of pain", "character"],
+    "pain frequency": ["frequency", "how often"],
+    "other symptoms": ["other symptom", "additional symptom"],
+    "emotional state": ["emotional state", "mood", "feel"],
+    "emotional scale": ["emotional scale"],
+}
+
+def get_missing_fields(symptoms: Dict[str, Any]) -> Set[str]:
+    """Get the set of symptom fields the follow-up question still needs to ask about"""
+    missing = set()
+    
+    if not symptoms.get("main_symptoms"):
+        missing.add("main symptoms")
+    
+    pain_areas = symptoms.get("pain_areas") or []
+    if not pain_areas:
+        missing.add("pain area")
+    for field, label in (("intensity", "pain intensity"),
+                         ("description", "pain description"),
+                         ("frequency", "pain frequency")):
+        if any(isinstance(area, dict) and area.get(field) in (None, "") for area in pain_areas):
+            missing.add(label)
+    
+    if not symptoms.get("additional_symptoms"):
+        missing.add("other symptoms")
+    
+    emotional_state = symptoms.get("emotional_state")
+    if not emotional_state:
+        missing.add("emotional state")
+    elif emotional_state != "normal" and symptoms.get("emotional_scale") is None:
+        missing.add("emotional scale")
+    
+    return missing
+
+def estimate_completeness(symptoms: Dict[str, Any]) -> int:
+    """Completeness score (0-100) for symptoms extracted without the LLM, from the fields still missing"""
+    return round(100 * (len(SYMPTOM_FIELDS) - len(get_missing_fields(symptoms))) / len(SYMPTOM_FIELDS))
+
+async def request_follow_up(symptoms: Dict[str, Any], latest_user_message: Optional[str] = None) -> Dict[str, Any]:
     """
-    Process the conversation about symptoms using a two-step LLM approach:
-    1. First extract and summarize key symptoms
-    2. Then extract detailed information about those symptoms and generate follow-up
+    Ask the response generator for the follow-up to a symptom summary.
+    
+    If latest_user_message is given, the summary is from the previous turn and the
+    model is asked to take the new message into account as well.
+    Returns the FollowUpOutput data, including the missing_information it asks about.
+    """
+    symptoms_summary = json.dumps(symptoms, indent=2)
+    print(f"Symptoms Summary: {symptoms_summary}")
+    
+    message = f"Generate a response based on this symptom summary:\n{symptoms_summary}"
+    if latest_user_message:
+        message += f"\n\nThe summary doesn't include the user's latest message yet, take it into account:\n{latest_user_message}"
+    
+    response_data = await response_generator_llm.achat_json(
+        message=message,
+        context=None  # No need to send the full conversation, just the symptom summary
+    )
+    
+    print(f"Response Generation Result (cleaned): {json.dumps(response_data)}")
+    return response_data
+
+async def generate_follow_up(symptoms: Dict[str, Any], latest_user_message: Optional[str] = None) -> str:
+    """Generate the follow-up question for a symptom summary (see request_follow_up)"""
+    response_data = await request_follow_up(symptoms, latest_user_message)
+    
+    # Get the follow-up question
+    return response_data.get("follow_up_question", DEFAULT_FOLLOW_UP)
+
+def get_asked_fields(missing_information: List[str]) -> Set[str]:
+    """Map the response generator's missing_information entries to get_missing_fields labels"""
+    asked = set()
+    for entry in missing_information or []:
+        entry = str(entry).lower()
+        for field, keywords in MISSING_FIELD_KEYWORDS.items():
+            if any(keyword in entry for keyword in keywords):
+                asked.add(field)
+    return asked
+
+def empty_symptoms() -> Dict[str, Any]:
+    """Symptoms of a conversation before anything has been extracted"""
+    return {
+        "pain_areas": [],
+        "main_symptoms": [],
+        "additional_symptoms": [],
+        "emotional_state": None,
+        "emotional_scale": None,
+        "completeness_score": 0
+    }
+
+def get_last_user_message(conversation: List[Dict]) -> Optional[str]:
+    for message in reversed(conversation):
+        if message["role"] == "user":
+            return message["content"]
+    return None
+
+def select_extraction_context(conversation: List[Dict], current_symptoms: Dict[str, Any],
+                              new_messages: Optional[List[Dict]]) -> Tuple[List[Dict], Optional[Dict[str, Any]]]:
+    """
+    Choose the messages to extract symptoms from, and the previous symptoms to extend.
+    
+    Only the new messages are sent if incremental extraction is enabled and there are
+    previous symptoms to extend.
+    """
+    if settings.CONVERSATION.INCREMENTAL_EXTRACTION and new_messages is not None and len(new_messages) < len(conversation):
+        return new_messages, current_symptoms
+    return conversation, None
+
+async def extract_message_symptoms(conversation: List[Dict], current_symptoms: Dict[str, Any],
+                                   new_messages: Optional[List[Dict]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Extract the symptoms of the conversation, including its latest user message.
+    
+    The local lexicon extractor runs on the latest user message first. If it understood the
+    whole message and no other user message is waiting to be extracted, its result is merged
+    into current_symptoms and the LLM extraction is skipped. Otherwise extract_symptoms runs.
+    """
+    local_extraction = extract_lexicon_symptoms(get_last_user_message(conversation), current_symptoms)
+    pending_messages = new_messages if new_messages is not None else conversation
+    pending_user_messages = sum(1 for message in pending_messages if message["role"] == "user")
+    
+    if settings.CONVERSATION.LOCAL_EXTRACTION and local_extraction.complete and pending_user_messages == 1:
+        lexicon_stats.record("llm_skipped")
+        extracted_symptoms = merge_symptoms(current_symptoms, local_extraction.symptoms)
+        extracted_symptoms["completeness_score"] = estimate_completeness(extracted_symptoms)
+        print(f"Local Symptom Extraction Result: {json.dumps(local_extraction.symptoms, ensure_ascii=False)}")
+        return {}, extracted_symptoms
+    
+    extraction_context, previous_symptoms = select_extraction_context(conversation, current_symptoms, new_messages)
+    return await extract_symptoms(extraction_context, previous_symptoms)
+
+def build_updated_symptoms(symptom_summary: Dict[str, Any], extracted_symptoms: Dict[str, Any],
+                           current_symptoms: Dict[str, Any]) -> Dict[str, Any]:
+    """Update the symptoms based on the extraction"""
+    return {
+        "pain_areas": extracted_symptoms.get("pain_areas", current_symptoms["pain_areas"]),
+        
+        # Get main_symptoms directly first, then from symptom_summary, then fallback
+        "main_symptoms": extracted_symptoms.get("main_symptoms", 
+                 symptom_summary.get("main_symptoms",
+                 current_symptoms.get("main_symptoms", []))),
+        
+        # Get additional_symptoms directly first, then from symptom_summary (other_symptoms), then fallback
+        "additional_symptoms": extracted_symptoms.get("additional_symptoms", 
+                      symptom_summary.get("other_symptoms",
+                      current_symptoms.get("additional_symptoms", []))),
+        
+        "emotional_state": extracted_symptoms.get("emotional_state", current_symptoms["emotional_state"]),
+        "emotional_scale": extracted_symptoms.get("emotional_scale", current_symptoms["emotional_scale"]),
+        "completeness_score": extracted_symptoms.get("completeness_score", 0)
+    }
+
+async def process_conversation(conversation: List[Dict], current_symptoms: Optional[Dict[str, Any]] = None,
+                               new_messages: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    """
+    Process the conversation about symptoms:
+    1. Extract and summarize key symptoms (locally or in one or two LLM calls, see extract_message_symptoms)
+    2. Generate a follow-up question based on the extracted symptoms
+    
+    If new_messages (the messages since the last extraction) is given and incremental
+    extraction is enabled, only those messages are sent along with current_symptoms.
     
     Returns a response and potentially updated symptom data.
     """
     # Initialize symptoms if not provided
     if current_symptoms is None:
-        current_symptoms = {
-            "pain_areas": [],
-            "main_symptoms": [],
-            "additional_symptoms": [],
-            "emotional_state": None,
-            "emotional_scale": None,
-            "completeness_score": 0
-        }
+        current_symptoms = empty_symptoms()
     
     # Get the last user message
-    last_user_message = None
-    for message in reversed(conversation):
-        if message["role"] == "user":
-            last_user_message = message["content"]
-            break
+    last_user_message = get_last_user_message(conversation)
     
     if not last_user_message:
         return {
-            "response": "Hello! Please describe your symptoms. Where are you experiencing pain or discomfort?",
+            "response": GREETING_MESSAGE,
             "updated_symptoms": current_symptoms
         }
     
     print(f"Last user message: {last_user_message}")
     
     try:
-        # STEP 1: First identify and summarize the symptoms
-        summary_json_raw = symptom_summarizer_llm.chat(
-            message="Extract and summarize the symptoms from this conversation.",
-            context=conversation
-        )
-        
-        # Clean the response to extract the actual JSON
-        summary_json = extract_json_from_markdown(summary_json_raw)
-        
-        print(f"Symptom Summary Result (cleaned): {summary_json}")
-        
         try:
-            # Parse the symptom summary
-            symptom_summary = json.loads(summary_json)
-            
-            # STEP 2: Extract detailed information about these symptoms
-            detailed_prompt = f"""
-            Based on the conversation and these previously identified symptoms:
-            {json.dumps(symptom_summary, indent=2)}
-            
-            Extract detailed information about these symptoms including pain areas, intensity, frequency, etc.
-            """
-            
-            symptom_json_raw = symptom_extractor_llm.chat(
-                message=detailed_prompt,
-                context=conversation
-            )
-            
-            # Clean the response to extract the actual JSON
-            symptom_json = extract_json_from_markdown(symptom_json_raw)
-            
-            print(f"Detailed Symptom Extraction Result (cleaned): {symptom_json}")
-            
-            # Parse the extracted detailed symptoms
-            extracted_symptoms = json.loads(symptom_json)
-            
-            # Merge the symptom summary with the detailed extraction
-            # Important: preserve the symptom lists from the first step
-            if "symptoms" in extracted_symptoms and "main_symptoms" not in extracted_symptoms:
-                extracted_symptoms["main_symptoms"] = symptom_summary.get("main_symptoms", [])
-            
-            if "other_symptoms" in symptom_summary and "additional_symptoms" not in extracted_symptoms:
-                extracted_symptoms["additional_symptoms"] = symptom_summary.get("other_symptoms", [])
-            
-            # STEP 3: Generate response based on the extracted symptoms
-            symptoms_summary = json.dumps(extracted_symptoms, indent=2)
-            print(f"Symptoms Summary: {symptoms_summary}")
-            
-            response_json_raw = response_generator_llm.chat(
-                message=f"Generate a response based on this symptom summary:\n{symptoms_summary}",
-                context=None  # No need to send the full conversation, just the symptom summary
-            )
-            
-            # Clean the response to extract the actual JSON
-            response_json = extract_json_from_markdown(response_json_raw)
-            
-            print(f"Response Generation Result (cleaned): {response_json}")
-            
-            # Parse the response
-            response_data = json.loads(response_json)
-            
-            # Get the follow-up question
-            response = response_data.get("follow_up_question", 
-                      "Could you tell me more about your symptoms?")
-            
-            # Update the symptoms based on the extraction
-            updated_symptoms = {
-                "pain_areas": extracted_symptoms.get("pain_areas", current_symptoms["pain_areas"]),
+            if settings.CONVERSATION.OPTIMISTIC_RESPONSE:
+                # Generate the follow-up from the previous symptoms and the new message while the
+                # extraction runs, and only regenerate it if it asks about a field the extraction
+                # filled in (or asks nothing recognizable while fields are still missing)
+                (symptom_summary, extracted_symptoms), follow_up = await asyncio.gather(
+                    extract_message_symptoms(conversation, current_symptoms, new_messages),
+                    request_follow_up(current_symptoms, last_user_message)
+                )
+                merge_symptom_summary(symptom_summary, extracted_symptoms)
+                response = follow_up.get("follow_up_question", DEFAULT_FOLLOW_UP)
                 
-                # Get main_symptoms directly first, then from symptom_summary, then fallback
-                "main_symptoms": extracted_symptoms.get("main_symptoms", 
-                         symptom_summary.get("main_symptoms",
-                         current_symptoms.get("main_symptoms", []))),
+                asked_fields = get_asked_fields(follow_up.get("missing_information", []))
+                still_missing = get_missing_fields(extracted_symptoms)
+                if asked_fields - still_missing or (not asked_fields and still_missing):
+                    print("Follow-up asks about answered fields, regenerating the follow-up question")
+                    response = await generate_follow_up(extracted_symptoms)
+            else:
+                symptom_summary, extracted_symptoms = await extract_message_symptoms(conversation, current_symptoms, new_messages)
+                merge_symptom_summary(symptom_summary, extracted_symptoms)
                 
-                # Get additional_symptoms directly first, then from symptom_summary (other_symptoms), then fallback
-                "additional_symptoms": extracted_symptoms.get("additional_symptoms", 
-                              symptom_summary.get("other_symptoms",
-                              current_symptoms.get("additional_symptoms", []))),
-                
-                "emotional_state": extracted_symptoms.get("emotional_state", current_symptoms["emotional_state"]),
-                "emotional_scale": extracted_symptoms.get("emotional_scale", current_symptoms["emotional_scale"]),
-                "completeness_score": extracted_symptoms.get("completeness_score", 0)
-            }
+                # STEP 3: Generate response based on the extracted symptoms
+                response = await generate_follow_up(extracted_symptoms)
             
             return {
                 "response": response,
-                "updated_symptoms": updated_symptoms
+                "updated_symptoms": build_updated_symptoms(symptom_summary, extracted_symptoms, current_symptoms),
+                "symptoms_extracted": True
             }
             
         except JSONDecodeError as e:
             print(f"Failed to parse JSON: {str(e)}")
-            print(f"Raw content: {symptom_json}")
+            print(f"Raw content: {e.doc}")
             # Fall back to a generic response if JSON parsing fails
             return {
-                "response": "I understand you're not feeling well. Could you tell me more specifically about where you're experiencing discomfort?",
+                "response": PARSE_FAILURE_RESPONSE,
                 "updated_symptoms": current_symptoms
             }
             
@@ -282,6 +540,87 @@ def process_conversation(conversation: List[Dict], current_symptoms: Optional[Di
         print(f"Error processing conversation with LLM: {str(e)}")
         # Fall back to a generic response if LLM fails
         return {
-            "response": "I'm sorry, I couldn't process that. Could you describe your symptoms again, focusing on where you feel pain or discomfort?",
+            "response": LLM_FAILURE_RESPONSE,
             "updated_symptoms": current_symptoms
         }
+
+async def reply_to_message(conversation_id: str, content: str) -> Optional[Dict[str, Any]]:
+    """
+    Add a user message to a stored conversation, process it and store the reply.
+    
+    Returns the result of process_conversation, with the conversation's messages after
+    the reply under "messages", or None if the conversation doesn't exist.
+    """
+    conversation_data = await add_message(conversation_id, "user", content)
+    if conversation_data is None:
+        return None
+    
+    messages = list(conversation_data["messages"])
+    result = await process_conversation(
+        conversation=messages,
+        current_symptoms=conversation_data["symptoms"],
+        new_messages=get_new_messages(conversation_data)
+    )
+    
+    # Store the reply, and remember which messages the symptoms cover if extraction succeeded
+    await save_reply(
+        conversation_id,
+        result["response"],
+        result.get("updated_symptoms"),
+        extracted_message_count=len(messages) if result.get("symptoms_extracted") else None
+    )
+    
+    result["messages"] = messages + [{"role": "system", "content": result["response"]}]
+    return result
+
+async def stream_conversation(conversation: List[Dict], current_symptoms: Optional[Dict[str, Any]] = None,
+                              new_messages: Optional[List[Dict]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming version of process_conversation.
+    
+    Symptoms are extracted first, then the reply is streamed from response_streamer_llm.
+    Yields {"type": "delta", "text": ...} events as the reply is generated, followed by a
+    {"type": "done", "response": ..., "updated_symptoms": ..., "symptoms_extracted": ...} event.
+    """
+    if current_symptoms is None:
+        current_symptoms = empty_symptoms()
+    
+    fallback_response = None
+    if not get_last_user_message(conversation):
+        fallback_response = GREETING_MESSAGE
+    else:
+        try:
+            symptom_summary, extracted_symptoms = await extract_message_symptoms(conversation, current_symptoms, new_messages)
+            merge_symptom_summary(symptom_summary, extracted_symptoms)
+        except JSONDecodeError as e:
+            print(f"Failed to parse JSON: {str(e)}")
+            fallback_response = PARSE_FAILURE_RESPONSE
+        except Exception as e:
+            print(f"Error processing conversation with LLM: {str(e)}")
+            fallback_response = LLM_FAILURE_RESPONSE
+    
+    if fallback_response:
+        yield {"type": "delta", "text": fallback_response}
+        yield {"type": "done", "response": fallback_response, "updated_symptoms": current_symptoms, "symptoms_extracted": False}
+        return
+    
+    response_parts = []
+    try:
+        async for delta in response_streamer_llm.astream(
+            message=f"Generate a response based on this symptom summary:\n{json.dumps(extracted_symptoms, indent=2)}",
+            context=None
+        ):
+            response_parts.append(delta)
+            yield {"type": "delta", "text": delta}
+    except Exception as e:
+        print(f"Error streaming response: {str(e)}")
+        if not response_parts:
+            response_parts.append(DEFAULT_FOLLOW_UP)
+            yield {"type": "delta", "text": DEFAULT_FOLLOW_UP}
+    
+    yield {
+        "type": "done",
+        "response": "".join(response_parts).strip(),
+        "updated_symptoms": build_updated_symptoms(symptom_summary, extracted_symptoms, current_symptoms),
+        "symptoms_extracted": True
+    }
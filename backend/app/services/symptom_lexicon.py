@@ -0,0 +1,338 @@
+"""
+Local symptom extraction from the fixed vocabulary of the extraction prompts.
+
+Every user message is matched against an Aho-Corasick automaton over English, Spanish and
+Chinese terms for symptoms, pain areas, descriptors, frequencies and emotional states, plus
+numeric intensities ("7 out of 10", "7/10", "7 de 10", "7分"). When every word of the message
+is accounted for and nothing is ambiguous, the extraction is complete and the LLM extraction
+step can be skipped.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import re
+import threading
+import unicodedata
+
+from app.utils.aho_corasick import AhoCorasick
+from app.utils.metrics import register_stats
+
+# Canonical values (as the extraction LLMs return them) and their surface forms in en/es/zh
+PAIN_AREAS = {
+    "abdomen": ["abdomen", "abdominal", "stomach", "belly", "tummy", "estomago", "vientre", "barriga", "panza",
+                "腹部", "肚子", "小腹", "胃"],
+    "head": ["head", "cabeza", "头", "头部"],
+    "back": ["back", "lower back", "upper back", "espalda", "espalda baja", "lumbar", "背", "背部", "后背", "腰"],
+    "chest": ["chest", "pecho", "胸", "胸部", "胸口"],
+    "pelvis": ["pelvis", "pelvic", "pelvic area", "pelvica", "pelvico", "骨盆", "盆腔"],
+    "leg": ["leg", "legs", "pierna", "piernas", "腿", "腿部"],
+    "arm": ["arm", "arms", "brazo", "brazos", "手臂", "胳膊"],
+}
+
+SYMPTOMS = {
+    "pelvic pain": ["pelvic pain", "dolor pelvico", "盆腔痛", "骨盆痛"],
+    "abdominal pain": ["abdominal pain", "stomach pain", "stomach ache", "stomachache", "belly pain",
+                       "dolor abdominal", "dolor de estomago", "dolor de barriga", "腹痛", "肚子痛", "肚子疼", "胃痛"],
+    "back pain": ["back pain", "lower back pain", "backache", "dolor de espalda", "dolor lumbar", "背痛", "腰痛"],
+    "headache": ["headache", "headaches", "migraine", "migraines", "dolor de cabeza", "migrana", "jaqueca",
+                 "头痛", "头疼", "偏头痛"],
+    "chest pain": ["chest pain", "dolor de pecho", "dolor en el pecho", "胸痛", "胸口痛"],
+    "bloating": ["bloating", "bloated", "hinchazon", "hinchada", "hinchado", "腹胀", "胀气"],
+    "cramping": ["cramping", "cramps", "menstrual cramps", "period cramps", "colicos", "colicos menstruales",
+                 "calambres", "痛经"],
+    "irregular periods": ["irregular periods", "irregular period", "periodos irregulares", "regla irregular",
+                          "menstruacion irregular", "月经不调", "月经不规律"],
+    "fatigue": ["fatigue", "tired", "tiredness", "exhausted", "fatiga", "cansancio", "cansada", "cansado", "agotada", "agotado",
+                "疲劳", "疲倦", "乏力"],
+    "nausea": ["nausea", "nauseous", "nauseated", "nauseas", "恶心"],
+    "mood changes": ["mood changes", "mood swings", "cambios de humor", "情绪波动"],
+    "heavy bleeding": ["heavy bleeding", "heavy periods", "sangrado abundante", "月经量多", "大量出血"],
+    "spotting": ["spotting", "manchado", "点滴出血"],
+}
+
+# Pain area implied by a symptom, and symptom implied by pain in an area
+SYMPTOM_AREAS = {
+    "pelvic pain": "pelvis",
+    "abdominal pain": "abdomen",
+    "back pain": "back",
+    "headache": "head",
+    "chest pain": "chest",
+}
+AREA_SYMPTOMS = {
+    "pelvis": "pelvic pain",
+    "abdomen": "abdominal pain",
+    "back": "back pain",
+    "head": "headache",
+    "chest": "chest pain",
+    "leg": "leg pain",
+    "arm": "arm pain",
+}
+
+PAIN_WORDS = ["pain", "painful", "ache", "aches", "aching", "hurts", "hurt", "hurting", "sore",
+              "dolor", "dolores", "duele", "molestia", "痛", "疼", "疼痛"]
+
+DESCRIPTORS = {
+    "sharp": ["sharp", "aguda", "agudo", "尖锐"],
+    "dull": ["dull", "sorda", "sordo", "隐痛", "钝痛"],
+    "throbbing": ["throbbing", "pulsating", "pulsatil", "punzante", "跳痛", "搏动"],
+    "burning": ["burning", "ardor", "quemante", "灼痛", "烧灼"],
+    "stabbing": ["stabbing", "penetrante", "刺痛"],
+    "shooting": ["shooting", "irradiado", "放射痛"],
+}
+
+FREQUENCIES = {
+    "very often": ["very often", "all the time", "constantly", "constant", "every day", "daily",
+                   "muy seguido", "muy a menudo", "todo el tiempo", "constantemente", "todos los dias",
+                   "总是", "一直", "每天"],
+    "often": ["often", "frequently", "frequent", "a menudo", "frecuentemente", "seguido", "经常", "常常"],
+    "sometimes": ["sometimes", "occasionally", "on and off", "a veces", "de vez en cuando", "有时", "有时候", "偶尔"],
+    "rarely": ["rarely", "seldom", "rara vez", "casi nunca", "很少"],
+}
+
+EMOTIONAL_STATES = {
+    "anxious": ["anxious", "worried", "nervous", "stressed", "ansiosa", "ansioso", "preocupada", "preocupado",
+                "nerviosa", "nervioso", "焦虑", "担心", "紧张"],
+    "depressed": ["depressed", "sad", "deprimida", "deprimido", "triste", "抑郁", "难过"],
+    "frustrated": ["frustrated", "irritable", "frustrada", "frustrado", "烦躁", "沮丧"],
+    "normal": ["fine", "normal", "calm", "bien", "tranquila", "tranquilo", "还好", "正常", "平静"],
+}
+
+NO_OTHER_SYMPTOMS = ["no other symptoms", "no other symptom", "nothing else", "that's all", "thats all",
+                     "ningun otro sintoma", "ningun otro", "nada mas", "没有其他症状", "没有别的", "就这些"]
+
+# Words that carry no symptom information. Negations are deliberately absent, so
+# "no fever" or "not anxious" always go to the LLM.
+FILLER_WORDS = [
+    "i", "i'm", "im", "i've", "ive", "me", "my", "a", "an", "the", "and", "or", "in", "on", "at", "of", "with",
+    "it", "it's", "its", "is", "am", "are", "was", "have", "has", "had", "feel", "feels", "feeling", "felt",
+    "get", "getting", "also", "too", "some", "very", "really", "quite", "pretty", "a bit", "a little",
+    "kind of", "about", "around", "roughly", "maybe", "like", "i'd", "say", "rate", "rated", "level",
+    "intensity", "scale", "emotionally", "yes", "yeah", "so", "just", "there", "area", "side",
+    "yo", "mi", "mis", "tengo", "tiene", "siento", "estoy", "esta", "es", "un", "una", "el", "la", "los",
+    "las", "lo", "en", "de", "del", "y", "o", "tambien", "muy", "bastante", "un poco", "algo", "como",
+    "alrededor", "mas o menos", "aproximadamente", "nivel", "intensidad", "escala", "si", "con",
+    "我", "我的", "的", "有", "很", "非常", "特别", "十分", "比较", "有点", "一点", "感觉", "觉得", "感到", "在",
+    "了", "和", "也", "是", "都", "大概", "左右", "差不多", "程度", "还", "就", "吧", "呢", "啊",
+]
+
+LOCAL_NO_OTHER = "no other symptoms"
+
+_CHINESE_DIGITS = {"一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+# "7 out of 10", "7/10", "7 de 10", "7 sobre 10", "7分" / "七分". A comma or period only
+# rules a match out when it is part of a number ("1,5"), not after a clause ("疼，七分").
+_INTENSITY = re.compile(
+    r"(?<!\d)(?<!\d[.,])(\d{1,2}(?:[.,]\d)?)\s*(?:/|out of|of|de|sobre)\s*10(?![\d.,]?\d)"
+    r"|(?<!\d)(?<!\d[.,])(\d{1,2}|[一二两三四五六七八九])\s*分"
+)
+
+# Words (Latin scripts) and single characters (Chinese) that must be matched for a complete extraction
+_TOKEN = re.compile(r"[\u3400-\u9fff]|[a-z0-9]+(?:'[a-z]+)?")
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase the text and strip accents, so "Estómago" matches "estomago" """
+    text = unicodedata.normalize("NFKD", text.lower()).replace("’", "'")
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def _build_automaton() -> AhoCorasick:
+    keywords: List[Tuple[str, Tuple[str, str]]] = []
+    for category, table in (("area", PAIN_AREAS), ("symptom", SYMPTOMS), ("descriptor", DESCRIPTORS),
+                            ("frequency", FREQUENCIES), ("emotion", EMOTIONAL_STATES)):
+        for canonical, terms in table.items():
+            keywords.extend((normalize_message(term), (category, canonical)) for term in terms)
+    keywords.extend((normalize_message(term), ("pain", term)) for term in PAIN_WORDS)
+    keywords.extend((normalize_message(term), ("no_other", LOCAL_NO_OTHER)) for term in NO_OTHER_SYMPTOMS)
+    # Filler first, so a word that is both filler and vocabulary keeps its vocabulary meaning
+    return AhoCorasick([(normalize_message(term), ("filler", term)) for term in FILLER_WORDS] + keywords)
+
+
+_automaton = _build_automaton()
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+
+def _parse_intensity(match: re.Match) -> Optional[float]:
+    if match.group(1) is not None:
+        value = float(match.group(1).replace(",", "."))
+    else:
+        digits = match.group(2)
+        value = float(_CHINESE_DIGITS.get(digits) or digits)
+    if not 0 <= value <= 10:
+        return None
+    return int(value) if value.is_integer() else value
+
+
+def _select_matches(text: str) -> List[Tuple[int, int, Tuple[str, Any]]]:
+    """Leftmost-longest, non-overlapping vocabulary and intensity matches in a normalized text"""
+    candidates = []
+    for start, end, value in _automaton.iter_matches(text):
+        # Latin-script terms must match whole words
+        if _is_word_char(text[start]) and start > 0 and _is_word_char(text[start - 1]):
+            continue
+        if _is_word_char(text[end - 1]) and end < len(text) and _is_word_char(text[end]):
+            continue
+        candidates.append((start, end, value))
+    for match in _INTENSITY.finditer(text):
+        intensity = _parse_intensity(match)
+        if intensity is not None:
+            candidates.append((match.start(), match.end(), ("intensity", intensity)))
+
+    candidates.sort(key=lambda candidate: (candidate[0], candidate[0] - candidate[1]))
+    selected = []
+    position = 0
+    for start, end, value in candidates:
+        if start >= position:
+            selected.append((start, end, value))
+            position = end
+    return selected
+
+
+def _has_unmatched_words(text: str, matches: List[Tuple[int, int, Tuple[str, Any]]]) -> bool:
+    covered = [False] * len(text)
+    for start, end, _ in matches:
+        covered[start:end] = [True] * (end - start)
+    return any(not all(covered[token.start():token.end()]) for token in _TOKEN.finditer(text))
+
+
+def _unique(values: List[Any]) -> List[Any]:
+    return list(dict.fromkeys(values))
+
+
+class LexiconExtraction:
+    """Symptoms found in one message, in the format of the extraction LLMs"""
+
+    def __init__(self, symptoms: Dict[str, Any], matched: bool, complete: bool):
+        # Only the fields the message mentions, ready for merge_symptoms
+        self.symptoms = symptoms
+        # Whether any vocabulary term was found
+        self.matched = matched
+        # Whether the whole message was understood, so the LLM extraction can be skipped
+        self.complete = complete
+
+
+class _LexiconStats:
+    """How many messages the local extractor understood fully, partially or not at all"""
+
+    OUTCOMES = ("complete", "partial", "no_match", "llm_skipped")
+
+    def __init__(self):
+        self._counts = dict.fromkeys(self.OUTCOMES, 0)
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            messages = self._counts["complete"] + self._counts["partial"] + self._counts["no_match"]
+            return dict(
+                self._counts,
+                messages=messages,
+                complete_rate=self._counts["complete"] / messages if messages else 0.0,
+                llm_skip_rate=self._counts["llm_skipped"] / messages if messages else 0.0
+            )
+
+
+lexicon_stats = _LexiconStats()
+register_stats("symptom_lexicon", lexicon_stats.stats)
+
+
+def extract_lexicon_symptoms(message: str, current_symptoms: Optional[Dict[str, Any]] = None) -> LexiconExtraction:
+    """
+    Extract symptoms from a user message with the local vocabulary.
+
+    current_symptoms resolves attributes given without an area ("it's sharp, 7 out of 10")
+    when exactly one pain area is known, and decides whether a new symptom is main or additional.
+    """
+    current_symptoms = current_symptoms or {}
+    text = normalize_message(message or "")
+    matches = _select_matches(text)
+
+    found: Dict[str, List[Any]] = {}
+    for _, _, (category, value) in matches:
+        found.setdefault(category, []).append(value)
+    matched = any(category != "filler" for category in found)
+    ambiguous = _has_unmatched_words(text, matches)
+
+    descriptors = _unique(found.get("descriptor", []))
+    frequencies = _unique(found.get("frequency", []))
+    intensities = found.get("intensity", [])
+    emotions = _unique(found.get("emotion", []))
+    symptom_names = _unique(found.get("symptom", []))
+    implied_areas = _unique([SYMPTOM_AREAS[name] for name in symptom_names if name in SYMPTOM_AREAS])
+    areas = _unique(found.get("area", []) + implied_areas)
+    pain_mentioned = bool(areas or descriptors or frequencies or found.get("pain"))
+
+    symptoms: Dict[str, Any] = {}
+
+    # Emotional state, and its scale when the number can't be about pain
+    if len(emotions) > 1:
+        ambiguous = True
+    elif emotions:
+        symptoms["emotional_state"] = emotions[0]
+        if intensities and not pain_mentioned:
+            if len(intensities) > 1:
+                ambiguous = True
+            symptoms["emotional_scale"] = intensities[0]
+            intensities = []
+        elif intensities:
+            ambiguous = True
+
+    # Pain attributes, attached to the single area they can be about
+    attributes: Dict[str, Any] = {}
+    if descriptors:
+        attributes["description"] = ", ".join(descriptors)
+    if frequencies:
+        ambiguous = ambiguous or len(frequencies) > 1
+        attributes["frequency"] = frequencies[0]
+    if intensities:
+        ambiguous = ambiguous or len(intensities) > 1
+        attributes["intensity"] = intensities[0]
+
+    pain_described = bool(attributes or found.get("pain"))
+    if not pain_described:
+        # An area without any pain ("bloated stomach") isn't a pain area
+        ambiguous = ambiguous or len(areas) > len(implied_areas)
+        areas = implied_areas
+
+    pain_areas = []
+    if areas:
+        if pain_described and len(areas) > 1:
+            ambiguous = True
+        for area in areas:
+            pain_area = {"area": area, "intensity": None, "frequency": None, "description": None}
+            if len(areas) == 1:
+                pain_area.update(attributes)
+            pain_areas.append(pain_area)
+        if pain_described:
+            symptom_names = _unique(symptom_names + [AREA_SYMPTOMS[area] for area in areas if area in AREA_SYMPTOMS])
+    elif pain_described:
+        known_areas = [area for area in current_symptoms.get("pain_areas") or [] if isinstance(area, dict)]
+        if len(known_areas) == 1 and attributes:
+            pain_areas.append(dict(area=known_areas[0].get("area"), **attributes))
+        else:
+            ambiguous = True
+    if pain_areas:
+        symptoms["pain_areas"] = pain_areas
+
+    # New symptoms: the first one is the main symptom if there is none yet
+    known = {str(name).lower() for name in
+             (current_symptoms.get("main_symptoms") or []) + (current_symptoms.get("additional_symptoms") or [])}
+    new_symptoms = [name for name in symptom_names if name not in known]
+    if new_symptoms and not current_symptoms.get("main_symptoms"):
+        symptoms["main_symptoms"] = new_symptoms[:1]
+        new_symptoms = new_symptoms[1:]
+    if new_symptoms:
+        symptoms["additional_symptoms"] = new_symptoms
+    if found.get("no_other"):
+        if new_symptoms:
+            ambiguous = True
+        else:
+            symptoms["additional_symptoms"] = [LOCAL_NO_OTHER]
+
+    complete = matched and bool(symptoms) and not ambiguous
+    lexicon_stats.record("complete" if complete else "partial" if matched else "no_match")
+    return LexiconExtraction(symptoms, matched, complete)
@@ -0,0 +1,153 @@
+"""
+Rule-based fast path for symptom triage.
+
+Clear-cut inputs (a 9/10 pain, a red-flag symptom, a single mild symptom) are classified
+by a table of rules compiled at import, without calling the LLM. Anything the rules aren't
+confident about returns None and goes to analysis_llm.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import re
+import threading
+
+from app.utils.metrics import register_stats
+
+# Symptoms that need immediate care whatever their intensity
+RED_FLAG_TERMS = [
+    "heavy bleeding", "hemorrhage", "soaking through", "blood clots", "fainting", "fainted", "passed out",
+    "unconscious", "chest pain", "difficulty breathing", "shortness of breath", "can't breathe",
+    "seizure", "high fever", "vomiting blood", "coughing up blood", "suicidal", "self harm",
+    "pregnant and bleeding", "sudden severe", "unbearable", "worst pain",
+]
+
+# Symptoms that always need a clinician's (or the LLM's) judgement
+UNCERTAIN_TERMS = [
+    "bleeding", "fever", "pregnant", "pregnancy", "vomiting", "dizzy", "dizziness", "numbness",
+    "discharge", "lump", "swelling", "burning urination", "blood", "weight loss", "missed period",
+]
+
+# Symptoms that are mild on their own
+MILD_TERMS = [
+    "mild cramps", "mild cramping", "cramps", "cramping", "bloating", "bloated", "fatigue", "tired",
+    "mild headache", "headache", "mood swings", "mood changes", "breast tenderness", "acne", "back ache",
+]
+
+# Areas where a severe pain (8/10) is already a red flag
+CRITICAL_AREAS = {"abdomen", "pelvis", "chest", "head"}
+
+DISTRESSED_STATES = {"panicked", "panic", "suicidal", "hopeless", "desperate"}
+
+RED_RECOMMENDATION = "Please seek immediate medical attention at an emergency department or call emergency services."
+GREEN_RECOMMENDATION = "Your symptoms appear mild. Rest, stay hydrated and monitor them; consult a healthcare provider if they persist or get worse."
+
+
+def _compile_terms(terms: List[str]) -> re.Pattern:
+    """One alternation matching any of the terms as whole words, longest first"""
+    alternatives = sorted((re.escape(term) for term in terms), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+
+_RED_FLAGS = _compile_terms(RED_FLAG_TERMS)
+_UNCERTAIN = _compile_terms(UNCERTAIN_TERMS)
+_MILD = _compile_terms(MILD_TERMS)
+
+
+def _symptom_features(symptom_data: Any) -> Dict[str, Any]:
+    """The values of a SymptomInput the rules look at"""
+    pain_areas = [
+        (str(area.area).strip().lower(), area.intensity or 0, area.description or "")
+        for area in symptom_data.pain_areas
+    ]
+    additional = [symptom for symptom in symptom_data.additional_symptoms if symptom]
+    text = " ; ".join([description for _, _, description in pain_areas] + additional)
+    return {
+        "pain_areas": pain_areas,
+        "additional": additional,
+        "text": text,
+        "emotional_state": (symptom_data.emotional_state or "").strip().lower()
+    }
+
+
+def _red_flag_symptom(features: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    match = _RED_FLAGS.search(features["text"])
+    if match:
+        return "red", f"Reported {match.group(0).lower()}, which needs immediate evaluation."
+    return None
+
+
+def _very_severe_pain(features: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    for area, intensity, _ in features["pain_areas"]:
+        if intensity >= 9 or (intensity >= 8 and area in CRITICAL_AREAS):
+            return "red", f"Severe {area} pain rated {intensity}/10."
+    return None
+
+
+def _single_mild_symptom(features: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    if _UNCERTAIN.search(features["text"]) or features["emotional_state"] in DISTRESSED_STATES:
+        return None
+    pain_areas, additional = features["pain_areas"], features["additional"]
+    if len(pain_areas) + len(additional) != 1:
+        return None
+    if pain_areas:
+        area, intensity, _ = pain_areas[0]
+        if 0 < intensity <= 3 and area != "chest":
+            return "green", f"Mild {area} pain rated {intensity}/10 with no other symptoms."
+        return None
+    if _MILD.fullmatch(additional[0].strip()):
+        return "green", f"A single mild symptom ({additional[0].strip().lower()})."
+    return None
+
+
+# Rules in priority order: the first that matches decides
+TRIAGE_RULES: List[Tuple[str, Callable[[Dict[str, Any]], Optional[Tuple[str, str]]]]] = [
+    ("red_flag_symptom", _red_flag_symptom),
+    ("very_severe_pain", _very_severe_pain),
+    ("single_mild_symptom", _single_mild_symptom),
+]
+
+
+class _TriagePathStats:
+    """How often each rule (or the LLM fall-through) decided a triage"""
+
+    def __init__(self):
+        self._counts = dict.fromkeys([name for name, _ in TRIAGE_RULES] + ["llm"], 0)
+        self._lock = threading.Lock()
+
+    def record(self, path: str):
+        with self._lock:
+            self._counts[path] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self._counts.values())
+            fast = total - self._counts["llm"]
+            return {
+                "total": total,
+                "paths": dict(self._counts),
+                "hit_ratios": {path: count / total if total else 0.0 for path, count in self._counts.items()},
+                "fast_path_ratio": fast / total if total else 0.0
+            }
+
+
+triage_path_stats = _TriagePathStats()
+register_stats("triage_fast_path", triage_path_stats.stats)
+
+
+def fast_path_triage(symptom_data: Any) -> Optional[Dict[str, str]]:
+    """
+    Classify a SymptomInput with the rule table.
+
+    Returns a TriageResult dict, or None (counted as the "llm" path) when no rule is confident.
+    """
+    features = _symptom_features(symptom_data)
+    for name, rule in TRIAGE_RULES:
+        decision = rule(features)
+        if decision is not None:
+            triage_path_stats.record(name)
+            severity, summary = decision
+            return {
+                "severity": severity,
+                "recommendation": RED_RECOMMENDATION if severity == "red" else GREEN_RECOMMENDATION,
+                "summary": summary
+            }
+    triage_path_stats.record("llm")
+    return None
@@ -0,0 +1,75 @@
+from typing import Optional
+import asyncio
+import json
+
+from app.config import settings
+from app.utils.cache import DiskCache
+from app.utils.metrics import register_stats
+
+# Synthesized speech (MP3 bytes) on disk, indexed in memory and evicted LRU beyond the size limit
+tts_cache: Optional[DiskCache] = None
+if settings.SPEECH.TTS_CACHE_DIR:
+    tts_cache = DiskCache(
+        settings.SPEECH.TTS_CACHE_DIR,
+        max_bytes=settings.SPEECH.TTS_CACHE_MAX_BYTES,
+        suffix=".mp3"
+    )
+    register_stats("tts_cache", tts_cache.stats)
+
+_prewarm_task: Optional[asyncio.Task] = None
+
+
+def make_tts_cache_key(text: str, voice: str, model: str, language: str) -> str:
+    """Cache key for synthesized speech; the cache stores it under a hash of this key"""
+    return json.dumps([text, voice, model, language], ensure_ascii=False)
+
+
+async def get_cached_speech(key: str) -> Optional[bytes]:
+    """Read cached speech in a worker thread, including audio cached by other worker processes"""
+    if tts_cache is None:
+        return None
+    return await asyncio.to_thread(tts_cache.get, key)
+
+
+def _write_speech(key: str, audio_data: bytes):
+    try:
+        tts_cache.set(key, audio_data)
+    except OSError as e:
+        print(f"Failed to write TTS cache entry: {str(e)}")
+
+
+async def set_cached_speech(key: str, audio_data: bytes):
+    if tts_cache is None or not audio_data:
+        return
+    await asyncio.to_thread(_write_speech, key, audio_data)
+
+
+async def prewarm_tts_cache(language: str = "en", voice_type: str = "female"):
+    """Synthesize the app's fixed phrases (greeting, fallbacks) that aren't cached yet"""
+    # Imported here to avoid a circular import with speech_services
+    from app.services.speech_services import synthesize_speech
+    from app.services.symptom_chat_processing import CANNED_RESPONSES
+    
+    for phrase in CANNED_RESPONSES:
+        try:
+            await synthesize_speech(phrase, language, voice_type)
+        except Exception as e:
+            print(f"Failed to pre-synthesize phrase {phrase!r}: {str(e)}")
+
+
+def start_tts_prewarm():
+    """Pre-synthesize the fixed phrases in the background"""
+    global _prewarm_task
+    if tts_cache is not None and _prewarm_task is None:
+        _prewarm_task = asyncio.create_task(prewarm_tts_cache())
+
+
+async def stop_tts_prewarm():
+    global _prewarm_task
+    if _prewarm_task is not None:
+        _prewarm_task.cancel()
+        try:
+            await _prewarm_task
+        except asyncio.CancelledError:
+            pass
+        _prewarm_task = None
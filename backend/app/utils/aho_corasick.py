@@ -0,0 +1,61 @@
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton matching a fixed set of keywords in one pass over a text.
+
+    Built once from (keyword, value) pairs. iter_matches yields every occurrence of every
+    keyword, overlapping ones included, in time linear in the text plus the number of matches.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (keyword length, value) of every keyword ending there
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+
+        for keyword, value in dict(keywords).items():
+            if keyword:
+                self._add(keyword, value)
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def _add(self, keyword: str, value: Any):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append((len(keyword), value))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0) if state else 0
+                # Keywords that are suffixes of this one end here too
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, value) for every keyword occurrence in the text"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._output[state]:
+                yield index + 1 - length, index + 1, value
@@ -0,0 +1,277 @@
+from typing import Any, Callable, Dict, Optional
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+
+def hash_key(key: str) -> str:
+    """Hash a cache key into a fixed-length, filesystem-safe string"""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """In-memory LRU cache with an optional TTL and hit/miss/eviction counters"""
+    
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+    
+    def contains(self, key: str) -> bool:
+        """Check for a live entry without counting a lookup"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not (self.ttl_seconds and time.monotonic() - entry[1] > self.ttl_seconds)
+    
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def items(self):
+        """Snapshot of the cached (key, value) pairs, least recently used first"""
+        with self._lock:
+            return [(key, entry[0]) for key, entry in self._entries.items()]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class DiskCache:
+    """
+    On-disk cache of byte values, one file per key, with an in-memory index.
+    
+    The index is rebuilt from the directory at startup. A key missing from the index is
+    looked up on disk too, so entries written by other processes sharing the directory
+    (other workers, the pre-warm CLI) are picked up. Entries older than ttl_seconds are
+    removed, and the least recently used entries are evicted beyond max_bytes.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int = 0, ttl_seconds: float = 0, suffix: str = ".bin"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.suffix = suffix
+        # hashed key -> (size, stored_at), least recently used first
+        self._index: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+    
+    def _path(self, hashed: str) -> str:
+        return os.path.join(self.directory, hashed + self.suffix)
+    
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_atime, name[:-len(self.suffix)], stat.st_size, stat.st_mtime))
+        for _, hashed, size, stored_at in sorted(entries):
+            self._index[hashed] = (size, stored_at)
+            self._total_bytes += size
+    
+    def _adopt(self, hashed: str) -> Optional[tuple]:
+        """Add an entry written by another process to the index, if its file exists"""
+        try:
+            stat = os.stat(self._path(hashed))
+        except OSError:
+            return None
+        entry = (stat.st_size, stat.st_mtime)
+        self._index[hashed] = entry
+        self._total_bytes += stat.st_size
+        return entry
+    
+    def _remove(self, hashed: str):
+        size, _ = self._index.pop(hashed)
+        self._total_bytes -= size
+        try:
+            os.remove(self._path(hashed))
+        except OSError:
+            pass
+    
+    def get(self, key: str) -> Optional[bytes]:
+        hashed = hash_key(key)
+        with self._lock:
+            entry = self._index.get(hashed)
+            if entry is None:
+                entry = self._adopt(hashed)
+            if entry is not None and self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds:
+                self._remove(hashed)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(hashed)
+        
+        try:
+            with open(self._path(hashed), "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                if hashed in self._index:
+                    self._remove(hashed)
+                self.misses += 1
+            return None
+        
+        with self._lock:
+            self.hits += 1
+        return data
+    
+    def contains(self, key: str) -> bool:
+        """Check for an entry without counting a lookup"""
+        hashed = hash_key(key)
+        with self._lock:
+            entry = self._index.get(hashed) or self._adopt(hashed)
+            return entry is not None and not (self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds)
+    
+    def set(self, key: str, data: bytes):
+        hashed = hash_key(key)
+        # Write to a temporary file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, self._path(hashed))
+        
+        with self._lock:
+            if hashed in self._index:
+                self._total_bytes -= self._index.pop(hashed)[0]
+            self._index[hashed] = (len(data), time.time())
+            self._total_bytes += len(data)
+            while self.max_bytes and self._total_bytes > self.max_bytes and len(self._index) > 1:
+                self._remove(next(iter(self._index)))
+                self.evictions += 1
+    
+    def delete(self, key: str):
+        with self._lock:
+            hashed = hash_key(key)
+            if hashed in self._index:
+                self._remove(hashed)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "directory": self.directory,
+                "entries": len(self._index),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class TwoTierCache:
+    """
+    Memory LRU in front of an optional disk cache.
+    
+    Values are serialized with dumps/loads for the disk tier; disk hits are
+    promoted into memory.
+    """
+    
+    def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None,
+                 dumps: Callable[[Any], bytes] = None, loads: Callable[[bytes], Any] = None):
+        self.memory = memory
+        self.disk = disk
+        self.dumps = dumps or (lambda value: value)
+        self.loads = loads or (lambda data: data)
+    
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        
+        data = self.disk.get(key)
+        if data is None:
+            return None
+        try:
+            value = self.loads(data)
+        except Exception as e:
+            print(f"Discarding unreadable cache entry: {str(e)}")
+            self.disk.delete(key)
+            return None
+        self.memory.set(key, value)
+        return value
+    
+    def contains(self, key: str) -> bool:
+        """Check for an entry without counting a lookup"""
+        return self.memory.contains(key) or (self.disk is not None and self.disk.contains(key))
+    
+    def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, self.dumps(value))
+            except OSError as e:
+                print(f"Failed to write cache entry to disk: {str(e)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        stats = {"memory": memory}
+        hits = memory["hits"]
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+            hits += stats["disk"]["hits"]
+        # Every lookup goes to memory first, so its lookups are the total
+        lookups = memory["hits"] + memory["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
@@ -1,7 +1,11 @@
 import json
+import re
 import uuid
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+
+# End of a sentence: terminal punctuation (Latin or CJK) followed by whitespace, or CJK punctuation alone
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])")
 
 def generate_unique_id() -> str:
     """Generate a unique ID for reports or user sessions"""
@@ -47,4 +51,12 @@ def get_localized_message(message_key: str, language: str = "en") -> str:
     if language not in messages[message_key]:
         language = "en"  # Default to English
     
-    return messages[message_key][language] 
\ No newline at end of file
+    return messages[message_key][language] 
+
+def split_complete_sentences(text: str) -> Tuple[List[str], str]:
+    """
+    Split streamed text into the sentences that are complete so far and the unfinished remainder
+    """
+    parts = _SENTENCE_END.split(text)
+    remainder = parts.pop()
+    return [part.strip() for part in parts if part.strip()], remainder
@@ -0,0 +1,18 @@
+from typing import Any, Callable, Dict
+
+# Named providers of runtime counters (cache hit rates, store sizes, ...)
+_stats_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+def register_stats(name: str, provider: Callable[[], Dict[str, Any]]):
+    """Register a function returning counters to expose under the given name"""
+    _stats_providers[name] = provider
+
+def get_all_stats() -> Dict[str, Dict[str, Any]]:
+    """Collect the counters of every registered provider"""
+    stats = {}
+    for name, provider in _stats_providers.items():
+        try:
+            stats[name] = provider()
+        except Exception as e:
+            stats[name] = {"error": str(e)}
+    return stats
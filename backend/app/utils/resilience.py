@@ -0,0 +1,189 @@
+"""
+Timeouts, retries and circuit breakers for calls to upstream providers (LLM, speech).
+
+call_with_resilience gives every attempt a deadline, retries transient failures (429, 5xx,
+timeouts, connection errors) with exponential backoff and full jitter, and fails fast with
+CircuitOpenError while the provider's breaker is open, so callers go straight to their fallbacks.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import openai
+
+from app.config import settings
+from app.utils.metrics import register_stats
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive provider failures. While open, calls are
+    rejected until reset_timeout_seconds have passed, then one trial call is let through
+    (half open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+        self.successes = 0
+        self.failures = 0
+        self.rejections = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Check whether a call may go to the provider now"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout_seconds:
+                self.state = HALF_OPEN
+                self._trial_in_progress = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            self.rejections += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_progress = False
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_ignored(self):
+        """The call failed for a reason that says nothing about the provider's health"""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def check(self):
+        """Raise CircuitOpenError if the call may not go to the provider"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit breaker open)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejections": self.rejections,
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "times_opened": self.times_opened
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the circuit breaker of a provider, creating it on first use"""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(
+            name,
+            failure_threshold=settings.RESILIENCE.BREAKER_FAILURE_THRESHOLD,
+            reset_timeout_seconds=settings.RESILIENCE.BREAKER_RESET_SECONDS
+        )
+    return _breakers[name]
+
+
+register_stats("circuit_breakers", lambda: {name: breaker.stats() for name, breaker in _breakers.items()})
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Whether an error is transient and the provider's fault: rate limits, 5xx, timeouts, connection errors"""
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError,
+                          httpx.TimeoutException, httpx.NetworkError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    ceiling = min(settings.RESILIENCE.BACKOFF_MAX_SECONDS, settings.RESILIENCE.BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+async def call_with_resilience(breaker: CircuitBreaker, call: Callable[[], Awaitable[Any]],
+                               timeout: Optional[float] = None, max_retries: Optional[int] = None) -> Any:
+    """
+    Call a provider through its circuit breaker, with a deadline per attempt and retries.
+
+    call must start a new attempt each time it is called. Errors that aren't provider
+    failures (bad requests, parse errors) are raised right away without a retry.
+    """
+    if max_retries is None:
+        max_retries = settings.RESILIENCE.MAX_RETRIES
+
+    attempt = 0
+    while True:
+        breaker.check()
+        try:
+            if timeout:
+                result = await asyncio.wait_for(call(), timeout)
+            else:
+                result = await call()
+        except asyncio.CancelledError:
+            breaker.record_ignored()
+            raise
+        except Exception as e:
+            if not is_provider_failure(e):
+                breaker.record_ignored()
+                raise
+            if isinstance(e, asyncio.TimeoutError):
+                breaker.record_timeout()
+            breaker.record_failure()
+            if attempt >= max_retries:
+                raise
+            breaker.record_retry()
+            delay = backoff_delay(attempt)
+            attempt += 1
+            print(f"{breaker.name} call failed ({type(e).__name__}), retry {attempt}/{max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
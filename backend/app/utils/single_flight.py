@@ -0,0 +1,55 @@
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import asyncio
+import time
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one upstream call.
+
+    The first caller for a key starts the call and later callers await the same task.
+    A successful result is also shared with callers arriving up to window_seconds after
+    it completed. Failures are shared only with the callers that were already waiting.
+    """
+
+    def __init__(self, window_seconds: float = 0):
+        self.window_seconds = window_seconds
+        # key -> (task, completed_at or None while in flight)
+        self._calls: Dict[str, Tuple[asyncio.Task, Any]] = {}
+
+        self.leaders = 0
+        self.joined = 0
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key, (None,))[0] is task:
+            del self._calls[key]
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        if task.cancelled() or task.exception() is not None or not self.window_seconds:
+            self._forget(key, task)
+            return
+        self._calls[key] = (task, time.monotonic())
+        asyncio.get_running_loop().call_later(self.window_seconds, self._forget, key, task)
+
+    async def run(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._calls.get(key)
+        if entry is not None and (entry[1] is None or time.monotonic() - entry[1] <= self.window_seconds):
+            self.joined += 1
+            task = entry[0]
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(call())
+            self._calls[key] = (task, None)
+            task.add_done_callback(lambda done: self._on_done(key, done))
+        # A caller giving up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.joined
+        return {
+            "in_flight": sum(1 for _, completed_at in self._calls.values() if completed_at is None),
+            "upstream_calls": self.leaders,
+            "coalesced_calls": self.joined,
+            "coalesced_rate": self.joined / calls if calls else 0.0,
+            "window_seconds": self.window_seconds
+        }
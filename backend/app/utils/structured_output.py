@@ -0,0 +1,263 @@
+"""
+Shared parser for JSON in LLM responses.
+
+Models wrap JSON in markdown code blocks, add prose around it, leave trailing commas or
+stop mid-object when they run out of tokens. parse_llm_json handles all of these in one
+pass over the text before giving up, so a paid response is only thrown away when there
+is really nothing to recover.
+"""
+from collections import defaultdict
+from json.decoder import JSONDecodeError
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+import json
+import re
+import threading
+
+from pydantic import BaseModel, ValidationError
+
+from app.utils.metrics import register_stats
+
+# Content of a markdown code block, with or without a language tag
+_CODE_BLOCK = re.compile(r"```(?:json|JSON)?\s*([\s\S]*?)\s*```")
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+# How many cut points to try when repairing a truncated response
+MAX_TRUNCATION_REPAIRS = 5
+
+
+class StructuredOutputError(JSONDecodeError):
+    """
+    Raised when no valid JSON (or no JSON matching the schema) can be recovered from a response.
+
+    Subclasses JSONDecodeError so existing parse-failure fallbacks keep working.
+    """
+
+    def __init__(self, msg: str, doc: str, pos: int = 0):
+        super().__init__(msg, doc, pos)
+
+
+class _ParseStats:
+    """Per-LLM counters of how responses were parsed"""
+
+    OUTCOMES = ("direct", "extracted", "repaired", "failed", "invalid")
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(self.OUTCOMES, 0))
+        self._lock = threading.Lock()
+
+    def record(self, llm_name: str, outcome: str):
+        with self._lock:
+            self._counts[llm_name][outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {}
+            for llm_name, counts in self._counts.items():
+                total = sum(counts.values())
+                failures = counts["failed"] + counts["invalid"]
+                stats[llm_name] = dict(counts, failure_rate=failures / total if total else 0.0)
+            return stats
+
+
+parse_stats = _ParseStats()
+register_stats("structured_output", parse_stats.stats)
+
+
+def scan_json(text: str, start: int) -> Tuple[str, Optional[int], List[Tuple[int, str]]]:
+    """
+    Scan the JSON value starting at text[start] ("{" or "[") in a single pass.
+
+    Trailing commas before a closing bracket are dropped on the way. Returns the cleaned
+    text, the index just past the value in the original text (None if the text ends first),
+    and for each structural comma (outside strings) its position in the cleaned text and the
+    closers that would complete the value if it were cut there. The end of a truncated text
+    is also a cut point when it doesn't fall inside a string or a number.
+    """
+    output: List[str] = []
+    stack: List[str] = []
+    cut_points: List[Tuple[int, str]] = []
+    in_string = False
+    escaped = False
+
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            output.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            # Drop a trailing comma (and the whitespace after it)
+            end = len(output)
+            while end and output[end - 1].isspace():
+                end -= 1
+            if end and output[end - 1] == ",":
+                del output[end - 1:]
+            if not stack or stack[-1] != char:
+                # Mismatched bracket, not something we can repair
+                return "".join(output), None, cut_points
+            stack.pop()
+            output.append(char)
+            if not stack:
+                return "".join(output), index + 1, cut_points
+            continue
+        elif char == ",":
+            cut_points.append((len(output), "".join(reversed(stack))))
+        output.append(char)
+
+    # Truncated: the end of the text is a cut point only if the last value there is complete.
+    # A cut-off string or number ("On a scale of 1-", "12" of "125") must not pass as a value.
+    cleaned = "".join(output)
+    if not in_string and cleaned.rstrip()[-1:] in ('}', ']', '"'):
+        cut_points.append((len(cleaned), "".join(reversed(stack))))
+    return cleaned, None, cut_points
+
+
+def _loads(candidate: str) -> Tuple[bool, Any]:
+    try:
+        return True, json.loads(candidate)
+    except ValueError:
+        return False, None
+
+
+def _iter_candidates(text: str) -> Iterator[str]:
+    """The contents of markdown code blocks, then the text itself"""
+    for match in _CODE_BLOCK.finditer(text):
+        yield match.group(1)
+    yield text
+
+
+def _recover(text: str) -> Tuple[Optional[str], Any]:
+    """
+    Recover a JSON value from the text.
+
+    Returns how it was found ("direct", "extracted" or "repaired", None if it wasn't) and the value.
+    """
+    ok, value = _loads(text)
+    if ok:
+        return "direct", value
+
+    truncated: Optional[Tuple[str, List[Tuple[int, str]]]] = None
+    for candidate in _iter_candidates(text):
+        ok, value = _loads(candidate.strip())
+        if ok:
+            return "extracted", value
+
+        # Scan each balanced object or array in the candidate
+        position = 0
+        while True:
+            starts = [i for i in (candidate.find("{", position), candidate.find("[", position)) if i != -1]
+            if not starts:
+                break
+            start = min(starts)
+            cleaned, end, cut_points = scan_json(candidate, start)
+            if end is None:
+                if truncated is None:
+                    truncated = (cleaned, cut_points)
+                break
+            ok, value = _loads(cleaned)
+            if ok:
+                return ("extracted" if cleaned == candidate[start:end] else "repaired"), value
+            position = start + 1
+
+    # Truncated response: complete it at the latest point that parses
+    if truncated is not None:
+        cleaned, cut_points = truncated
+        for cut, closers in reversed(cut_points[-MAX_TRUNCATION_REPAIRS:]):
+            ok, value = _loads(cleaned[:cut].rstrip().rstrip(",") + closers)
+            if ok:
+                return "repaired", value
+    return None, None
+
+
+def _strict_schema(schema: Any) -> Optional[Any]:
+    """
+    Make a JSON schema usable in strict structured-output mode: every property required,
+    no additional properties and no defaults. Returns None if the schema has free-form objects.
+    """
+    if isinstance(schema, list):
+        items = [_strict_schema(item) for item in schema]
+        return None if any(item is None for item in items) else items
+    if not isinstance(schema, dict):
+        return schema
+
+    strict = {}
+    for key, value in schema.items():
+        if key == "default":
+            continue
+        if key in ("properties", "$defs"):
+            converted = {name: _strict_schema(item) for name, item in value.items()}
+            if any(item is None for item in converted.values()):
+                return None
+            strict[key] = converted
+        elif isinstance(value, (dict, list)):
+            converted = _strict_schema(value)
+            if converted is None:
+                return None
+            strict[key] = converted
+        else:
+            strict[key] = value
+
+    if strict.get("type") == "object":
+        if "properties" not in strict:
+            return None
+        strict["required"] = list(strict["properties"])
+        strict["additionalProperties"] = False
+    return strict
+
+
+def build_response_format(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    The response_format requesting output matching a pydantic model from the provider.
+
+    Strict mode is used when the model allows it, otherwise the schema is only a guide
+    and parse_llm_json's validation is the only check.
+    """
+    json_schema = schema.model_json_schema()
+    strict_schema = _strict_schema(json_schema)
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": schema.__name__,
+            "schema": strict_schema if strict_schema is not None else json_schema,
+            "strict": strict_schema is not None
+        }
+    }
+
+
+def parse_llm_json(text: str, llm_name: str = "unknown", schema: Optional[Type[BaseModel]] = None) -> Any:
+    """
+    Parse the JSON in an LLM response.
+
+    Tries, in order: the whole response, markdown code blocks, balanced {...} / [...] spans
+    (dropping trailing commas), and finally completing a truncated object at its last comma.
+    If a pydantic schema is given the value is validated against it and returned as plain
+    data, with only the fields the model provided.
+
+    Raises StructuredOutputError if nothing can be recovered or validation fails.
+    """
+    text = text or ""
+    outcome, value = _recover(text)
+    if outcome is None:
+        parse_stats.record(llm_name, "failed")
+        raise StructuredOutputError(f"No JSON found in {llm_name} response", text)
+
+    if schema is not None:
+        try:
+            value = schema.model_validate(value).model_dump(exclude_unset=True)
+        except ValidationError as e:
+            parse_stats.record(llm_name, "invalid")
+            raise StructuredOutputError(f"{llm_name} response does not match {schema.__name__}: {e}", text)
+
+    parse_stats.record(llm_name, outcome)
+    return value
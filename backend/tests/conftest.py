@@ -0,0 +1,4 @@
+import os
+
+# The settings require an API key at import, the tests never call the provider
+os.environ.setdefault("LLM__API_KEY", "test")
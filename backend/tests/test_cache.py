@@ -0,0 +1,72 @@
+import os
+import time
+
+from app.utils.cache import DiskCache, LRUCache, TwoTierCache, hash_key
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+    assert cache.stats()["hits"] == 3
+
+
+def test_lru_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LRUCache(ttl_seconds=10)
+    cache.set("a", 1)
+    now[0] += 5
+    assert cache.contains("a")
+    now[0] += 6
+    assert not cache.contains("a")
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+
+
+def test_disk_cache_round_trip_and_size_limit(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"67890")
+    assert cache.get("a") == b"12345"
+    cache.set("c", b"abcde")
+    # "b" was used least recently
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345"
+    assert cache.get("c") == b"abcde"
+
+
+def test_two_tier_cache_promotes_disk_hits(tmp_path):
+    disk = DiskCache(str(tmp_path))
+    disk.set("a", b"data")
+    cache = TwoTierCache(LRUCache(), disk)
+    assert cache.get("a") == b"data"
+    assert cache.memory.contains("a")
+
+
+def test_disk_cache_sees_entries_written_by_another_instance(tmp_path):
+    # Two workers (or a worker and the pre-warm CLI) sharing one directory
+    reader = DiskCache(str(tmp_path), ttl_seconds=60)
+    writer = DiskCache(str(tmp_path), ttl_seconds=60)
+    assert reader.get("a") is None
+    writer.set("a", b"data")
+    assert reader.contains("a")
+    assert reader.get("a") == b"data"
+    assert reader.stats()["entries"] == 1
+
+
+def test_disk_cache_ignores_expired_entries_of_another_instance(tmp_path):
+    reader = DiskCache(str(tmp_path), ttl_seconds=60)
+    writer = DiskCache(str(tmp_path), ttl_seconds=60)
+    writer.set("a", b"data")
+    stale = time.time() - 120
+    os.utime(writer._path(hash_key("a")), (stale, stale))
+    assert not reader.contains("a")
+    assert reader.get("a") is None
+    assert reader.expirations == 1
@@ -0,0 +1,81 @@
+from app.services.context_window import (
+    count_message_tokens, fit_context, summarize_dropped_turns, truncate_to_tokens
+)
+from app.services.llm import LLM
+
+MODEL = "gpt-4o-mini"
+
+
+def turns(count: int) -> list:
+    return [
+        {"role": "user" if index % 2 == 0 else "assistant", "content": f"message number {index} " + "word " * 20}
+        for index in range(count)
+    ]
+
+
+def tokens(messages: list) -> int:
+    return sum(count_message_tokens(m["role"], m["content"], MODEL) for m in messages)
+
+
+def test_context_that_fits_is_unchanged():
+    context = turns(4)
+    assert fit_context(context, tokens(context) + 10, 10, MODEL) == context
+
+
+def test_keeps_the_most_recent_turns_that_fit():
+    context = turns(10)
+    budget = tokens(context[-3:]) + 10
+    fitted = fit_context(context, budget, 10, MODEL)
+    assert fitted == context[-3:]
+
+
+def test_no_room_for_context():
+    assert fit_context(turns(2), 100, 100, MODEL) == []
+
+
+def test_dropped_user_turns_are_summarized():
+    context = turns(10)
+    budget = tokens(context[-3:]) + 10 + 60
+    fitted = fit_context(context, budget, 10, MODEL, summary_tokens=60)
+    summary, kept = fitted[0], fitted[1:]
+    assert summary["role"] == "system"
+    assert summary["content"].startswith("Summary of earlier messages from the user")
+    assert kept == context[-len(kept):]
+    assert tokens(fitted) <= budget - 10
+
+
+def test_summary_keeps_only_the_latest_user_statements():
+    dropped = [
+        {"role": "user", "content": "first statement " * 30},
+        {"role": "assistant", "content": "assistant reply"},
+        {"role": "user", "content": "latest statement"},
+    ]
+    summary = summarize_dropped_turns(dropped, 40, MODEL)
+    assert "assistant reply" not in summary["content"]
+    assert summary["content"].endswith("latest statement")
+    # Joining the prefix and the text can change the token count by one
+    assert count_message_tokens("system", summary["content"], MODEL) <= 40 + 1
+    assert summarize_dropped_turns([{"role": "assistant", "content": "hi"}], 40, MODEL) is None
+
+
+def test_truncate_keeps_the_end():
+    text = "one two three four five six seven eight nine ten"
+    truncated = truncate_to_tokens(text, 3, MODEL)
+    assert text.endswith(truncated)
+    assert 0 < len(truncated) < len(text)
+    assert truncate_to_tokens(text, 0, MODEL) == ""
+
+
+def test_llm_windows_the_context_to_its_budget():
+    llm = LLM("test", system_prompt="You are a test.")
+    context = turns(20)
+    llm.context_token_budget = tokens(context[-4:]) + 200
+    llm.context_summary_tokens = 0
+    messages = llm._build_messages("latest question", context)
+    assert messages[0] == {"role": "system", "content": "You are a test."}
+    assert messages[-1] == {"role": "user", "content": "latest question"}
+    assert messages[1:-1] == context[-len(messages[1:-1]):]
+    assert tokens(messages) <= llm.context_token_budget
+
+    llm.context_token_budget = 0
+    assert len(llm._build_messages("latest question", context)) == len(context) + 2
@@ -0,0 +1,142 @@
+import time
+
+import pytest
+
+from app.services.conversation_store import ConversationStore, MemoryConversationStore, SQLiteConversationStore
+
+
+def conversation(text: str = "Hello") -> dict:
+    return {"messages": [{"role": "system", "content": text}], "symptoms": {}, "extracted_message_count": 0}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_incomplete_backend_fails_at_construction():
+    class IncompleteStore(ConversationStore):
+        def get(self, conversation_id):
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
+
+
+def test_create_append_update_delete():
+    store = MemoryConversationStore()
+    store.create("a", conversation())
+    assert store.append_message("a", {"role": "user", "content": "My head hurts"})
+    assert store.update("a", symptoms={"main_symptoms": ["headache"]}, extracted_message_count=2)
+    stored = store.get("a")
+    assert [message["content"] for message in stored["messages"]] == ["Hello", "My head hurts"]
+    assert stored["symptoms"] == {"main_symptoms": ["headache"]}
+    assert stored["extracted_message_count"] == 2
+    assert store.delete("a")
+    assert store.get("a") is None
+    assert not store.append_message("a", {"role": "user", "content": "hi"})
+    assert not store.update("a", symptoms={})
+
+
+def test_evicts_least_recently_used():
+    store = MemoryConversationStore(max_entries=2)
+    store.create("a", conversation())
+    store.create("b", conversation())
+    store.get("a")
+    store.create("c", conversation())
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_conversations_expire(clock):
+    store = MemoryConversationStore(ttl_seconds=60)
+    store.create("a", conversation())
+    store.create("b", conversation())
+    clock[0] += 50
+    store.get("a")
+    clock[0] += 20
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    clock[0] += 61
+    assert store.sweep() == 1
+    assert store.stats()["entries"] == 0
+    assert store.stats()["expirations"] == 2
+
+
+def test_byte_accounting():
+    store = MemoryConversationStore()
+    store.create("a", conversation())
+    store.create("b", conversation("A longer greeting message"))
+    store.append_message("a", {"role": "user", "content": "x" * 100})
+    store.update("b", symptoms={"main_symptoms": ["headache", "nausea"]})
+    assert store.get_size("a") > store.get_size("b") > 0
+    assert store.stats()["total_bytes"] == store.get_size("a") + store.get_size("b")
+
+    size = store.get_size("b")
+    store.update("b", symptoms={})
+    assert store.get_size("b") < size
+    store.delete("a")
+    store.delete("b")
+    assert store.stats()["total_bytes"] == 0
+
+
+def test_evicts_beyond_max_bytes():
+    store = MemoryConversationStore()
+    store.create("a", conversation())
+    store.create("b", conversation())
+    store.max_bytes = store.stats()["total_bytes"] + 50
+    store.append_message("b", {"role": "user", "content": "x" * 100})
+    assert store.get("a") is None
+    assert store.get("b") is not None
+    assert store.stats()["total_bytes"] <= store.max_bytes
+    assert store.stats()["evictions"] == 1
+
+
+def test_keeps_the_last_conversation_even_if_over_max_bytes():
+    store = MemoryConversationStore(max_bytes=10)
+    store.create("a", conversation("x" * 100))
+    assert store.get("a") is not None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    first = SQLiteConversationStore(path)
+    second = SQLiteConversationStore(path)
+    first.create("a", conversation())
+    assert second.append_message("a", {"role": "user", "content": "My head hurts"})
+    assert second.update("a", symptoms={"main_symptoms": ["headache"]}, extracted_message_count=2)
+    stored = first.get("a")
+    assert [message["content"] for message in stored["messages"]] == ["Hello", "My head hurts"]
+    assert stored["symptoms"] == {"main_symptoms": ["headache"]}
+    assert stored["extracted_message_count"] == 2
+    assert second.delete("a")
+    assert first.get("a") is None
+
+
+def test_sqlite_batch_rolls_back_on_error(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+    store.create("a", conversation())
+    with pytest.raises(RuntimeError):
+        with store.batch():
+            store.append_message("a", {"role": "system", "content": "reply"})
+            raise RuntimeError("failed mid-turn")
+    assert len(store.get("a")["messages"]) == 1
+
+
+def test_sqlite_idle_conversations_expire(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    store = SQLiteConversationStore(str(tmp_path / "conversations.db"), ttl_seconds=60)
+    store.create("a", conversation())
+    store.create("b", conversation())
+    now[0] += 50
+    store.append_message("a", {"role": "user", "content": "still here"})
+    now[0] += 20
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    now[0] += 61
+    assert store.sweep() == 1
+    assert store.stats()["entries"] == 0
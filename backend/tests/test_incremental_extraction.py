@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import symptom_chat_processing as processing
+from app.services.conversation_service import get_new_messages, merge_symptoms
+
+
+CONVERSATION = [
+    {"role": "system", "content": "Where does it hurt?"},
+    {"role": "user", "content": "My head hurts"},
+    {"role": "system", "content": "Any other symptoms?"},
+    {"role": "user", "content": "I also feel queasy since this morning"},
+]
+
+PREVIOUS_SYMPTOMS = {
+    "pain_areas": [{"area": "head", "intensity": 6, "description": "throbbing"}],
+    "main_symptoms": ["headache"],
+    "additional_symptoms": [],
+    "emotional_state": "anxious",
+    "emotional_scale": None
+}
+
+
+@pytest.fixture
+def extraction_calls(monkeypatch):
+    """Replace the LLM extraction, recording the messages it was given"""
+    calls = []
+
+    async def extract(conversation, previous_symptoms=None):
+        calls.append(conversation)
+        return {}, {"additional_symptoms": ["nausea"], "emotional_state": None}
+
+    monkeypatch.setattr(settings.CONVERSATION, "EXTRACTION_MODE", "three_stage")
+    monkeypatch.setattr(settings.CONVERSATION, "LOCAL_EXTRACTION", False)
+    monkeypatch.setattr(processing, "extract_symptoms_three_stage", extract)
+    return calls
+
+
+def test_get_new_messages():
+    assert get_new_messages({"messages": CONVERSATION, "extracted_message_count": 2}) == CONVERSATION[2:]
+    assert get_new_messages({"messages": CONVERSATION}) == CONVERSATION
+
+
+def test_only_new_messages_are_extracted(monkeypatch, extraction_calls):
+    monkeypatch.setattr(settings.CONVERSATION, "INCREMENTAL_EXTRACTION", True)
+    _, symptoms = asyncio.run(processing.extract_message_symptoms(CONVERSATION, PREVIOUS_SYMPTOMS, CONVERSATION[2:]))
+    assert extraction_calls == [CONVERSATION[2:]]
+    # Merged into the previous symptoms instead of replacing them
+    assert symptoms["pain_areas"] == PREVIOUS_SYMPTOMS["pain_areas"]
+    assert symptoms["main_symptoms"] == ["headache"]
+    assert symptoms["additional_symptoms"] == ["nausea"]
+    assert symptoms["emotional_state"] == "anxious"
+
+
+def test_whole_conversation_without_incremental_extraction(monkeypatch, extraction_calls):
+    monkeypatch.setattr(settings.CONVERSATION, "INCREMENTAL_EXTRACTION", False)
+    asyncio.run(processing.extract_message_symptoms(CONVERSATION, PREVIOUS_SYMPTOMS, CONVERSATION[2:]))
+    assert extraction_calls == [CONVERSATION]
+
+
+def test_first_extraction_sees_the_whole_conversation(monkeypatch):
+    monkeypatch.setattr(settings.CONVERSATION, "INCREMENTAL_EXTRACTION", True)
+    assert processing.select_extraction_context(CONVERSATION, PREVIOUS_SYMPTOMS, CONVERSATION) == (CONVERSATION, None)
+    assert processing.select_extraction_context(CONVERSATION, PREVIOUS_SYMPTOMS, None) == (CONVERSATION, None)
+
+
+def test_merge_symptoms():
+    merged = merge_symptoms(PREVIOUS_SYMPTOMS, {
+        "pain_areas": [{"area": "Head", "intensity": 8, "description": None}, {"area": "back", "intensity": 3}],
+        "main_symptoms": ["Headache", "back pain"],
+        "additional_symptoms": ["no other symptoms"],
+        "emotional_state": None,
+        "emotional_scale": 5
+    })
+    assert merged["pain_areas"] == [
+        {"area": "Head", "intensity": 8, "description": "throbbing"},
+        {"area": "back", "intensity": 3}
+    ]
+    assert merged["main_symptoms"] == ["headache", "back pain"]
+    assert merged["additional_symptoms"] == ["no other symptoms"]
+    assert merged["emotional_state"] == "anxious"
+    assert merged["emotional_scale"] == 5
+    # The previous symptoms aren't modified
+    assert PREVIOUS_SYMPTOMS["pain_areas"][0]["intensity"] == 6
+
+
+def test_no_other_symptoms_is_dropped_once_symptoms_are_reported():
+    merged = merge_symptoms({"additional_symptoms": ["no other symptoms"]}, {"additional_symptoms": ["nausea"]})
+    assert merged["additional_symptoms"] == ["nausea"]
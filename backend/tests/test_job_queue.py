@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.job_queue import FAILED, SUCCEEDED, JobQueue, JobQueueFullError
+from app.services.job_store import Job, MemoryJobStore, SQLiteJobStore
+from app.utils.cache import hash_key
+
+
+def make_queue(store, **kwargs) -> JobQueue:
+    queue = JobQueue(store, workers=2, **kwargs)
+
+    async def echo(payload):
+        return {"echo": payload}
+
+    async def pdf(payload):
+        return b"%PDF"
+
+    async def fail(payload):
+        raise RuntimeError("boom")
+
+    queue.register("echo", echo)
+    queue.register("pdf", pdf, media_type="application/pdf")
+    queue.register("fail", fail)
+    return queue
+
+
+async def wait_finished(queue, job_id):
+    for _ in range(100):
+        job = await queue.get(job_id)
+        if job.finished:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_runs_jobs_and_deduplicates(store):
+    async def scenario():
+        queue = make_queue(store)
+        queue.start()
+        try:
+            first = await queue.submit("echo", {"n": 1})
+            second = await queue.submit("echo", {"n": 1})
+            assert second.id == first.id
+            job = await wait_finished(queue, first.id)
+            assert job.status == SUCCEEDED
+            assert job.result == {"echo": {"n": 1}}
+            pdf = await wait_finished(queue, (await queue.submit("pdf", {})).id)
+            assert pdf.result == b"%PDF"
+        finally:
+            await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["deduplicated"] == 1
+    assert stats["succeeded"] == 2
+
+
+def test_failed_jobs_are_retried_on_resubmission(store):
+    async def scenario():
+        queue = make_queue(store)
+        queue.start()
+        try:
+            first = await wait_finished(queue, (await queue.submit("fail", {})).id)
+            assert first.status == FAILED
+            assert first.error == "boom"
+            second = await queue.submit("fail", {})
+            assert second.id != first.id
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_rejects_unknown_kinds_and_full_queues(store):
+    async def scenario():
+        queue = make_queue(store, max_queued=1)
+        with pytest.raises(ValueError):
+            await queue.submit("unknown", {})
+        await queue.submit("echo", {"n": 1})
+        with pytest.raises(JobQueueFullError):
+            await queue.submit("echo", {"n": 2})
+
+    asyncio.run(scenario())
+
+
+def test_jobs_are_visible_to_other_workers(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async def scenario():
+        queue = make_queue(SQLiteJobStore(path))
+        other_worker = make_queue(SQLiteJobStore(path))
+        queue.start()
+        try:
+            job = await queue.submit("echo", {"n": 1})
+            await wait_finished(queue, job.id)
+            assert (await other_worker.get(job.id)).result == {"echo": {"n": 1}}
+            assert (await other_worker.submit("echo", {"n": 1})).id == job.id
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_jobs_of_a_stopped_worker_are_recovered(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"), stale_seconds=30)
+    dedup_key = hash_key('["echo", {"n": 1}]')
+    # Queued by a worker process that crashed before running it
+    orphan = Job("echo", {"n": 1}, dedup_key, "application/json", owner="crashed-worker")
+    orphan.heartbeat_at = time.time() - 60
+    store.add(orphan)
+
+    async def scenario():
+        queue = make_queue(store)
+        queue.start()
+        try:
+            job = await queue.submit("echo", {"n": 1})
+            assert job.id != orphan.id
+            assert (await wait_finished(queue, job.id)).status == SUCCEEDED
+            assert (await queue.get(orphan.id)).status == FAILED
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
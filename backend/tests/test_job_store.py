@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from app.services.job_store import (
+    FAILED, ORPHANED_ERROR, QUEUED, SUCCEEDED, Job, JobStore, MemoryJobStore, SQLiteJobStore
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore(result_ttl_seconds=60)
+    return SQLiteJobStore(str(tmp_path / "jobs.db"), result_ttl_seconds=60, stale_seconds=30)
+
+
+def finish(store, job, result, status=SUCCEEDED):
+    job.status = status
+    job.result = result
+    job.finished_at = time.time()
+    store.save(job)
+
+
+def test_incomplete_backend_fails_at_construction():
+    class IncompleteStore(JobStore):
+        def add(self, job):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
+
+
+def test_add_get_and_save(store):
+    job = Job("report", {"a": 1}, "key", "application/json", owner="worker")
+    store.add(job)
+    assert store.get(job.id).status == QUEUED
+    finish(store, job, {"ok": True})
+    stored = store.get(job.id)
+    assert stored.status == SUCCEEDED
+    assert stored.result == {"ok": True}
+    assert stored.payload == {"a": 1}
+    assert store.get("missing") is None
+
+
+def test_binary_results(store):
+    job = Job("report", {}, "key", "application/pdf")
+    store.add(job)
+    finish(store, job, b"%PDF")
+    assert store.get(job.id).result == b"%PDF"
+
+
+def test_find_returns_the_latest_job(store):
+    first = Job("report", {}, "key", "application/json")
+    store.add(first)
+    second = Job("report", {}, "key", "application/json")
+    second.created_at = first.created_at + 1
+    store.add(second)
+    assert store.find("key").id == second.id
+    assert store.find("other") is None
+
+
+def test_sweep_removes_expired_results(store):
+    job = Job("report", {}, "key", "application/json")
+    store.add(job)
+    finish(store, job, {})
+    job.finished_at = time.time() - 120
+    store.save(job)
+    assert store.sweep() == 1
+    assert store.get(job.id) is None
+    assert store.count_statuses() == {}
+
+
+def test_orphaned_jobs_are_failed_and_not_reused(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"), stale_seconds=30)
+    orphan = Job("report", {}, "key", "application/json", owner="stopped-worker")
+    orphan.heartbeat_at = time.time() - 60
+    store.add(orphan)
+    live = Job("report", {}, "other", "application/json", owner="live-worker")
+    store.add(live)
+
+    assert store.find("key") is None
+    assert store.find("other").id == live.id
+
+    store.sweep()
+    failed = store.get(orphan.id)
+    assert failed.status == FAILED
+    assert failed.error == ORPHANED_ERROR
+    assert store.get(live.id).status == QUEUED
+
+
+def test_heartbeat_keeps_jobs_alive(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"), stale_seconds=30)
+    job = Job("report", {}, "key", "application/json", owner="worker")
+    job.heartbeat_at = time.time() - 60
+    store.add(job)
+    store.heartbeat("worker")
+    assert store.find("key").id == job.id
+    store.sweep()
+    assert store.get(job.id).status == QUEUED
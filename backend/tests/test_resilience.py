@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils import resilience
+from app.utils.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, call_with_resilience, is_provider_failure
+)
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_provider_failures():
+    assert is_provider_failure(ProviderError(429))
+    assert is_provider_failure(ProviderError(503))
+    assert is_provider_failure(asyncio.TimeoutError())
+    assert not is_provider_failure(ProviderError(400))
+    assert not is_provider_failure(ValueError("bad output"))
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout_seconds=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.stats()["rejections"] == 2
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=30)
+    breaker.record_failure()
+    clock[0] += 31
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_opens_again(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=30)
+    breaker.record_failure()
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_ignored_trial_frees_the_slot(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=30)
+    breaker.record_failure()
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.record_ignored()
+    assert breaker.allow()
+
+
+def test_retries_transient_failures():
+    breaker = CircuitBreaker("test", failure_threshold=10)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ProviderError(503)
+        return "ok"
+
+    assert asyncio.run(call_with_resilience(breaker, call, max_retries=3)) == "ok"
+    assert len(attempts) == 3
+    assert breaker.stats()["retries"] == 2
+    assert breaker.state == CLOSED
+
+
+def test_does_not_retry_other_errors():
+    breaker = CircuitBreaker("test")
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise ProviderError(400)
+
+    with pytest.raises(ProviderError):
+        asyncio.run(call_with_resilience(breaker, call, max_retries=3))
+    assert len(attempts) == 1
+    assert breaker.stats()["failures"] == 0
+
+
+def test_timeouts_count_as_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+
+    async def call():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_with_resilience(breaker, call, timeout=0.01, max_retries=1))
+    assert breaker.stats()["timeouts"] == 2
+    assert breaker.state == OPEN
+
+
+def test_open_breaker_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    breaker.record_failure()
+
+    async def call():
+        raise AssertionError("the provider must not be called")
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_resilience(breaker, call))
+
+
+def test_cancelled_trial_frees_the_slot(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=30)
+    breaker.record_failure()
+    clock[0] += 31
+
+    async def scenario():
+        task = asyncio.ensure_future(call_with_resilience(breaker, lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert breaker.allow()
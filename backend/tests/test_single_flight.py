@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.run("key", call) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["coalesced_calls"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_are_not_coalesced():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def call(value):
+            await asyncio.sleep(0)
+            return value
+
+        return await asyncio.gather(flight.run("a", lambda: call(1)), flight.run("b", lambda: call(2)))
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_failures_are_not_reused():
+    async def scenario():
+        flight = SingleFlight(window_seconds=60)
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("boom")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await flight.run("key", call)
+        return await flight.run("key", call), attempts
+
+    result, attempts = asyncio.run(scenario())
+    assert result == "ok"
+    assert len(attempts) == 2
+
+
+def test_success_is_shared_within_the_window():
+    async def scenario():
+        flight = SingleFlight(window_seconds=60)
+        calls = []
+
+        async def call():
+            calls.append(1)
+            return len(calls)
+
+        return await flight.run("key", call), await flight.run("key", call), calls
+
+    first, second, calls = asyncio.run(scenario())
+    assert first == second == 1
+    assert len(calls) == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.02)
+            return "result"
+
+        impatient = asyncio.ensure_future(flight.run("key", call))
+        patient = asyncio.ensure_future(flight.run("key", call))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(scenario()) == "result"
@@ -0,0 +1,90 @@
+from json import JSONDecodeError
+
+import pytest
+from pydantic import BaseModel
+
+from app.utils.structured_output import (
+    StructuredOutputError, build_response_format, parse_llm_json, scan_json
+)
+
+
+class Triage(BaseModel):
+    severity: str
+    summary: str = ""
+
+
+def test_parses_plain_json():
+    assert parse_llm_json('{"severity": "green"}') == {"severity": "green"}
+
+
+def test_extracts_code_block():
+    text = 'Here is the result:\n```json\n{"severity": "red", "items": [1, 2]}\n```\nThanks'
+    assert parse_llm_json(text) == {"severity": "red", "items": [1, 2]}
+
+
+def test_extracts_object_surrounded_by_prose():
+    assert parse_llm_json('Sure! {"a": 1} Hope that helps.') == {"a": 1}
+
+
+def test_drops_trailing_commas():
+    assert parse_llm_json('{"a": [1, 2,], "b": {"c": 3,},}') == {"a": [1, 2], "b": {"c": 3}}
+
+
+def test_keeps_commas_inside_strings():
+    assert parse_llm_json('{"a": "x, }", "b": [1,]}') == {"a": "x, }", "b": [1]}
+
+
+def test_repairs_truncated_object_at_last_complete_value():
+    assert parse_llm_json('{"a": 1, "b": [1, 2], "c": "some te') == {"a": 1, "b": [1, 2]}
+
+
+def test_truncated_string_is_not_passed_off_as_complete():
+    # The cut-off question must be dropped, not closed into a shorter string
+    value = parse_llm_json('{"response": "Thanks.", "follow_up": "On a scale of 1-')
+    assert value == {"response": "Thanks."}
+
+
+def test_truncated_number_is_not_passed_off_as_complete():
+    assert parse_llm_json('{"a": 1, "intensity": 12') == {"a": 1}
+
+
+def test_truncated_string_with_comma_inside():
+    # The comma inside the string is not a place to cut
+    assert parse_llm_json('{"a": 1, "b": "one, two') == {"a": 1}
+
+
+def test_scan_json_cut_points_skip_strings():
+    cleaned, end, cut_points = scan_json('{"a": "x, y", "b": 1', 0)
+    assert end is None
+    assert [cleaned[:cut] for cut, _ in cut_points] == ['{"a": "x, y"']
+    assert cut_points[0][1] == "}"
+
+
+def test_scan_json_complete_value():
+    text = 'x {"a": [1, {"b": 2}]} y'
+    cleaned, end, _ = scan_json(text, 2)
+    assert cleaned == '{"a": [1, {"b": 2}]}'
+    assert text[end:] == " y"
+
+
+def test_raises_when_nothing_recoverable():
+    with pytest.raises(StructuredOutputError) as error:
+        parse_llm_json("I can't help with that.")
+    # Callers catching JSONDecodeError also catch parse failures
+    assert isinstance(error.value, JSONDecodeError)
+    assert error.value.doc == "I can't help with that."
+
+
+def test_validates_against_schema():
+    assert parse_llm_json('{"severity": "red"}', schema=Triage) == {"severity": "red"}
+    with pytest.raises(StructuredOutputError):
+        parse_llm_json('{"summary": "no severity"}', schema=Triage)
+
+
+def test_build_response_format_strict_schema():
+    response_format = build_response_format(Triage)
+    schema = response_format["json_schema"]["schema"]
+    assert response_format["json_schema"]["strict"] is True
+    assert schema["required"] == ["severity", "summary"]
+    assert schema["additionalProperties"] is False
+    assert "default" not in schema["properties"]["summary"]
@@ -0,0 +1,35 @@
+from app.services.symptom_cache import (
+    CACHE_HIT, CACHE_MISS, CACHE_NEAR_HIT, SymptomResponseCache, canonicalize_symptoms
+)
+
+
+def test_canonical_payload_ignores_order_case_and_close_intensities():
+    first = {
+        "pain_areas": [{"area": "Abdomen", "intensity": 7}, {"area": "back", "intensity": 2}],
+        "main_symptoms": ["Cramping", "bloating"],
+        "completeness_score": 0.4
+    }
+    second = {
+        "main_symptoms": ["bloating", "cramping "],
+        "pain_areas": [{"area": "back", "intensity": 3}, {"area": "abdomen", "intensity": 8}],
+        "emotional_state": None
+    }
+    assert canonicalize_symptoms(first) == canonicalize_symptoms(second)
+    assert canonicalize_symptoms({"intensity": 3}) != canonicalize_symptoms({"intensity": 4})
+
+
+def test_symptom_response_cache():
+    cache = SymptomResponseCache()
+    payload = {"main_symptoms": ["headache"], "pain_areas": [{"area": "head", "intensity": 5}]}
+    assert cache.lookup("analyze", payload) == (None, CACHE_MISS)
+    cache.store("analyze", payload, {"severity": "yellow"})
+    assert cache.lookup("analyze", dict(payload, main_symptoms=["Headache"])) == ({"severity": "yellow"}, CACHE_HIT)
+    # Kinds don't share entries
+    assert cache.lookup("diagnosis", payload) == (None, CACHE_MISS)
+
+
+def test_near_duplicate_lookup():
+    cache = SymptomResponseCache(near_duplicate_threshold=0.5)
+    cache.store("analyze", {"main_symptoms": ["headache", "nausea", "fatigue"]}, "cached")
+    assert cache.lookup("analyze", {"main_symptoms": ["headache", "nausea"]}) == ("cached", CACHE_NEAR_HIT)
+    assert cache.lookup("analyze", {"main_symptoms": ["back pain"]}) == (None, CACHE_MISS)
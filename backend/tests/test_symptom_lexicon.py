@@ -0,0 +1,67 @@
+from app.services.symptom_lexicon import extract_lexicon_symptoms, normalize_message
+
+
+def test_normalize_strips_accents_and_case():
+    assert normalize_message("Dolor de Estómago") == "dolor de estomago"
+
+
+def test_complete_english_extraction():
+    extraction = extract_lexicon_symptoms("I have sharp stomach pain, about 7 out of 10")
+    assert extraction.complete
+    assert extraction.symptoms["pain_areas"] == [
+        {"area": "abdomen", "intensity": 7, "frequency": None, "description": "sharp"}
+    ]
+    assert extraction.symptoms["main_symptoms"] == ["abdominal pain"]
+
+
+def test_spanish_and_chinese():
+    spanish = extract_lexicon_symptoms("Tengo dolor de cabeza")
+    assert spanish.complete
+    assert spanish.symptoms["main_symptoms"] == ["headache"]
+
+    chinese = extract_lexicon_symptoms("我肚子疼，七分")
+    assert chinese.symptoms["pain_areas"][0]["area"] == "abdomen"
+    assert chinese.symptoms["pain_areas"][0]["intensity"] == 7
+
+
+def test_attributes_attach_to_the_single_known_area():
+    current = {"pain_areas": [{"area": "back", "intensity": None}], "main_symptoms": ["back pain"]}
+    extraction = extract_lexicon_symptoms("It's throbbing, 6/10", current)
+    assert extraction.complete
+    assert extraction.symptoms["pain_areas"] == [{"area": "back", "description": "throbbing", "intensity": 6}]
+    assert "main_symptoms" not in extraction.symptoms
+
+
+def test_new_symptom_is_additional_when_there_is_a_main_symptom():
+    extraction = extract_lexicon_symptoms("also nausea", {"main_symptoms": ["headache"]})
+    assert extraction.symptoms == {"additional_symptoms": ["nausea"]}
+
+
+def test_emotional_state_with_scale():
+    extraction = extract_lexicon_symptoms("I feel anxious, 6 out of 10")
+    assert extraction.complete
+    assert extraction.symptoms == {"emotional_state": "anxious", "emotional_scale": 6}
+
+
+def test_no_other_symptoms():
+    extraction = extract_lexicon_symptoms("No other symptoms", {"main_symptoms": ["headache"]})
+    assert extraction.complete
+    assert extraction.symptoms == {"additional_symptoms": ["no other symptoms"]}
+
+
+def test_negation_is_left_to_the_llm():
+    extraction = extract_lexicon_symptoms("no headache")
+    assert extraction.matched
+    assert not extraction.complete
+
+
+def test_unknown_words_are_not_complete():
+    extraction = extract_lexicon_symptoms("my headache started after the marathon")
+    assert extraction.matched
+    assert not extraction.complete
+
+
+def test_no_match():
+    extraction = extract_lexicon_symptoms("hello there")
+    assert not extraction.matched
+    assert not extraction.complete
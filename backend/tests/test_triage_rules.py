@@ -0,0 +1,58 @@
+from app.routers.symptoms import SymptomInput
+from app.services.triage_rules import GREEN_RECOMMENDATION, RED_RECOMMENDATION, fast_path_triage
+
+
+def symptoms(pain_areas=(), additional=(), emotional_state=None) -> SymptomInput:
+    return SymptomInput(
+        pain_areas=[{"area": area, "intensity": intensity, "description": description}
+                    for area, intensity, description in pain_areas],
+        additional_symptoms=list(additional),
+        emotional_state=emotional_state
+    )
+
+
+def test_red_flag_symptom():
+    result = fast_path_triage(symptoms([("abdomen", 4, "cramping")], ["Heavy bleeding"]))
+    assert result["severity"] == "red"
+    assert result["recommendation"] == RED_RECOMMENDATION
+    assert "heavy bleeding" in result["summary"]
+
+
+def test_red_flag_matches_whole_words_only():
+    # "unbearably" is not the red-flag term "unbearable"
+    assert fast_path_triage(symptoms([("back", 5, "unbearably dull")])) is None
+
+
+def test_very_severe_pain():
+    assert fast_path_triage(symptoms([("leg", 9, "aching")]))["severity"] == "red"
+
+
+def test_severe_pain_is_red_only_in_critical_areas():
+    assert fast_path_triage(symptoms([("pelvis", 8, "aching")]))["severity"] == "red"
+    assert fast_path_triage(symptoms([("leg", 8, "aching")])) is None
+
+
+def test_single_mild_pain():
+    result = fast_path_triage(symptoms([("back", 2, "dull ache")]))
+    assert result["severity"] == "green"
+    assert result["recommendation"] == GREEN_RECOMMENDATION
+
+
+def test_mild_chest_pain_goes_to_llm():
+    assert fast_path_triage(symptoms([("chest", 2, "tight")])) is None
+
+
+def test_single_mild_symptom():
+    assert fast_path_triage(symptoms(additional=["Bloating"]))["severity"] == "green"
+
+
+def test_uncertain_terms_go_to_llm():
+    assert fast_path_triage(symptoms([("abdomen", 2, "dull, with fever")])) is None
+
+
+def test_distressed_state_goes_to_llm():
+    assert fast_path_triage(symptoms([("back", 2, "dull")], emotional_state="Hopeless")) is None
+
+
+def test_several_symptoms_go_to_llm():
+    assert fast_path_triage(symptoms([("back", 2, "dull")], ["fatigue"])) is None
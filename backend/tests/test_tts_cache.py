@@ -0,0 +1,22 @@
+import asyncio
+
+from app.services import tts_cache
+from app.utils.cache import DiskCache
+
+
+def test_serves_speech_cached_by_another_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_cache, "tts_cache", DiskCache(str(tmp_path), suffix=".mp3"))
+    key = tts_cache.make_tts_cache_key("Hello", "nova", "tts-1", "en")
+    assert asyncio.run(tts_cache.get_cached_speech(key)) is None
+
+    # Written by another worker process sharing the cache directory
+    DiskCache(str(tmp_path), suffix=".mp3").set(key, b"mp3 data")
+    assert asyncio.run(tts_cache.get_cached_speech(key)) == b"mp3 data"
+
+
+def test_set_cached_speech_skips_empty_audio(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_cache, "tts_cache", DiskCache(str(tmp_path), suffix=".mp3"))
+    asyncio.run(tts_cache.set_cached_speech("empty", b""))
+    asyncio.run(tts_cache.set_cached_speech("audio", b"mp3 data"))
+    assert asyncio.run(tts_cache.get_cached_speech("empty")) is None
+    assert asyncio.run(tts_cache.get_cached_speech("audio")) == b"mp3 data"